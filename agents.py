@@ -2,6 +2,9 @@ import random
 import logging
 from memory import MemoryManager
 from gemini_tool import GeminiTool
+from async_explainer import AsyncExplainer
+from content_index import QuestionIndex
+from grading import answer_key
 
 # Acquire agents logger (configured in main.py)
 logger_agents = logging.getLogger("alca.agents")
@@ -9,8 +12,9 @@ logger_agents = logging.getLogger("alca.agents")
 class AssessmentAgent:
     """Asks diagnostic questions for a topic."""
 
-    def __init__(self, db):
+    def __init__(self, db, index: QuestionIndex = None):
         self.db = db
+        self.index = index or QuestionIndex(db)
 
     def ask(self, topic):
         topic_data = self.db.get(topic)
@@ -18,7 +22,7 @@ class AssessmentAgent:
             logger_agents.warning(f"AssessmentAgent.ask: unknown topic={topic}")
             return None
 
-        q = random.choice(topic_data["diagnostic"])
+        q = random.choice(self.index.diagnostic(topic))
         logger_agents.info(f"AssessmentAgent.ask topic={topic} qid={q.get('id') if isinstance(q, dict) else 'n/a'}")
         return q
 
@@ -44,8 +48,9 @@ class ExplanationAgent:
 class PracticeAgent:
     """Generates random practice questions."""
 
-    def __init__(self, db):
+    def __init__(self, db, index: QuestionIndex = None):
         self.db = db
+        self.index = index or QuestionIndex(db)
 
     def generate(self, topic, difficulty=None):
         topic_data = self.db.get(topic)
@@ -53,16 +58,14 @@ class PracticeAgent:
             logger_agents.warning(f"PracticeAgent.generate: unknown topic={topic}")
             return None
 
-        questions = topic_data["practice"]
-
         if difficulty:
-            filtered = [q for q in questions if q["difficulty"] == difficulty]
+            filtered = self.index.by_difficulty(topic, difficulty)
             if filtered:
                 q = random.choice(filtered)
                 logger_agents.info(f"PracticeAgent.generate topic={topic} difficulty={difficulty} qid={q.get('id')}")
                 return q
 
-        q = random.choice(questions)
+        q = random.choice(self.index.practice(topic))
         logger_agents.info(f"PracticeAgent.generate topic={topic} fallback qid={q.get('id')}")
         return q
 
@@ -70,11 +73,15 @@ class PracticeAgent:
 class FeedbackAgent:
     """Grades answer and updates memory."""
 
-    def __init__(self, memory: MemoryManager):
+    def __init__(self, memory: MemoryManager, index: QuestionIndex = None):
         self.memory = memory
+        self.index = index
 
     def grade(self, user_id, topic, qid, student_answer, correct_answer):
-        correct = (student_answer.strip().lower() == correct_answer.strip().lower())
+        key = self.index.answer_key(topic, qid) if self.index is not None else None
+        if key is None or key.answer != correct_answer:
+            key = answer_key(correct_answer)
+        correct = key.is_exact(student_answer)
         self.memory.record_attempt(user_id, topic, qid, student_answer, correct_answer, correct)
         logger_agents.info(f"FeedbackAgent.grade user={user_id} topic={topic} qid={qid} correct={correct}")
         return {
@@ -84,14 +91,38 @@ class FeedbackAgent:
         }
 
 class GeminiExplanationAgent:
-    """LLM-powered explanation agent using Gemini."""
+    """
+    LLM-powered explanation agent using Gemini.
 
-    def __init__(self):
-        self.tool = GeminiTool()
+    Cached explanations are returned straight away. Misses go through an
+    AsyncExplainer: each call is bounded by `timeout` seconds (falling back to
+    the static text), at most `max_in_flight` model calls run at once, and
+    concurrent requests for the same (topic, level, fallback) share one call.
+    """
+
+    def __init__(self, tool: GeminiTool = None, timeout=3.0, max_in_flight=4):
+        self.tool = tool or GeminiTool()
+        self.explainer = AsyncExplainer(self.tool.generate, timeout=timeout, max_in_flight=max_in_flight)
 
     def explain(self, topic, level, fallback_text):
+        if not self.tool.enabled:
+            return fallback_text
+        try:
+            cached = self.tool.lookup(topic, level, fallback_text)
+            if cached is not None:
+                return cached
+            return self.explainer.explain_sync(topic, level, fallback_text)
+        except Exception:
+            return fallback_text
+
+    async def explain_async(self, topic, level, fallback_text):
+        if not self.tool.enabled:
+            return fallback_text
         try:
-            return self.tool.explain(topic, level, fallback_text)
+            cached = self.tool.lookup(topic, level, fallback_text)
+            if cached is not None:
+                return cached
+            return await self.explainer.explain(topic, level, fallback_text)
         except Exception:
             return fallback_text
 
@@ -99,15 +130,18 @@ class GeminiExplanationAgent:
 class Orchestrator:
     """Coordinates all agents."""
 
-    def __init__(self, db, memory: MemoryManager):
+    def __init__(self, db, memory: MemoryManager, index: QuestionIndex = None,
+                 gemini_agent: GeminiExplanationAgent = None):
         self.db = db
         self.memory = memory
+        self.index = index or QuestionIndex(db)
 
-        self.assessment_agent = AssessmentAgent(db)
+        self.assessment_agent = AssessmentAgent(db, self.index)
         self.explanation_agent = ExplanationAgent(db)
-        self.practice_agent = PracticeAgent(db)
-        self.feedback_agent = FeedbackAgent(memory)
-        self.gemini_agent = GeminiExplanationAgent()
+        self.practice_agent = PracticeAgent(db, self.index)
+        self.feedback_agent = FeedbackAgent(memory, self.index)
+        # Content-independent, so callers may share one across content reloads
+        self.gemini_agent = gemini_agent or GeminiExplanationAgent()
 
     def handle(self, user_id, topic, mode):
         logger_agents.info(f"Orchestrator.handle user={user_id} topic={topic} mode={mode}")
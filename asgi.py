@@ -0,0 +1,415 @@
+# asgi.py
+"""
+ASGI serving mode: the same API as main.py's Flask app, with async handlers.
+
+    uvicorn asgi:app --host 127.0.0.1 --port 8000 --workers 4
+    python asgi.py                      # same, workers from ALCA_WORKERS
+
+Handlers never block the event loop. SQLite and session-file work runs on a
+bounded DB thread pool; evaluations (which drive the agents and Gemini) run
+as background jobs on main.eval_jobs' own small pool, so slow LLM calls can't
+starve normal requests. Idle connections and clients following an
+evaluation stream only cost a coroutine, not a thread.
+
+Shared state (ContentStore, MemoryManager, SessionStore, JobManager) is
+imported from main, so both servers behave identically. Each uvicorn worker
+is its own process with its own copy of these objects:
+
+  - user stats, history, evaluation jobs/reports and generated explanations
+    live in SQLite (WAL), so every worker reads the same data
+  - each worker's stats cache drops its entries when another worker writes,
+    noticed within MemoryManager's cache_sync_ms (1s by default)
+  - with ALCA_WRITE_BEHIND=1, attempts buffered in one worker are visible to
+    the others only after its next flush (~50 ms)
+  - session files are appended under flock, but each worker's SessionWriter
+    buffers records for up to 0.5s and tail() only flushes its own buffer, so
+    /api/session answered by another worker can miss the newest records.
+    `python asgi.py` with several workers sets ALCA_SESSION_BUFFER=0 (write
+    straight to the file); do the same when running uvicorn --workers directly
+  - metrics, LLM-call coalescing and the sandbox pool are per worker
+"""
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from main import (
+    BATCH_MAX_ANSWERS,
+    SEARCH_LIMIT_DEFAULT,
+    MEMORY_PAGE_DEFAULT,
+    MEMORY_PAGE_MAX,
+    SESSION_PAGE_DEFAULT,
+    SESSION_PAGE_MAX,
+    LearningSystem,
+    content_store,
+    eval_jobs,
+    flag_arg,
+    get_last_session,
+    job_links,
+    job_report_response,
+    logger_api_evaluate,
+    logger_api_learn,
+    logger_api_memory,
+    logger_app,
+    memory_manager,
+    search_topics,
+    session_store,
+    store_session,
+)
+from jobs import FINISHED, sse
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, observe_request
+
+# -------------------------
+# Thread pool
+# -------------------------
+DB_THREADS = int(os.getenv("ALCA_DB_THREADS", "32"))
+
+db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="alca-db")
+
+
+async def run_db(fn, *args, **kwargs):
+    """Run blocking SQLite / session-file work on the DB pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def read_json(request: Request) -> dict:
+    """Request body as a dict; anything missing or malformed counts as {} (like get_json() or {})."""
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def error(status, message, **extra):
+    return JSONResponse({"error": message, **extra}, status_code=status)
+
+
+def log_timing(api_logger):
+    """Async twin of main.log_timing."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapped(*args, **kwargs):
+            start = time.time()
+            api_logger.info(f"ENTER {fn.__name__} - async", extra={"endpoint": fn.__name__})
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                elapsed = (time.time() - start) * 1000.0
+                observe_request(fn.__name__, elapsed / 1000.0)
+                api_logger.info(f"EXIT  {fn.__name__} - took={elapsed:.1f}ms",
+                                extra={"endpoint": fn.__name__, "duration_ms": round(elapsed, 2)})
+        return wrapped
+    return decorator
+
+
+# -------------------------
+# App
+# -------------------------
+app = FastAPI(title="ALCA")
+
+
+@app.on_event("startup")
+async def startup():
+    logger_app.info(f"ASGI worker pid={os.getpid()} starting db_threads={DB_THREADS}")
+    if os.getenv("ALCA_PREWARM") == "1":
+        from prewarm import start_background_prewarm
+        start_background_prewarm(content_store.content, content_store.gemini_agent)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    eval_jobs.shutdown()
+    db_executor.shutdown(wait=True)
+    session_store.close()
+    memory_manager.close()
+    logger_app.info(f"ASGI worker pid={os.getpid()} stopped")
+
+
+# -------------------------
+# Learning
+# -------------------------
+def _learn(user_id, topic, answer):
+    """Blocking body of /api/learn; returns (status, payload)."""
+    ls = LearningSystem(user_id=user_id, store=content_store)
+    if topic not in ls.content:
+        logger_api_learn.warning(f"/api/learn unknown topic={topic} user={user_id}")
+        return 404, {"error": f"unknown topic: {topic}"}
+
+    if answer == "":
+        q = ls.get_question(topic)
+        store_session(user_id, {"action": "serve_question", "topic": topic, "question_id": q["id"]})
+        logger_api_learn.info(f"Served question id={q['id']} for user={user_id} topic={topic}")
+        return 200, {"question": q["question"], "question_id": q["id"]}
+
+    result = ls.run_step(topic, answer)
+    store_session(user_id, {"action": "answer", "topic": topic, "question_id": result.get("question_id", None)})
+    logger_api_learn.info(f"User {user_id} answered question on topic={topic} correct={result['correct']}")
+    return 200, result
+
+
+@app.post("/api/learn")
+@log_timing(logger_api_learn)
+async def api_learn(request: Request):
+    data = await read_json(request)
+    user_id = data.get("user_id", "default")
+    topic = data.get("topic")
+    answer = data.get("answer", "")
+
+    logger_api_learn.info(f"Request /api/learn user_id={user_id} topic={topic} answer_provided={'yes' if answer else 'no'}")
+
+    if not topic:
+        logger_api_learn.warning(f"/api/learn called without topic by {user_id}")
+        return error(400, "topic is required")
+
+    status, payload = await run_db(_learn, user_id, topic, answer)
+    return JSONResponse(payload, status_code=status)
+
+
+def _learn_batch(user_id, answers):
+    ls = LearningSystem(user_id=user_id, store=content_store)
+    result = ls.run_batch(answers)
+    store_session(user_id, {"action": "answer_batch", "count": result["graded"]})
+    logger_api_learn.info(f"User {user_id} batch graded={result['graded']} correct={result['num_correct']}")
+    return result
+
+
+@app.post("/api/learn/batch")
+@log_timing(logger_api_learn)
+async def api_learn_batch(request: Request):
+    data = await read_json(request)
+    user_id = data.get("user_id", "default")
+    answers = data.get("answers")
+
+    if not isinstance(answers, list) or not answers:
+        logger_api_learn.warning(f"/api/learn/batch called without answers by {user_id}")
+        return error(400, "answers must be a non-empty list")
+    if len(answers) > BATCH_MAX_ANSWERS:
+        return error(413, f"at most {BATCH_MAX_ANSWERS} answers per batch")
+
+    return JSONResponse(await run_db(_learn_batch, user_id, answers))
+
+
+# -------------------------
+# Memory
+# -------------------------
+def _summary(user_id, **filters):
+    return LearningSystem(user_id=user_id, store=content_store).get_summary(**filters)
+
+
+@app.get("/api/memory/{user_id}")
+@log_timing(logger_api_memory)
+async def api_memory(user_id: str, request: Request):
+    args = dict(request.query_params)
+    logger_api_memory.info(f"/api/memory requested for user_id={user_id} args={args}")
+    try:
+        limit = min(int(args.get("limit", MEMORY_PAGE_DEFAULT)), MEMORY_PAGE_MAX)
+        since = int(args["since"]) if "since" in args else None
+        until = int(args["until"]) if "until" in args else None
+        summary = await run_db(
+            _summary,
+            user_id,
+            limit=max(limit, 1),
+            after=args.get("after"),
+            topic=args.get("topic"),
+            since=since,
+            until=until,
+        )
+    except ValueError:
+        logger_api_memory.warning(f"/api/memory bad query args for user_id={user_id}: {args}")
+        return error(400, "invalid limit, since, until or after cursor")
+    return JSONResponse(summary)
+
+
+@app.get("/api/cache/stats")
+@log_timing(logger_api_memory)
+async def api_cache_stats():
+    tool = content_store.gemini_agent.tool
+    return {
+        "topic_stats": memory_manager.cache_stats(),
+        "explanations": await run_db(tool.cache.stats) if tool.cache is not None else {"enabled": False},
+    }
+
+
+# -------------------------
+# Topics
+# -------------------------
+def _not_modified(request: Request, etag, last_modified):
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return etag in [t.strip() for t in inm.split(",")] or inm.strip() == "*"
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@app.get("/api/topics")
+@log_timing(logger_api_learn)
+async def api_topics(request: Request):
+    snapshot = await run_db(content_store.snapshot)
+    logger_api_learn.info(f"Serving /api/topics list ({len(snapshot.content)} topics) version={snapshot.version}")
+
+    etag = f'"{snapshot.version}"'
+    last_modified = datetime.fromtimestamp(snapshot.mtime, tz=timezone.utc)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.topics_json, media_type="application/json", headers=headers)
+
+
+@app.get("/api/search")
+@log_timing(logger_api_learn)
+async def api_search(request: Request):
+    args = request.query_params
+    query = args.get("q", "").strip()
+    if not query:
+        return error(400, "q required")
+    try:
+        limit = int(args.get("limit", SEARCH_LIMIT_DEFAULT))
+    except ValueError:
+        return error(400, "invalid limit")
+    return JSONResponse(await run_db(
+        search_topics,
+        query,
+        limit,
+        prefix=flag_arg(args.get("prefix")),
+        fuzzy=flag_arg(args.get("fuzzy")),
+    ))
+
+
+# -------------------------
+# Sessions
+# -------------------------
+@app.post("/api/session/store")
+@log_timing(logger_api_learn)
+async def api_store_session(request: Request):
+    data = await read_json(request)
+    user_id = data.get("user_id")
+    payload = data.get("payload", {})
+    if not user_id:
+        logger_api_learn.warning("/api/session/store called without user_id")
+        return error(400, "user_id required")
+    try:
+        await run_db(store_session, user_id, payload)
+        return {"status": "ok"}
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+
+@app.get("/api/session/{user_id}")
+@log_timing(logger_api_memory)
+async def api_get_session(user_id: str, request: Request):
+    args = request.query_params
+    # No paging args: keep the original "latest record" response
+    if "limit" not in args and "before" not in args:
+        last = await run_db(get_last_session, user_id)
+        if not last:
+            return {"status": "empty"}
+        return last
+
+    try:
+        limit = min(max(int(args.get("limit", SESSION_PAGE_DEFAULT)), 1), SESSION_PAGE_MAX)
+        before = int(args["before"]) if "before" in args else None
+        records, next_cursor = await run_db(session_store.tail, user_id, limit, before)
+    except ValueError:
+        return error(400, "invalid limit or before cursor")
+    except Exception as e:
+        logger_app.exception(f"Failed to read sessions for {user_id}: {e}")
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+    return {"user_id": user_id, "records": records, "next_cursor": next_cursor}
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(content=REGISTRY.render(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+
+# -------------------------
+# Evaluation
+# -------------------------
+@app.post("/api/evaluate")
+@log_timing(logger_api_evaluate)
+async def api_evaluate():
+    logger_api_evaluate.info("Evaluation requested")
+    job = await run_db(eval_jobs.submit)
+    body = {**job.to_dict(), "links": job_links(job)}
+    status = 200 if job.status in FINISHED else 202
+    return JSONResponse(body, status_code=status, headers={"Location": body["links"]["status"]})
+
+
+@app.get("/api/evaluate/{job_id}")
+@log_timing(logger_api_evaluate)
+async def api_evaluate_status(job_id: str):
+    job = await run_db(eval_jobs.get, job_id)
+    if job is None:
+        return error(404, f"unknown job: {job_id}")
+    return {**job.to_dict(), "links": job_links(job)}
+
+
+@app.get("/api/evaluate/{job_id}/report")
+@log_timing(logger_api_evaluate)
+async def api_evaluate_report(job_id: str):
+    job = await run_db(eval_jobs.get, job_id, report=True)
+    if job is None:
+        return error(404, f"unknown job: {job_id}")
+    body, status = job_report_response(job)
+    return JSONResponse(body, status_code=status)
+
+
+async def _job_events(job_id, poll=0.25, heartbeat=15.0):
+    """
+    Async version of JobManager.stream: polls the job's version instead of holding
+    a thread. Jobs running in this worker are read in memory, others from jobs.db.
+    """
+    version = -1
+    last_sent = 0.0
+    while True:
+        job = eval_jobs.peek(job_id) or await run_db(eval_jobs.get, job_id)
+        if job is None:
+            return
+        if job.version != version or time.monotonic() - last_sent >= heartbeat:
+            version = job.version
+            last_sent = time.monotonic()
+            yield sse(job.to_dict())
+            if job.status in FINISHED:
+                return
+        await asyncio.sleep(poll)
+
+
+@app.get("/api/evaluate/{job_id}/stream")
+async def api_evaluate_stream(job_id: str):
+    job = await run_db(eval_jobs.get, job_id)
+    if job is None:
+        return error(404, f"unknown job: {job_id}")
+    return StreamingResponse(_job_events(job_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+# -------------------------
+# Run Server
+# -------------------------
+if __name__ == "__main__":
+    import uvicorn
+
+    workers = int(os.getenv("ALCA_WORKERS", "4"))
+    if workers > 1:
+        # Workers inherit this: session reads then never depend on another process's buffer
+        os.environ.setdefault("ALCA_SESSION_BUFFER", "0")
+    logger_app.info(f"Starting ALCA ASGI server at 127.0.0.1:8000 workers={workers}")
+    uvicorn.run("asgi:app", host="127.0.0.1", port=8000, workers=workers)
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger_agents = logging.getLogger("alca.agents")
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def background_loop():
+    """Process-wide event loop (on a daemon thread) that owns all explanation tasks."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="alca-explain-loop", daemon=True)
+            thread.start()
+            _loop = loop
+        return _loop
+
+
+class AsyncExplainer:
+    """
+    asyncio front-end for a blocking `generate(topic, level, fallback_text)`.
+
+    - every call has a deadline; on expiry the caller gets `fallback_text`
+      immediately while the model call keeps running in the background
+    - a semaphore caps the number of model calls in flight
+    - identical (topic, level, fallback_text) requests that overlap share one
+      model call (the fallback is part of the prompt, so it's part of the key)
+
+    All tasks live on one background loop, so sync callers (Flask threads)
+    and async callers (ASGI handlers) coalesce with each other.
+    """
+
+    def __init__(self, generate, timeout=3.0, max_in_flight=4):
+        self.generate = generate
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="alca-llm")
+        self._semaphore = None
+        self._inflight = {}  # (topic, level, fallback_text) -> asyncio.Task, touched only on the background loop
+        self.coalesced = 0
+        self.timeouts = 0
+
+    # ---------------------------------------------
+    # runs on the background loop
+    # ---------------------------------------------
+    async def _call_model(self, topic, level, fallback_text):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self.generate, topic, level, fallback_text)
+
+    async def _explain(self, topic, level, fallback_text, timeout):
+        key = (topic, level, fallback_text)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call_model(topic, level, fallback_text))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        try:
+            # shield: one caller timing out must not cancel the shared call
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger_agents.warning(f"AsyncExplainer timeout topic={topic} level={level} after {timeout}s")
+            return fallback_text
+        except Exception:
+            logger_agents.exception(f"AsyncExplainer model call failed topic={topic} level={level}")
+            return fallback_text
+
+    # ---------------------------------------------
+    # PUBLIC API
+    # ---------------------------------------------
+    async def explain(self, topic, level, fallback_text, timeout=None):
+        """Awaitable from any event loop."""
+        timeout = self.timeout if timeout is None else timeout
+        future = asyncio.run_coroutine_threadsafe(
+            self._explain(topic, level, fallback_text, timeout), background_loop()
+        )
+        return await asyncio.wrap_future(future)
+
+    def explain_sync(self, topic, level, fallback_text, timeout=None):
+        """Blocking variant for worker threads; returns within roughly `timeout` seconds."""
+        timeout = self.timeout if timeout is None else timeout
+        future = asyncio.run_coroutine_threadsafe(
+            self._explain(topic, level, fallback_text, timeout), background_loop()
+        )
+        return future.result()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._inflight),
+            "max_in_flight": self.max_in_flight,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+        }
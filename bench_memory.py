@@ -0,0 +1,79 @@
+# bench_memory.py
+"""
+Throughput benchmark for MemoryManager.
+
+Compares the legacy baseline (a fresh connection per call, no stats cache,
+no write-behind) with the pooled WAL mode and the write-behind buffer, single-threaded and with concurrent
+writer/reader threads. Each run uses its own temporary database so memory.db
+is never touched.
+
+    python bench_memory.py --attempts 2000 --threads 4
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from memory import MemoryManager
+
+
+def _run_mode(pool_size, attempts, threads, write_behind=False, cache_size=10000):
+    tmp_dir = tempfile.mkdtemp(prefix="alca_bench_")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    memory = MemoryManager(db_path, pool_size=pool_size, write_behind=write_behind, cache_size=cache_size)
+
+    errors = []
+    per_thread = max(1, attempts // threads)
+
+    def worker(n):
+        user_id = f"bench_{n}"
+        for i in range(per_thread):
+            try:
+                memory.record_attempt(user_id, "stacks", f"q{i % 5}", "LIFO", "LIFO", i % 3 != 0)
+                memory.get_user_topic_stats(user_id, "stacks")
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    memory.close()  # includes draining the write-behind buffer
+    elapsed = time.perf_counter() - start
+
+    for name in os.listdir(tmp_dir):
+        os.remove(os.path.join(tmp_dir, name))
+    os.rmdir(tmp_dir)
+
+    total = per_thread * threads
+    return {
+        "attempts": total,
+        "seconds": round(elapsed, 3),
+        "attempts_per_sec": round(total / elapsed, 1),
+        "lock_errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MemoryManager throughput benchmark")
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'mode':<14}{'threads':>8}{'attempts/s':>14}{'seconds':>10}{'lock errs':>11}")
+    for threads in sorted({1, args.threads}):
+        # "before" is the original MemoryManager: pool_size=0 opens a fresh
+        # connection per call (no WAL pragmas) and cache_size=0 reads stats from SQLite
+        for label, pool_size, write_behind, cache_size in (("before", 0, False, 0),
+                                                           ("pooled+wal", 8, False, 10000),
+                                                           ("write-behind", 8, True, 10000)):
+            r = _run_mode(pool_size, args.attempts, threads, write_behind, cache_size)
+            print(f"{label:<14}{threads:>8}{r['attempts_per_sec']:>14}{r['seconds']:>10}{r['lock_errors']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench_similarity.py
+"""
+Micro-benchmark for the grading similarity engines against the old difflib scorer.
+
+Builds (student, correct) pairs from every answer in the content file plus
+typical student mistakes (case, spacing, typos, truncation, reversal as in
+the evaluator's simulation, other answers) and reports per-engine speed,
+mean score drift and how often the pass/fail decision agrees with difflib.
+
+    python bench_similarity.py sample_content_expanded.json --repeat 20
+"""
+import argparse
+import json
+import random
+import time
+
+from grading import ENGINES, prepare_answer
+
+
+difflib_score = ENGINES["difflib"].score
+
+
+def _variants(answer, rng, others):
+    yield answer
+    yield answer.upper()
+    yield answer.replace(" ", "")
+    yield f"  {answer}  "
+    yield answer[::-1]
+    yield answer[: max(1, len(answer) // 2)]
+    if len(answer) > 2:
+        i = rng.randrange(len(answer))
+        yield answer[:i] + answer[i + 1:]                      # deletion
+        yield answer[:i] + rng.choice("abcdefghij") + answer[i:]  # insertion
+    yield rng.choice(others)
+
+
+def build_pairs(content, seed=7, long_answers=True):
+    rng = random.Random(seed)
+    answers = []
+    for data in content.values():
+        for key in ("diagnostic", "practice"):
+            answers.extend(q["answer"] for q in data.get(key, []) if isinstance(q, dict))
+
+    pairs = [(v, a) for a in answers for v in _variants(a, rng, answers)]
+    if long_answers:
+        # free-text style answers, where difflib's cost grows fastest
+        sentence = " ".join(rng.choice(answers) for _ in range(40))
+        pairs += [(sentence[::-1], sentence), (sentence.upper(), sentence), (sentence[:-30], sentence)]
+    return pairs
+
+
+def _time(fn, pairs, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for s, c in pairs:
+            fn(s, c)
+    return (time.perf_counter() - start) / (repeat * len(pairs)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similarity engine micro-benchmark")
+    parser.add_argument("content_file", nargs="?", default="sample_content_expanded.json")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    with open(args.content_file, "r", encoding="utf-8") as f:
+        content = json.load(f)
+    pairs = build_pairs(content)
+
+    baseline = [difflib_score(s, c) for s, c in pairs]
+    base_us = _time(difflib_score, pairs, args.repeat)
+
+    print(f"{len(pairs)} pairs, threshold={args.threshold}")
+    print(f"{'engine':<14}{'us/pair':>10}{'speedup':>10}{'mean |diff|':>13}{'agree':>9}")
+    print(f"{'difflib':<14}{base_us:>10.2f}{1.0:>10.2f}{0.0:>13.4f}{100.0:>8.1f}%")
+
+    for name, engine in ENGINES.items():
+        if name == "difflib":
+            continue
+        # warm the per-correct-answer cache, as it would be in a running server
+        for _, c in pairs:
+            prepare_answer(c)
+        scores = [engine.score(s, c) for s, c in pairs]
+        us = _time(engine.score, pairs, args.repeat)
+
+        diff = sum(abs(a - b) for a, b in zip(scores, baseline)) / len(pairs)
+        agree = sum((a >= args.threshold) == (b >= args.threshold) for a, b in zip(scores, baseline))
+        print(f"{name:<14}{us:>10.2f}{base_us / us:>10.2f}{diff:>13.4f}{100.0 * agree / len(pairs):>8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
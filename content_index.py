@@ -0,0 +1,80 @@
+from types import MappingProxyType
+
+from grading import AnswerKey, question_answer_key
+
+_EMPTY = ()
+
+
+class QuestionIndex:
+    """
+    Lookup tables over a content dict, built once per content load.
+
+    Question lists are stored as tuples keyed by topic (and difficulty), so
+    agents can pick a question with a dict lookup plus random.choice instead
+    of filtering the whole practice bank on every call. Each question's
+    answer (and "aliases") is precompiled into an AnswerKey.
+    """
+
+    def __init__(self, content):
+        practice = {}
+        by_difficulty = {}
+        diagnostic = {}
+        by_id = {}
+        keys = {}
+
+        for topic, data in content.items():
+            questions = tuple(data.get("practice", []))
+            practice[topic] = questions
+
+            buckets = {}
+            for q in questions:
+                buckets.setdefault(q.get("difficulty"), []).append(q)
+            by_difficulty[topic] = MappingProxyType({d: tuple(qs) for d, qs in buckets.items()})
+
+            diagnostic[topic] = tuple(data.get("diagnostic", []))
+
+            ids = {}
+            # Practice ids win over diagnostic ids if a topic ever reuses one
+            for q in diagnostic[topic] + questions:
+                if isinstance(q, dict) and "id" in q:
+                    ids[q["id"]] = q
+            by_id[topic] = ids
+            keys[topic] = {qid: question_answer_key(q) for qid, q in ids.items()}
+
+        self._practice = practice
+        self._by_difficulty = by_difficulty
+        self._diagnostic = diagnostic
+        self._by_id = by_id
+        self._keys = keys
+
+    def practice(self, topic):
+        """All practice questions for a topic (empty tuple if unknown)."""
+        return self._practice.get(topic, _EMPTY)
+
+    def by_difficulty(self, topic, difficulty):
+        """Practice questions of exactly this difficulty (may be empty)."""
+        buckets = self._by_difficulty.get(topic)
+        if buckets is None:
+            return _EMPTY
+        return buckets.get(difficulty, _EMPTY)
+
+    def practice_for(self, topic, difficulty):
+        """Questions of this difficulty, falling back to the whole bank when there are none."""
+        return self.by_difficulty(topic, difficulty) or self.practice(topic)
+
+    def diagnostic(self, topic):
+        return self._diagnostic.get(topic, _EMPTY)
+
+    def get(self, topic, question_id):
+        """Look up a practice or diagnostic question by id."""
+        ids = self._by_id.get(topic)
+        if ids is None:
+            return None
+        return ids.get(question_id)
+
+    def answer_key(self, topic, question_id) -> AnswerKey:
+        """Precompiled AnswerKey for a question, or None if unknown."""
+        keys = self._keys.get(topic)
+        if keys is None:
+            return None
+        return keys.get(question_id)
@@ -0,0 +1,122 @@
+import json
+import hashlib
+import os
+import threading
+import time
+import logging
+from types import MappingProxyType
+
+from agents import Orchestrator, GeminiExplanationAgent
+from content_index import QuestionIndex
+from search_index import SearchIndex
+from memory import MemoryManager
+from metrics import timed
+
+logger_app = logging.getLogger("alca.app")
+
+
+class ContentSnapshot:
+    """One immutable load of the content file plus the agent graph built on it."""
+
+    def __init__(self, content_file, content, mtime, memory: MemoryManager,
+                 gemini_agent: GeminiExplanationAgent = None, content_hash=None):
+        self.content_file = content_file
+        self.content = content
+        self.mtime = mtime
+        self.content_hash = content_hash
+        self.loaded_at = time.time()
+        self.index = QuestionIndex(content)
+        self.search_index = SearchIndex(content)
+        self.orchestrator = Orchestrator(content, memory, index=self.index, gemini_agent=gemini_agent)
+        self.topics_json = self._build_topics_json(content)
+
+    @staticmethod
+    def _build_topics_json(content):
+        """Serialized /api/topics body, built once per content version."""
+        topics_list = []
+        for name, data in content.items():
+            topics_list.append({
+                "name": name,
+                "has_explanations": "explanations" in data,
+                "has_practice": "practice" in data
+            })
+        return json.dumps({"topics": topics_list}, indent=4).encode("utf-8")
+
+    @property
+    def version(self):
+        return self.content_hash or f"{self.mtime:.6f}"
+
+
+class ContentStore:
+    """
+    Process-wide holder for the parsed content file and its Orchestrator.
+
+    The file is parsed once and shared by every request. snapshot() stats the
+    file at most once per `check_interval` seconds and swaps in a freshly built
+    snapshot when the mtime changes; requests already holding the old snapshot
+    keep using it undisturbed.
+    """
+
+    def __init__(self, content_file="sample_content_expanded.json", memory: MemoryManager = None,
+                 check_interval=1.0):
+        self.content_file = content_file
+        self.memory = memory or MemoryManager()
+        self.check_interval = check_interval
+        # Shared across reloads so in-flight LLM calls and limits survive a swap
+        self.gemini_agent = GeminiExplanationAgent()
+
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        self._snapshot = self._load(os.path.getmtime(content_file))
+
+    # ---------------------------------------------
+    # INTERNAL UTILITIES
+    # ---------------------------------------------
+    def _load(self, mtime):
+        with open(self.content_file, "rb") as f:
+            data = f.read()
+        content = MappingProxyType(json.loads(data.decode("utf-8")))
+        content_hash = hashlib.sha256(data).hexdigest()[:16]
+        logger_app.info(f"Loaded content file={self.content_file} topics={len(content)} mtime={mtime} hash={content_hash}")
+        return ContentSnapshot(self.content_file, content, mtime, self.memory, self.gemini_agent, content_hash)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+
+        with self._lock:
+            if now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+
+            try:
+                mtime = os.path.getmtime(self.content_file)
+            except OSError:
+                logger_app.exception(f"Content file disappeared: {self.content_file}")
+                return
+
+            if mtime == self._snapshot.mtime:
+                return
+
+            try:
+                self._snapshot = self._load(mtime)
+            except Exception:
+                # Half-written or invalid file: keep serving the previous snapshot.
+                logger_app.exception(f"Failed to reload content file={self.content_file}")
+
+    # ---------------------------------------------
+    # PUBLIC API
+    # ---------------------------------------------
+    @timed("content_lookup")
+    def snapshot(self) -> ContentSnapshot:
+        self._maybe_reload()
+        return self._snapshot
+
+    @property
+    def content(self):
+        return self.snapshot().content
+
+    @property
+    def orchestrator(self):
+        return self.snapshot().orchestrator
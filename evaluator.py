@@ -1,69 +1,285 @@
+import os
 import json
 import time
+import zlib
 import random
-import difflib
+import shutil
+import tempfile
 import statistics
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+from grading import AnswerKey, answer_key, get_engine
+from metrics import latency_summary, timed
+
 try:
-    from agents import Orchestrator
+    from agents import GeminiExplanationAgent, Orchestrator
+    from explanation_cache import ExplanationCache
+    from gemini_tool import GeminiTool
     from memory import MemoryManager
 except Exception:
     Orchestrator = None
     MemoryManager = None
 
 
-def evaluate_answer(student_answer: str, correct_answer: str) -> bool:
-    """Simple exact match check (lowercased)."""
-    if not isinstance(student_answer, str):
-        student_answer = ""
-    if not isinstance(correct_answer, str):
-        correct_answer = ""
-    return student_answer.strip().lower() == correct_answer.strip().lower()
+@timed("grading")
+def evaluate_answer(student_answer: str, correct_answer: str, key: AnswerKey = None) -> bool:
+    """Exact match after normalization, against the answer or any accepted alias in `key`."""
+    if key is None:
+        key = answer_key(correct_answer if isinstance(correct_answer, str) else "")
+    return key.is_exact(student_answer)
 
 
 # ------------------------------
 # Internal similarity scorer
 # ------------------------------
-def similarity_score(a: str, b: str) -> float:
+def similarity_score(a: str, b: str, engine: str = None) -> float:
+    """Score `a` (student) against `b` (correct) with a grading.py engine (default: difflib, or ALCA_SIMILARITY_ENGINE)."""
     if a is None or b is None:
         return 0.0
-    return difflib.SequenceMatcher(None, a.strip().lower(), b.strip().lower()).ratio()
+    return get_engine(engine).score(a, b)
+
+
+@timed("grading")
+def grade(student_answer: str, correct_answer: str, threshold: float = 0.8, engine: str = None,
+          key: AnswerKey = None) -> dict:
+    # Equal after normalization ("O(log n)" == "o(logn)") or to an alias counts as exact
+    if key is None:
+        key = answer_key(correct_answer if isinstance(correct_answer, str) else "")
+    return key.grade(student_answer, threshold, engine)
+
+
+def grade_batch(student_answers, correct_answers, threshold: float = 0.8, keys=None) -> list:
+    """
+    Grade answer sheets in one call; similarity scores are shared for repeated pairs.
+    keys: optional AnswerKey per item (precompiled by QuestionIndex).
+    """
+    if keys is None:
+        keys = [None] * len(correct_answers)
+    results = []
+    seen = {}
+    for student_answer, correct_answer, key in zip(student_answers, correct_answers, keys):
+        memo = (student_answer, correct_answer, id(key))
+        if memo not in seen:
+            seen[memo] = grade(student_answer, correct_answer, threshold, key=key)
+        results.append(dict(seen[memo]))
+    return results
+
+
+# ------------------------------
+# Isolated evaluation database
+# ------------------------------
+class EvalDatabase:
+    """
+    Throwaway SQLite database for one evaluation run, so eval users never
+    land in the production memory.db.
+
+    Lives in /dev/shm (RAM) when available, otherwise the system temp dir,
+    and is deleted on exit. `snapshot_db` optionally replays real user stats
+    (and history) into it first, to benchmark against realistic table sizes.
+
+    `gemini_agent` is the explainer to run the agents with. It never touches
+    the production explanations.db: with llm=True it calls the configured
+    model but caches into the throwaway directory; with llm=False it always
+    returns the static explanation, which keeps benchmarks deterministic.
+    """
+
+    def __init__(self, snapshot_db: str = None, include_history: bool = False, max_users: int = None,
+                 llm: bool = True):
+        self.snapshot_db = snapshot_db
+        self.include_history = include_history
+        self.max_users = max_users
+        self.llm = llm
+        self.memory = None
+        self.gemini_agent = None
+        self.loaded = None
+        self._tmp_dir = None
+        self._explain_cache = None
+
+    def __enter__(self):
+        base = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+        self._tmp_dir = tempfile.mkdtemp(prefix="alca_eval_", dir=base)
+        self.memory = MemoryManager(os.path.join(self._tmp_dir, "eval.db"))
+        if self.llm:
+            self._explain_cache = ExplanationCache(os.path.join(self._tmp_dir, "explanations.db"))
+            tool = GeminiTool(cache=self._explain_cache)
+        else:
+            tool = GeminiTool(enabled=False)
+        self.gemini_agent = GeminiExplanationAgent(tool)
+        if self.snapshot_db:
+            self.loaded = self.memory.import_snapshot(
+                self.snapshot_db, include_history=self.include_history, max_users=self.max_users
+            )
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.memory is not None:
+            self.memory.close()
+        if self._explain_cache is not None:
+            self._explain_cache.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        return False
+
+
+# ------------------------------
+# Benchmark helpers
+# ------------------------------
+BENCH_STAGES = ("diagnose", "learn", "practice", "grade")
+
+# legacy evaluation_report.json field -> benchmark stage
+LEGACY_STAGE_FIELDS = {
+    "diagnose": "diagnosis_latency_ms",
+    "learn": "explanation_latency_ms",
+    "practice": "practice_latency_ms",
+}
+
+
+def _benchmark_topic(content: dict, topic: str, seed: int, warmup: int, iterations: int,
+                     snapshot: dict = None) -> dict:
+    """
+    Benchmark one topic in a fresh agent graph and throwaway database.
+    Runs in a worker process; module level so it can be pickled.
+    """
+    # Stable per-topic seed (hash() is salted per process)
+    topic_seed = seed ^ zlib.crc32(topic.encode("utf-8"))
+    random.seed(topic_seed)          # agents pick questions via the random module
+    rng = random.Random(topic_seed)  # simulated student answers
+
+    with EvalDatabase(**(snapshot or {}), llm=False) as db:
+        orch = Orchestrator(content, db.memory, gemini_agent=db.gemini_agent)
+        user_id = f"bench_{topic}"
+        samples = {stage: [] for stage in BENCH_STAGES}
+        scores = []
+
+        for i in range(warmup + iterations):
+            timings = {}
+
+            start = time.perf_counter()
+            orch.handle(user_id, topic, "diagnose")
+            timings["diagnose"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            orch.handle(user_id, topic, "learn")
+            timings["learn"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            prac = orch.handle(user_id, topic, "practice")
+            timings["practice"] = time.perf_counter() - start
+
+            q = prac.get("question")
+            if isinstance(q, dict):
+                ans = q.get("answer", "")
+                student_answer = ans if rng.random() < 0.6 else ans[::-1]
+                start = time.perf_counter()
+                g = grade(student_answer, ans)
+                orch.grade_answer(user_id, topic, q.get("id"), student_answer, ans)
+                timings["grade"] = time.perf_counter() - start
+                if i >= warmup:
+                    scores.append(g["score"])
+
+            if i >= warmup:
+                for stage, seconds in timings.items():
+                    samples[stage].append(seconds * 1000.0)
+
+        return {
+            "samples_ms": samples,
+            "average_practice_score": round(statistics.mean(scores), 4) if scores else None,
+        }
 
 
-def grade(student_answer: str, correct_answer: str, threshold: float = 0.8) -> dict:
-    if student_answer.strip().lower() == correct_answer.strip().lower():
-        return {"correct": True, "score": 1.0}
-    score = similarity_score(student_answer, correct_answer)
-    return {"correct": score >= threshold, "score": score}
+def compare_reports(current: dict, baseline: dict, tolerance: float = 0.25, metric: str = "p95",
+                    min_delta_ms: float = 0.5) -> list:
+    """
+    Return regressions of `current` (a benchmark report) against `baseline`.
+
+    baseline may be another benchmark report (compared on `metric`) or a
+    legacy evaluation_report.json (per-topic mean latencies, compared on the
+    current mean). A stage regresses when it is more than `tolerance` slower
+    and by at least `min_delta_ms`, which keeps sub-millisecond noise quiet.
+    """
+    regressions = []
+    legacy = baseline.get("mode") != "benchmark"
+
+    for topic, cur in current.get("topics", {}).items():
+        base = baseline.get("topics", {}).get(topic)
+        if not base:
+            continue
+        for stage, cur_stats in cur.get("stages", {}).items():
+            if legacy:
+                field = LEGACY_STAGE_FIELDS.get(stage)
+                base_value = base.get(field) if field else None
+                cur_value = cur_stats.get("mean")
+                used = "mean"
+            else:
+                base_value = base.get("stages", {}).get(stage, {}).get(metric)
+                cur_value = cur_stats.get(metric)
+                used = metric
+            if base_value is None or cur_value is None:
+                continue
+            if cur_value > base_value * (1 + tolerance) and cur_value - base_value >= min_delta_ms:
+                regressions.append({
+                    "topic": topic,
+                    "stage": stage,
+                    "metric": used,
+                    "baseline_ms": base_value,
+                    "current_ms": cur_value,
+                    "ratio": round(cur_value / base_value, 2) if base_value else None,
+                })
+    return regressions
 
 
 # ------------------------------
 # Evaluator CLASS 
 # ------------------------------
 class Evaluator:
-    def __init__(self, runs_per_topic: int = 5):
+    def __init__(self, runs_per_topic: int = 5, snapshot_db: str = None,
+                 snapshot_history: bool = False, snapshot_users: int = None):
+        """
+        Runs always use an isolated EvalDatabase. snapshot_db (e.g. "memory.db")
+        replays real user stats into it first; snapshot_history also copies
+        history rows, snapshot_users caps how many users are copied.
+        """
         self.runs_per_topic = runs_per_topic
+        self.snapshot = None
+        if snapshot_db:
+            self.snapshot = {
+                "snapshot_db": snapshot_db,
+                "include_history": snapshot_history,
+                "max_users": snapshot_users,
+            }
 
-    def run_full_evaluation(self, content_file: str = "sample_content_expanded.json") -> dict:
+    def run_full_evaluation(self, content_file: str = "sample_content_expanded.json", progress=None) -> dict:
         """Full evaluation used by /api/evaluate"""
         p = Path(content_file)
         if not p.exists():
             return {"error": f"Dataset not found: {content_file}"}
 
         content = json.loads(p.read_text(encoding="utf-8"))
+        return self.evaluate_content(content, progress=progress)
 
+    def evaluate_content(self, content: dict, progress=None) -> dict:
+        """
+        Evaluate an already-loaded content dict.
+
+        progress: optional callable(done, total, topic) invoked after each topic.
+        """
         if Orchestrator and MemoryManager:
-            return self._evaluate_with_agents(content)
+            return self._evaluate_with_agents(content, progress)
         else:
             return self._dataset_only_stats(content)
 
     # ---------------------------------------------------------
     # agent-driven evaluation
     # ---------------------------------------------------------
-    def _evaluate_with_agents(self, content: dict) -> dict:
-        memory = MemoryManager()
-        orch = Orchestrator(content, memory)
+    def _evaluate_with_agents(self, content: dict, progress=None) -> dict:
+        with EvalDatabase(**(self.snapshot or {})) as db:
+            report = self._run_agents(content, db.memory, progress, db.gemini_agent)
+            if db.loaded:
+                report["snapshot"] = db.loaded
+            return report
+
+    def _run_agents(self, content: dict, memory, progress=None, gemini_agent=None) -> dict:
+        orch = Orchestrator(content, memory, gemini_agent=gemini_agent)
 
         report = {"timestamp": time.time(), "topics": {}}
 
@@ -80,10 +296,10 @@ class Evaluator:
             num_questions = 0
 
             for _ in range(self.runs_per_topic):
-                t = self._time(lambda: orch.handle(user_id, topic, "practice"))
-                practice_times.append(t)
-
+                start = time.perf_counter()
                 prac = orch.handle(user_id, topic, "practice")
+                practice_times.append(time.perf_counter() - start)
+
                 q = prac.get("question")
                 if isinstance(q, dict):
                     ans = q.get("answer")
@@ -111,6 +327,8 @@ class Evaluator:
                 "average_practice_score": round(statistics.mean(practice_scores), 4)
                 if practice_scores else None,
             }
+            if progress:
+                progress(len(report["topics"]), len(content), topic)
 
         all_scores = [
             report["topics"][t]["average_practice_score"]
@@ -127,6 +345,68 @@ class Evaluator:
 
         return report
 
+    # ---------------------------------------------------------
+    # benchmark mode
+    # ---------------------------------------------------------
+    def run_benchmark(self, content_file: str = "sample_content_expanded.json", seed: int = 0,
+                      warmup: int = 3, iterations: int = 30, workers: int = None) -> dict:
+        """
+        Deterministic latency benchmark: seeded question choice and answers,
+        `warmup` discarded iterations, then p50/p95/p99 per stage
+        (diagnose/learn/practice/grade), with topics spread across a process pool.
+        """
+        p = Path(content_file)
+        if not p.exists():
+            return {"error": f"Dataset not found: {content_file}"}
+        if not (Orchestrator and MemoryManager):
+            return {"error": "agents unavailable; benchmark mode needs agents.py and memory.py"}
+
+        content = json.loads(p.read_text(encoding="utf-8"))
+        topics = list(content.keys())
+        started = time.time()
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                topic: pool.submit(_benchmark_topic, content, topic, seed, warmup, iterations, self.snapshot)
+                for topic in topics
+            }
+            results = {topic: f.result() for topic, f in futures.items()}
+
+        report = {
+            "mode": "benchmark",
+            "timestamp": started,
+            "config": {
+                "content_file": content_file,
+                "seed": seed,
+                "warmup": warmup,
+                "iterations": iterations,
+                "workers": workers or os.cpu_count(),
+                "snapshot": self.snapshot,
+            },
+            "topics": {},
+            "stages": {},
+        }
+
+        all_samples = {stage: [] for stage in BENCH_STAGES}
+        for topic in topics:
+            res = results[topic]
+            report["topics"][topic] = {
+                "stages": {stage: latency_summary(res["samples_ms"][stage]) for stage in BENCH_STAGES},
+                "average_practice_score": res["average_practice_score"],
+            }
+            for stage in BENCH_STAGES:
+                all_samples[stage].extend(res["samples_ms"][stage])
+
+        report["stages"] = {stage: latency_summary(all_samples[stage]) for stage in BENCH_STAGES}
+        scores = [t["average_practice_score"] for t in report["topics"].values()
+                  if t["average_practice_score"] is not None]
+        report["summary"] = {
+            "num_topics": len(topics),
+            "avg_practice_score_overall": round(statistics.mean(scores), 4) if scores else None,
+            "wall_seconds": round(time.time() - started, 2),
+        }
+        return report
+
     # ---------------------------------------------------------
     # dataset-only evaluation
     # ---------------------------------------------------------
@@ -158,7 +438,7 @@ class Evaluator:
 # ------------------------------
 # CLI entry 
 # ------------------------------
-def main(content_path: str):
+def main(content_path: str, evaluator: "Evaluator" = None):
     p = Path(content_path)
     if not p.exists():
         print(f"ERROR: dataset file not found: {content_path}")
@@ -166,7 +446,7 @@ def main(content_path: str):
 
     content = json.loads(p.read_text(encoding="utf-8"))
 
-    E = Evaluator()
+    E = evaluator or Evaluator()
 
     print("Running evaluator on:", content_path)
     print("Topics found:", len(content))
@@ -183,9 +463,59 @@ def main(content_path: str):
             print(f"  {k}: {v}")
 
 
+def benchmark_main(args, evaluator: "Evaluator" = None) -> int:
+    report = (evaluator or Evaluator()).run_benchmark(
+        args.content_file, seed=args.seed, warmup=args.warmup,
+        iterations=args.iterations, workers=args.workers,
+    )
+    if "error" in report:
+        print(f"ERROR: {report['error']}")
+        return 2
+
+    print(f"{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'n':>7}")
+    for stage, st in report["stages"].items():
+        if st["n"]:
+            print(f"{stage:<10}{st['p50']:>10.3f}{st['p95']:>10.3f}{st['p99']:>10.3f}{st['n']:>7}")
+
+    status = 0
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare_reports(report, baseline, tolerance=args.tolerance)
+        report["regressions"] = regressions
+        if regressions:
+            status = 1
+            print(f"\n{len(regressions)} regression(s) vs {args.baseline}:")
+            for r in regressions:
+                print(f"  {r['topic']} / {r['stage']}: {r['baseline_ms']} -> {r['current_ms']} ms ({r['metric']})")
+        else:
+            print(f"\nNo regressions vs {args.baseline}")
+
+    Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Saved {args.out}")
+    return status
+
+
 if __name__ == "__main__":
+    import argparse
     import sys
-    if len(sys.argv) < 2:
-        print("Usage: python evaluator.py <path-to-sample_content_expanded.json>")
-    else:
-        main(sys.argv[1])
+
+    parser = argparse.ArgumentParser(description="ALCA evaluator")
+    parser.add_argument("content_file", help="path to sample_content_expanded.json")
+    parser.add_argument("--benchmark", action="store_true", help="run the latency benchmark instead")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--baseline", help="report to compare against (benchmark or evaluation_report.json)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging")
+    parser.add_argument("--out", default="benchmark_report.json")
+    parser.add_argument("--snapshot-db", help="replay user stats from this database (e.g. memory.db), read-only")
+    parser.add_argument("--snapshot-history", action="store_true", help="also replay history rows")
+    parser.add_argument("--snapshot-users", type=int, default=None, help="cap on users replayed")
+    args = parser.parse_args()
+
+    E = Evaluator(snapshot_db=args.snapshot_db, snapshot_history=args.snapshot_history,
+                  snapshot_users=args.snapshot_users)
+    if args.benchmark:
+        sys.exit(benchmark_main(args, E))
+    main(args.content_file, E)
@@ -0,0 +1,133 @@
+import hashlib
+import threading
+import time
+
+from memory import ConnectionPool
+
+
+def prompt_key(model_name, prompt):
+    """Content address for a generated explanation: same model + prompt -> same key."""
+    return hashlib.sha256(f"{model_name}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    """
+    SQLite-backed cache of generated explanations keyed by prompt hash.
+
+    Entries expire `ttl` seconds after they were generated and the least
+    recently used ones are evicted once the table exceeds `max_entries`.
+    Because the prompt embeds the dataset's fallback text, editing an
+    explanation in the content file produces a new key; the stale entry is
+    simply never hit again and ages out.
+    """
+
+    TOUCH_INTERVAL = 60.0   # don't rewrite last_used more often than this per hit
+    EVICT_EVERY = 50        # puts between eviction sweeps
+
+    def __init__(self, db_path="explanations.db", ttl=7 * 24 * 3600, max_entries=5000, clock=time.time):
+        """clock: source of the current time in seconds (tests pass a fake one)."""
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self._pool = ConnectionPool(db_path, max_idle=4)
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+        with self._pool.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS explanations (
+                    key TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    gen_ms REAL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_explanations_last_used ON explanations (last_used)")
+            conn.commit()
+
+    def get(self, key):
+        now = self.clock()
+        with self._pool.connection() as conn:
+            row = conn.execute(
+                "SELECT text, created, last_used, gen_ms FROM explanations WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and row[1] + self.ttl < now:
+                conn.execute("DELETE FROM explanations WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+
+            if row is not None and now - row[2] > self.TOUCH_INTERVAL:
+                conn.execute("UPDATE explanations SET last_used = ? WHERE key = ?", (now, key))
+                conn.commit()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_ms += row[3] or 0.0
+        return row[0]
+
+    def put(self, key, text, gen_ms=0.0):
+        now = self.clock()
+        with self._pool.connection() as conn:
+            conn.execute("""
+                INSERT INTO explanations (key, text, created, last_used, gen_ms)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    text = excluded.text,
+                    created = excluded.created,
+                    last_used = excluded.last_used,
+                    gen_ms = excluded.gen_ms
+            """, (key, text, now, now, gen_ms))
+            conn.commit()
+
+        with self._lock:
+            self._puts += 1
+            sweep = self._puts % self.EVICT_EVERY == 0
+        if sweep:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used beyond max_entries."""
+        with self._pool.connection() as conn:
+            conn.execute("DELETE FROM explanations WHERE created < ?", (self.clock() - self.ttl,))
+            conn.execute("""
+                DELETE FROM explanations WHERE key IN (
+                    SELECT key FROM explanations
+                    ORDER BY last_used DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+            conn.commit()
+
+    def contains(self, key):
+        """Whether a live entry exists (doesn't count as a hit or miss)."""
+        with self._pool.connection() as conn:
+            row = conn.execute("SELECT created FROM explanations WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] + self.ttl >= self.clock()
+
+    def stats(self):
+        with self._pool.connection() as conn:
+            size = conn.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "latency_saved_ms": round(self.saved_ms, 1),
+            }
+
+    def close(self):
+        self._pool.close()
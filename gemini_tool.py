@@ -1,6 +1,9 @@
 import os
+import time
 import google.generativeai as genai
 from dotenv import load_dotenv
+from explanation_cache import ExplanationCache, prompt_key
+from metrics import timed
 
 # Force-load .env using absolute path (Windows safe)
 env_path = os.path.join(os.path.dirname(__file__), ".env")
@@ -10,12 +13,79 @@ load_dotenv(env_path)
 # Load API key from environment
 GEMINI_KEY = os.getenv("GEMINI_API_KEY")
 
+# ALCA_GEMINI_STUB=<latency_ms> swaps in StubModel (local testing / load tests)
+GEMINI_STUB = os.getenv("ALCA_GEMINI_STUB")
+
+# Where generated explanations are cached; set to "" to disable the cache
+EXPLAIN_CACHE_PATH = os.getenv("ALCA_EXPLAIN_CACHE", "explanations.db")
+
+MODEL_NAME = "gemini-pro"
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Offline stand-in for GenerativeModel with a configurable fixed latency."""
+
+    def __init__(self, latency=0.5):
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        return StubResponse(f"[stub] {prompt.strip()}")
+
+
 class GeminiTool:
-    def __init__(self):
-        self.enabled = GEMINI_KEY is not None and GEMINI_KEY.strip() != ""
-        if self.enabled:
-            genai.configure(api_key=GEMINI_KEY)
-            self.model = genai.GenerativeModel("gemini-pro")
+    def __init__(self, model=None, cache: ExplanationCache = None, enabled: bool = None):
+        """
+        cache: where generated explanations are stored by prompt hash.
+        Defaults to an ExplanationCache at ALCA_EXPLAIN_CACHE when the tool is enabled.
+        enabled=False: never call a model, whatever the environment says
+        (explain() always returns the fallback text).
+        """
+        if model is None and GEMINI_STUB and enabled is not False:
+            model = StubModel(float(GEMINI_STUB) / 1000.0)
+
+        if enabled is False:
+            self.enabled = False
+            self.model_name = MODEL_NAME
+        elif model is not None:
+            self.enabled = True
+            self.model = model
+            self.model_name = type(model).__name__
+        else:
+            self.enabled = GEMINI_KEY is not None and GEMINI_KEY.strip() != ""
+            self.model_name = MODEL_NAME
+            if self.enabled:
+                genai.configure(api_key=GEMINI_KEY)
+                self.model = genai.GenerativeModel(MODEL_NAME)
+
+        if cache is None and self.enabled and EXPLAIN_CACHE_PATH:
+            cache = ExplanationCache(EXPLAIN_CACHE_PATH)
+        self.cache = cache
+
+    @staticmethod
+    def build_prompt(topic, difficulty, fallback_text):
+        return f"""
+Explain the topic "{topic}" at a "{difficulty}" difficulty level.
+Use simple language and help the student understand the concept.
+Base explanation for context:
+{fallback_text}
+"""
+
+    def cache_key(self, topic, difficulty, fallback_text):
+        return prompt_key(self.model_name, self.build_prompt(topic, difficulty, fallback_text))
+
+    def lookup(self, topic, difficulty, fallback_text):
+        """Cached explanation for this prompt, or None."""
+        if self.cache is None:
+            return None
+        return self.cache.get(self.cache_key(topic, difficulty, fallback_text))
 
     def explain(self, topic, difficulty, fallback_text):
         """
@@ -25,16 +95,29 @@ class GeminiTool:
         if not self.enabled:
             return fallback_text
 
-        prompt = f"""
-Explain the topic "{topic}" at a "{difficulty}" difficulty level.
-Use simple language and help the student understand the concept.
-Base explanation for context:
-{fallback_text}
-"""
+        cached = self.lookup(topic, difficulty, fallback_text)
+        if cached is not None:
+            return cached
+        return self.generate(topic, difficulty, fallback_text)
+
+    @timed("llm_explanation")
+    def _call_model(self, prompt):
+        return self.model.generate_content(prompt)
+
+    def generate(self, topic, difficulty, fallback_text):
+        """Always call the model (no cache lookup), storing a successful result."""
+        if not self.enabled:
+            return fallback_text
+
+        prompt = self.build_prompt(topic, difficulty, fallback_text)
 
         try:
-            response = self.model.generate_content(prompt)
+            start = time.perf_counter()
+            response = self._call_model(prompt)
+            gen_ms = (time.perf_counter() - start) * 1000.0
             if response and hasattr(response, "text"):
+                if self.cache is not None:
+                    self.cache.put(prompt_key(self.model_name, prompt), response.text, gen_ms)
                 return response.text
             return fallback_text
         except Exception:
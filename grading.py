@@ -0,0 +1,254 @@
+# grading.py
+"""
+Answer normalization, accepted-answer keys and fuzzy similarity engines.
+
+This is the single grading implementation behind evaluator.evaluate_answer,
+evaluator.grade and FeedbackAgent.grade. Engines score a student answer
+against a correct answer in [0, 1]. The per-correct-answer work
+(normalization, tokenization, the bit masks for the edit-distance kernel)
+is cached, so grading many submissions against the same question only pays
+for the student side.
+
+Normalization only folds case, Unicode forms and whitespace. Operators and
+punctuation carry meaning in answers ("O(n!)", "left < root", "l + (r - l) / 2")
+and are kept, so answers that differ by one are never scored as identical.
+"""
+import difflib
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+# Inputs are clipped to this many characters so one pathological answer
+# can't make grading slow.
+MAX_ANSWER_CHARS = 512
+
+# Words, or single non-space symbols: "o(log n)" -> o ( log n )
+_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+
+# ------------------------------------------------------
+# Normalization
+# ------------------------------------------------------
+def normalize_answer(text) -> str:
+    """Lowercase, Unicode-fold and collapse whitespace; punctuation and operators are kept."""
+    if not isinstance(text, str):
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(text.split())[:MAX_ANSWER_CHARS]
+
+
+def answer_tokens(text) -> list:
+    """Words and operator symbols of the normalized answer."""
+    return _TOKEN.findall(normalize_answer(text))
+
+
+def compact_answer(text) -> str:
+    """
+    Exact-match key: casefolded with all whitespace removed, nothing else
+    ("O(log n)" -> "o(logn)"). Not clipped or Unicode-folded, so long answers
+    and look-alikes such as "n²" vs "n2" only match when they really are equal.
+    """
+    if not isinstance(text, str):
+        return ""
+    return "".join(text.casefold().split())
+
+
+# ------------------------------------------------------
+# Edit distance (bit-parallel, Hyyrö 2001)
+# ------------------------------------------------------
+def _pattern_masks(pattern):
+    peq = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    return peq
+
+
+def _levenshtein(peq, m, text):
+    """Edit distance between the pattern behind `peq` (length m) and `text` in O(len(text)) word ops."""
+    if m == 0:
+        return len(text)
+    full = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for ch in text:
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+    return score
+
+
+def levenshtein_distance(a: str, b: str) -> int:
+    return _levenshtein(_pattern_masks(a), len(a), b)
+
+
+class PreparedAnswer:
+    """Everything about a correct answer that engines reuse across submissions."""
+
+    __slots__ = ("normalized", "compact", "peq", "tokens")
+
+    def __init__(self, text):
+        self.normalized = normalize_answer(text)
+        self.compact = self.normalized.replace(" ", "")
+        self.peq = _pattern_masks(self.compact)
+        self.tokens = frozenset(_TOKEN.findall(self.normalized))
+
+
+@lru_cache(maxsize=4096)
+def prepare_answer(text) -> PreparedAnswer:
+    return PreparedAnswer(text)
+
+
+def _ratio(a: str, b: str) -> float:
+    longest = max(len(a), len(b))
+    if longest == 0:
+        return 1.0
+    return 1.0 - levenshtein_distance(a, b) / longest
+
+
+# ------------------------------------------------------
+# Engines
+# ------------------------------------------------------
+class DifflibEngine:
+    """
+    The original scorer: difflib ratio on the stripped, lowercased answers.
+    Still the default; the faster engines are opt-in until
+    bench_similarity.py shows they agree with it. Both sides are clipped to
+    MAX_ANSWER_CHARS, since SequenceMatcher is quadratic in the worst case.
+    """
+
+    name = "difflib"
+
+    def score(self, student_answer, correct_answer) -> float:
+        student = student_answer.strip().lower()[:MAX_ANSWER_CHARS]
+        correct = correct_answer.strip().lower()[:MAX_ANSWER_CHARS]
+        return difflib.SequenceMatcher(None, student, correct).ratio()
+
+
+class LevenshteinEngine:
+    """Normalized edit-distance similarity on the compact form of both answers."""
+
+    name = "levenshtein"
+
+    def score(self, student_answer, correct_answer) -> float:
+        prepared = prepare_answer(correct_answer)
+        # Folded and clipped exactly like the correct side (compact_answer is for exact keys only)
+        student = normalize_answer(student_answer).replace(" ", "")
+        longest = max(len(student), len(prepared.compact))
+        if longest == 0:
+            return 1.0
+        distance = _levenshtein(prepared.peq, len(prepared.compact), student)
+        return 1.0 - distance / longest
+
+
+class TokenSetEngine:
+    """
+    Word-order-insensitive similarity (token-set ratio): compares the shared
+    words and symbols plus each side's leftovers, so "log n O()" matches "O(log n)".
+    Extra words on one side are forgiven ("O(n) time" vs "O(n)"); an extra
+    operator is not, so "O(n!)" doesn't become a perfect match for "O(n)".
+    """
+
+    name = "token_set"
+
+    def score(self, student_answer, correct_answer) -> float:
+        prepared = prepare_answer(correct_answer)
+        student_tokens = frozenset(answer_tokens(student_answer))
+        if not student_tokens and not prepared.tokens:
+            return 1.0
+
+        shared = student_tokens & prepared.tokens
+        extra_student = student_tokens - prepared.tokens
+        extra_correct = prepared.tokens - student_tokens
+        common = " ".join(sorted(shared))
+        with_student = " ".join(sorted(shared) + sorted(extra_student))
+        with_correct = " ".join(sorted(shared) + sorted(extra_correct))
+
+        return max(
+            # each of these ignores the *other* side's leftovers
+            _ratio(common, with_student) if common and _words_only(extra_correct) else 0.0,
+            _ratio(common, with_correct) if common and _words_only(extra_student) else 0.0,
+            _ratio(with_student, with_correct),
+        )
+
+
+def _words_only(tokens):
+    return all(t[0].isalnum() or t[0] == "_" for t in tokens)
+
+
+ENGINES = {
+    DifflibEngine.name: DifflibEngine(),
+    LevenshteinEngine.name: LevenshteinEngine(),
+    TokenSetEngine.name: TokenSetEngine(),
+}
+
+_default_engine = ENGINES[os.getenv("ALCA_SIMILARITY_ENGINE", "difflib")]
+
+
+def get_engine(name=None):
+    if name is None:
+        return _default_engine
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown similarity engine: {name} (choose from {sorted(ENGINES)})")
+
+
+def set_default_engine(name):
+    global _default_engine
+    _default_engine = get_engine(name)
+
+
+def register_engine(engine):
+    """Plug in another engine: any object with `name` and `score(student, correct)`."""
+    ENGINES[engine.name] = engine
+
+
+# ------------------------------------------------------
+# Accepted-answer keys
+# ------------------------------------------------------
+class AnswerKey:
+    """
+    A question's canonical answer plus any aliases, precompiled for grading.
+
+    Exact grading is a set lookup on compact_answer(); fuzzy grading takes
+    the best engine score over the canonical answer and its aliases.
+    """
+
+    __slots__ = ("answer", "variants", "accepted")
+
+    def __init__(self, answer, aliases=()):
+        self.answer = answer if isinstance(answer, str) else ""
+        self.variants = (self.answer,) + tuple(a for a in aliases if isinstance(a, str))
+        self.accepted = frozenset(compact_answer(v) for v in self.variants)
+
+    def is_exact(self, student_answer) -> bool:
+        return compact_answer(student_answer) in self.accepted
+
+    def grade(self, student_answer, threshold: float = 0.8, engine=None) -> dict:
+        if self.is_exact(student_answer):
+            return {"correct": True, "score": 1.0}
+        scorer = get_engine(engine)
+        score = max(scorer.score(student_answer, v) for v in self.variants)
+        return {"correct": score >= threshold, "score": score}
+
+
+@lru_cache(maxsize=4096)
+def answer_key(answer, aliases=()) -> AnswerKey:
+    """Cached AnswerKey for callers that only have the answer string."""
+    return AnswerKey(answer, aliases)
+
+
+def question_answer_key(question) -> AnswerKey:
+    """AnswerKey for a content question dict; aliases come from its optional "aliases" list."""
+    return AnswerKey(question.get("answer"), tuple(question.get("aliases", ())))
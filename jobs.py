@@ -0,0 +1,381 @@
+# jobs.py
+"""
+Background evaluation jobs for /api/evaluate.
+
+POST /api/evaluate no longer runs the evaluator inside the request: it
+enqueues a job and returns its id. At most `max_concurrent` evaluations run
+at once on a worker pool; the rest wait queued. Clients poll
+/api/evaluate/<job_id> for progress, fetch /api/evaluate/<job_id>/report when
+it is done, or follow /api/evaluate/<job_id>/stream.
+
+Finished reports are cached by content hash: asking again for content that
+was already evaluated returns a completed job straight away, and a request
+for content that is being evaluated right now joins the running job.
+
+Job state and reports live in SQLite (`jobs.db`), so with several uvicorn
+workers any worker can answer a poll, report or stream for a job another
+worker accepted. The evaluation itself runs in the accepting process; a job
+whose process has gone away is marked failed the next time it is looked up.
+Each job row records its owner's pid, process start time and a per-manager
+token, so a restart that reuses the pid (PID 1 in a container) or an
+unrelated process that picked it up doesn't keep a dead job "running".
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from evaluator import Evaluator
+from memory import ConnectionPool
+
+logger_evaluator = logging.getLogger("alca.evaluator")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+JOB_COLUMNS = ("id", "content_hash", "status", "done", "total", "topic", "error", "cached",
+               "created", "started", "finished", "version", "owner_pid", "owner_start", "owner_token")
+
+SQL_SAVE_JOB = f"""
+    INSERT OR REPLACE INTO jobs ({", ".join(JOB_COLUMNS)})
+    VALUES ({", ".join("?" for _ in JOB_COLUMNS)})
+"""
+SQL_SELECT_JOB = f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs WHERE id = ?"
+SQL_SELECT_ACTIVE = f"""
+    SELECT {', '.join(JOB_COLUMNS)} FROM jobs
+    WHERE content_hash = ? AND status IN ('{QUEUED}', '{RUNNING}')
+    ORDER BY created
+"""
+
+
+def _process_start(pid):
+    """Start time of `pid` in clock ticks since boot (Linux), or None if unknown."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def _process_alive(pid, start=None):
+    """Whether `pid` is running and, when `start` is known, is still the same process."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    if start is not None:
+        current = _process_start(pid)
+        if current is not None and current != start:
+            return False          # the pid has been reused
+    return True
+
+
+class Job:
+    """One evaluation run. `version` increases on every change, for streaming."""
+
+    def __init__(self, content_hash, owner_token=None):
+        self.id = uuid.uuid4().hex
+        self.content_hash = content_hash
+        self.status = QUEUED
+        self.done = 0
+        self.total = None
+        self.topic = None
+        self.report = None
+        self.error = None
+        self.cached = False
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+        self.owner_pid = os.getpid()
+        self.owner_start = _process_start(self.owner_pid)
+        self.owner_token = owner_token
+        self._changed = threading.Condition()
+
+    @classmethod
+    def from_row(cls, row):
+        job = cls.__new__(cls)
+        for name, value in zip(JOB_COLUMNS, row):
+            setattr(job, name, value)
+        job.cached = bool(job.cached)
+        job.report = None
+        job._changed = threading.Condition()
+        return job
+
+    def row(self):
+        return tuple(int(self.cached) if name == "cached" else getattr(self, name) for name in JOB_COLUMNS)
+
+    def update(self, **fields):
+        with self._changed:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self.version += 1
+            self._changed.notify_all()
+
+    def wait(self, version, timeout):
+        """Block until the job moves past `version` (or timeout); returns the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "content_hash": self.content_hash,
+            "progress": {"done": self.done, "total": self.total, "topic": self.topic},
+            "cached": self.cached,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobManager:
+    """
+    Runs evaluations on a bounded worker pool; jobs and reports are kept in SQLite.
+
+    db_path:        shared job database (ALCA_JOBS_DB)
+    max_concurrent: evaluations running at once in this process (others stay queued)
+    max_jobs:       finished jobs kept for polling before the oldest are dropped
+    max_reports:    reports cached by content hash (plus any still referenced by a kept job)
+    poll_interval:  how often stream() re-reads a job running in another process
+    """
+
+    def __init__(self, content_store, db_path="jobs.db", max_concurrent=1, max_jobs=100, max_reports=8,
+                 evaluator_factory=Evaluator, poll_interval=0.25):
+        self.content_store = content_store
+        self.max_jobs = max_jobs
+        self.max_reports = max_reports
+        self.evaluator_factory = evaluator_factory
+        self.poll_interval = poll_interval
+
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="alca-eval")
+        self._db = ConnectionPool(db_path, max_idle=4)
+        self._lock = threading.Lock()
+        self._local = {}                  # job_id -> queued/running Job owned by this manager
+        self._token = uuid.uuid4().hex    # tells this manager's jobs from a previous owner of the pid
+
+        with self._db.connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    done INTEGER DEFAULT 0,
+                    total INTEGER,
+                    topic TEXT,
+                    error TEXT,
+                    cached INTEGER DEFAULT 0,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    version INTEGER DEFAULT 0,
+                    owner_pid INTEGER,
+                    owner_start TEXT,
+                    owner_token TEXT
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column in ("owner_start", "owner_token"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_content ON jobs (content_hash, status)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    content_hash TEXT PRIMARY KEY,
+                    report TEXT NOT NULL,
+                    finished REAL NOT NULL
+                )
+            """)
+            conn.commit()
+
+    # ---------------------------------------------
+    # storage
+    # ---------------------------------------------
+    def _save(self, job):
+        with self._db.connection() as conn:
+            conn.execute(SQL_SAVE_JOB, job.row())
+            conn.commit()
+
+    def _update(self, job, **fields):
+        job.update(**fields)
+        self._save(job)
+
+    def _orphaned(self, job):
+        """A queued/running job whose owner is gone: it will never finish."""
+        if job.status in FINISHED:
+            return False
+        if job.owner_token == self._token or (job.owner_token is None and job.owner_pid == os.getpid()):
+            with self._lock:
+                return job.id not in self._local
+        return not _process_alive(job.owner_pid, job.owner_start)
+
+    def _fail_orphan(self, conn, job):
+        job.update(status=FAILED, error="evaluation worker exited", finished=time.time())
+        conn.execute(SQL_SAVE_JOB, job.row())
+
+    def _prune(self, conn):
+        conn.execute(f"""
+            DELETE FROM jobs WHERE id IN (
+                SELECT id FROM jobs WHERE status IN ('{DONE}', '{FAILED}')
+                ORDER BY created DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_jobs,))
+        conn.execute("""
+            DELETE FROM reports
+            WHERE content_hash NOT IN (SELECT content_hash FROM reports ORDER BY finished DESC LIMIT ?)
+              AND content_hash NOT IN (SELECT content_hash FROM jobs)
+        """, (self.max_reports,))
+
+    # ---------------------------------------------
+    # PUBLIC API
+    # ---------------------------------------------
+    def submit(self) -> Job:
+        """Evaluate the current content; returns a new, cached or already-running job."""
+        snapshot = self.content_store.snapshot()
+        content_hash = snapshot.version
+
+        job = None
+        with self._db.connection() as conn:
+            # IMMEDIATE takes the write lock up front, so two workers can't both
+            # decide there is no active job for this content
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for row in conn.execute(SQL_SELECT_ACTIVE, (content_hash,)).fetchall():
+                    active = Job.from_row(row)
+                    if self._orphaned(active):
+                        self._fail_orphan(conn, active)
+                        continue
+                    conn.commit()
+                    logger_evaluator.info(f"Evaluation for content={content_hash} already {active.status} job={active.id}")
+                    return self._local.get(active.id, active)
+
+                job = Job(content_hash, owner_token=self._token)
+                cached = conn.execute("SELECT 1 FROM reports WHERE content_hash = ?", (content_hash,)).fetchone()
+                if cached is not None:
+                    now = time.time()
+                    job.update(status=DONE, cached=True, started=now, finished=now,
+                               done=len(snapshot.content), total=len(snapshot.content))
+                conn.execute(SQL_SAVE_JOB, job.row())
+                self._prune(conn)
+                if not job.cached:
+                    # Registered before the row is visible, or it would look orphaned
+                    with self._lock:
+                        self._local[job.id] = job
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                if job is not None:
+                    with self._lock:
+                        self._local.pop(job.id, None)
+                raise
+
+        if job.cached:
+            logger_evaluator.info(f"Evaluation cache hit content={content_hash} job={job.id}")
+            return job
+
+        self._pool.submit(self._run, job, snapshot.content)
+        logger_evaluator.info(f"Queued evaluation job={job.id} content={content_hash}")
+        return job
+
+    def _run(self, job, content):
+        self._update(job, status=RUNNING, started=time.time(), total=len(content))
+
+        def progress(done, total, topic):
+            self._update(job, done=done, total=total, topic=topic)
+
+        try:
+            try:
+                report = self.evaluator_factory().evaluate_content(content, progress=progress)
+            except Exception as e:
+                logger_evaluator.exception(f"Evaluation job={job.id} failed")
+                self._update(job, status=FAILED, error=str(e), finished=time.time())
+                return
+
+            finished = time.time()
+            with self._db.connection() as conn:
+                conn.execute("INSERT OR REPLACE INTO reports (content_hash, report, finished) VALUES (?, ?, ?)",
+                             (job.content_hash, json.dumps(report), finished))
+                conn.commit()
+            job.report = report
+            self._update(job, status=DONE, finished=finished)
+            logger_evaluator.info(f"Evaluation job={job.id} finished in {job.finished - job.started:.2f}s")
+        finally:
+            with self._lock:
+                self._local.pop(job.id, None)
+
+    def counts(self):
+        """Number of known jobs per status."""
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        with self._db.connection() as conn:
+            for status, n in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+                counts[status] = n
+        return counts
+
+    def peek(self, job_id) -> Job:
+        """The live Job object if this process is running it, without touching the database."""
+        with self._lock:
+            return self._local.get(job_id)
+
+    def get(self, job_id, report=False) -> Job:
+        """Current state of any job, from any worker; `report=True` also loads a finished report."""
+        with self._db.connection() as conn:
+            row = conn.execute(SQL_SELECT_JOB, (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = Job.from_row(row)
+            if self._orphaned(job):
+                self._fail_orphan(conn, job)
+                conn.commit()
+            if report and job.status == DONE:
+                stored = conn.execute("SELECT report FROM reports WHERE content_hash = ?",
+                                      (job.content_hash,)).fetchone()
+                job.report = json.loads(stored[0]) if stored else None
+        return job
+
+    def stream(self, job, poll_timeout=15.0):
+        """
+        Yield job.to_dict() snapshots as the job changes until it finishes.
+        Emits the current state again every `poll_timeout` seconds as a heartbeat.
+        Jobs running here are followed by waiting on the Job; others by polling SQLite.
+        """
+        version = -1
+        last_sent = 0.0
+        while True:
+            current = self.peek(job.id) or self.get(job.id)
+            if current is None:       # pruned meanwhile
+                return
+            if current.version != version or time.monotonic() - last_sent >= poll_timeout:
+                version = current.version
+                last_sent = time.monotonic()
+                yield current.to_dict()
+                if current.status in FINISHED:
+                    return
+            local = self.peek(job.id)
+            if local is not None:
+                local.wait(version, poll_timeout)
+            else:
+                time.sleep(self.poll_interval)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        # Cancelled jobs would otherwise sit queued until another worker noticed this process is gone
+        with self._lock:
+            queued = [job for job in self._local.values() if job.status == QUEUED]
+        for job in queued:
+            self._update(job, status=FAILED, error="server shutting down", finished=time.time())
+
+
+def sse(event) -> str:
+    """Format a job state as one server-sent event."""
+    return f"event: {event['status']}\ndata: {json.dumps(event)}\n\n"
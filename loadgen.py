@@ -0,0 +1,393 @@
+# loadgen.py
+"""
+Load generator for the ALCA Flask API.
+
+Drives /api/learn, /api/memory and /api/session from a pool of concurrent
+virtual users and reports throughput, latency histograms and error rates per
+endpoint. Traffic either replays the recorded sessions/*.jsonl logs
+("serve_question" / "answer" actions, keeping their relative timing) or is
+synthesized with a configurable number of users and think time.
+
+    python main.py                                    # in another shell
+    python loadgen.py synth --users 10,25,50,100 --duration 20
+    python loadgen.py replay --sessions sessions --speed 50 --loops 5
+
+Passing several user counts runs one stage per count, so the first stage
+where error rates or p95 latency jump shows the request rate the server
+(SQLite locking, per-request LearningSystem setup) stops keeping up with.
+Besides this repo's metrics.py (for the shared latency summary) only the
+standard library is used, so it runs from any machine with a checkout.
+"""
+import argparse
+import glob
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+from metrics import latency_summary
+
+ENDPOINTS = ("learn_question", "learn_answer", "memory", "session")
+
+# Histogram bucket upper bounds in ms (last bucket is open-ended)
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+# ------------------------------
+# HTTP client
+# ------------------------------
+class Client:
+    """One keep-alive connection per virtual user; reconnects when the server closes it."""
+
+    def __init__(self, base_url, timeout=10.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._conn = None
+
+    def request(self, method, path, payload=None):
+        """Returns (status, body_dict_or_None). Raises on connection errors."""
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                resp = self._conn.getresponse()
+                raw = resp.read()
+                if resp.getheader("Connection", "").lower() == "close" or resp.version == 10:
+                    self.close()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Stale keep-alive connection: retry once on a fresh one
+                self.close()
+                if attempt == 2:
+                    raise
+            except Exception:
+                self.close()
+                raise
+        try:
+            data = json.loads(raw) if raw else None
+        except ValueError:
+            data = None
+        return resp.status, data
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# ------------------------------
+# Metrics
+# ------------------------------
+class Recorder:
+    """Thread-safe latency/status collector for one stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {name: [] for name in ENDPOINTS}
+        self.statuses = {name: {} for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+        self.error_samples = []
+
+    def record(self, endpoint, ms, status, error=None):
+        with self._lock:
+            self.samples[endpoint].append(ms)
+            key = str(status) if status is not None else "exception"
+            self.statuses[endpoint][key] = self.statuses[endpoint].get(key, 0) + 1
+            if error is not None or status is None or status >= 500:
+                self.errors[endpoint] += 1
+                if error is not None and len(self.error_samples) < 20:
+                    self.error_samples.append(f"{endpoint}: {error}")
+
+    def report(self, seconds):
+        endpoints = {}
+        total = errors = 0
+        for name in ENDPOINTS:
+            samples = self.samples[name]
+            if not samples:
+                continue
+            total += len(samples)
+            errors += self.errors[name]
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": self.errors[name],
+                "error_rate": round(self.errors[name] / len(samples), 4),
+                "statuses": self.statuses[name],
+                "latency_ms": latency_summary(samples),
+                "histogram": histogram(samples),
+            }
+        return {
+            "seconds": round(seconds, 3),
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "throughput_rps": round(total / seconds, 1) if seconds else 0.0,
+            "endpoints": endpoints,
+            "error_samples": self.error_samples,
+        }
+
+
+def histogram(samples_ms) -> dict:
+    counts = {}
+    for ms in samples_ms:
+        for bound in BUCKETS_MS:
+            if ms <= bound:
+                label = f"<={bound}"
+                break
+        else:
+            label = f">{BUCKETS_MS[-1]}"
+        counts[label] = counts.get(label, 0) + 1
+    labels = [f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+    return {label: counts[label] for label in labels if label in counts}
+
+
+# ------------------------------
+# Traffic
+# ------------------------------
+def _load_answers(content_file):
+    """topic -> list of practice answers, used to answer correctly or plausibly wrong."""
+    if not content_file or not os.path.exists(content_file):
+        return {}
+    with open(content_file, "r", encoding="utf-8") as f:
+        content = json.load(f)
+    return {
+        topic: [q["answer"] for q in data.get("practice", []) if isinstance(q, dict) and "answer" in q]
+        for topic, data in content.items()
+    }
+
+
+def load_traces(session_dir):
+    """
+    Read sessions/*.jsonl into per-user action lists: [(delay_s, action, topic), ...]
+    where delay_s is the recorded gap since the user's previous action.
+    Records that are not serve_question/answer actions are skipped.
+    """
+    traces = []
+    for path in sorted(glob.glob(os.path.join(session_dir, "*.jsonl"))):
+        steps = []
+        prev_ts = None
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                data = record.get("data") or {}
+                if data.get("action") not in ("serve_question", "answer") or not data.get("topic"):
+                    continue
+                ts = record.get("ts")
+                delay = max(0.0, ts - prev_ts) if isinstance(ts, (int, float)) and prev_ts is not None else 0.0
+                prev_ts = ts if isinstance(ts, (int, float)) else prev_ts
+                steps.append((delay, data["action"], data["topic"]))
+        if steps:
+            traces.append((os.path.splitext(os.path.basename(path))[0], steps))
+    return traces
+
+
+class VirtualUser:
+    """Runs one user's script against the API, recording every request."""
+
+    def __init__(self, base_url, user_id, recorder, answers, rng, accuracy=0.7, read_every=5, timeout=10.0):
+        self.client = Client(base_url, timeout=timeout)
+        self.user_id = user_id
+        self.recorder = recorder
+        self.answers = answers
+        self.rng = rng
+        self.accuracy = accuracy
+        self.read_every = read_every
+        self._steps = 0
+
+    def _call(self, endpoint, method, path, payload=None):
+        start = time.perf_counter()
+        try:
+            status, _ = self.client.request(method, path, payload)
+            error = None if status < 500 else f"HTTP {status}"
+        except Exception as e:
+            status, error = None, f"{type(e).__name__}: {e}"
+        self.recorder.record(endpoint, (time.perf_counter() - start) * 1000.0, status, error)
+
+    def _answer_for(self, topic):
+        pool = self.answers.get(topic) or ["I don't know"]
+        answer = self.rng.choice(pool)
+        return answer if self.rng.random() < self.accuracy else answer[::-1]
+
+    def step(self, action, topic):
+        if action == "serve_question":
+            self._call("learn_question", "POST", "/api/learn", {"user_id": self.user_id, "topic": topic})
+        else:
+            self._call("learn_answer", "POST", "/api/learn",
+                       {"user_id": self.user_id, "topic": topic, "answer": self._answer_for(topic)})
+
+        self._steps += 1
+        if self.read_every and self._steps % self.read_every == 0:
+            uid = quote(self.user_id, safe="")
+            self._call("memory", "GET", f"/api/memory/{uid}?limit=20")
+            self._call("session", "GET", f"/api/session/{uid}?limit=10")
+
+    def close(self):
+        self.client.close()
+
+
+def _sleep_until(deadline, seconds):
+    """Think time, but never past the stage deadline. Returns False once the deadline passed."""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        return False
+    time.sleep(min(seconds, remaining))
+    return time.monotonic() < deadline
+
+
+def run_synth_stage(base_url, users, duration, think_ms, topics, answers, seed, accuracy, read_every, timeout):
+    """`users` concurrent virtual users, each looping question -> answer with exponential think time."""
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def run(n):
+        rng = random.Random(seed * 100003 + n)
+        user = VirtualUser(base_url, f"load_{seed}_{n}", recorder, answers, rng, accuracy, read_every, timeout)
+        try:
+            while time.monotonic() < deadline:
+                topic = rng.choice(topics)
+                user.step("serve_question", topic)
+                if not _sleep_until(deadline, rng.expovariate(1000.0 / think_ms) if think_ms else 0):
+                    break
+                user.step("answer", topic)
+                if not _sleep_until(deadline, rng.expovariate(1000.0 / think_ms) if think_ms else 0):
+                    break
+        finally:
+            user.close()
+
+    return _run_threads(run, users, recorder)
+
+
+def run_replay_stage(base_url, users, traces, speed, max_think, loops, duration, answers, seed, accuracy,
+                     read_every, timeout):
+    """
+    Replay recorded traces with `users` concurrent virtual users. Virtual users
+    take traces round-robin, cycling through them again when there are more
+    users than traces; each replays as its own user id and sleeps the recorded
+    gaps divided by `speed`, capped at `max_think` seconds.
+    """
+    recorder = Recorder()
+    deadline = time.monotonic() + duration if duration else float("inf")
+
+    def run(n):
+        rng = random.Random(seed * 100003 + n)
+        for loop in range(loops):
+            for i in range(n, max(len(traces), users), users):
+                name, steps = traces[i % len(traces)]
+                user = VirtualUser(base_url, f"replay_{name}_{n}_{loop}", recorder, answers, rng,
+                                   accuracy, read_every, timeout)
+                try:
+                    for delay, action, topic in steps:
+                        if not _sleep_until(deadline, min(delay / speed, max_think) if speed else 0):
+                            return
+                        user.step(action, topic)
+                finally:
+                    user.close()
+
+    return _run_threads(run, users, recorder)
+
+
+def _run_threads(target, count, recorder):
+    threads = [threading.Thread(target=target, args=(n,), name=f"alca-load-{n}", daemon=True) for n in range(count)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder.report(time.perf_counter() - start)
+
+
+# ------------------------------
+# CLI
+# ------------------------------
+def print_stage(users, report):
+    print(f"\n=== {users} users: {report['requests']} requests in {report['seconds']}s "
+          f"-> {report['throughput_rps']} req/s, error rate {report['error_rate'] * 100:.2f}% ===")
+    print(f"{'endpoint':<16}{'reqs':>8}{'err%':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for name, ep in report["endpoints"].items():
+        lat = ep["latency_ms"]
+        print(f"{name:<16}{ep['requests']:>8}{ep['error_rate'] * 100:>7.2f}%"
+              f"{lat['p50']:>9.1f}{lat['p95']:>9.1f}{lat['p99']:>9.1f}{lat['max']:>9.1f}")
+
+    for name, ep in report["endpoints"].items():
+        print(f"\n  {name} latency (ms)")
+        peak = max(ep["histogram"].values())
+        for label, count in ep["histogram"].items():
+            print(f"  {label:>7} {count:>7} {'#' * max(1, round(40 * count / peak))}")
+
+    for line in report["error_samples"][:5]:
+        print(f"  ! {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay or synthesize traffic against the ALCA API")
+    parser.add_argument("mode", choices=("synth", "replay"))
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", default="10", help="concurrent users; comma-separated list runs one stage each")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per stage (replay: optional cap)")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="synth: mean think time between actions")
+    parser.add_argument("--sessions", default="sessions", help="replay: directory of *.jsonl session logs")
+    parser.add_argument("--speed", type=float, default=10.0, help="replay: divide recorded gaps by this (0 = no waits)")
+    parser.add_argument("--max-think", type=float, default=2.0, help="replay: cap on a single recorded gap (s)")
+    parser.add_argument("--loops", type=int, default=1, help="replay: times each trace is replayed")
+    parser.add_argument("--content", default="sample_content_expanded.json", help="content file for topics/answers")
+    parser.add_argument("--accuracy", type=float, default=0.7, help="share of answers sent correct")
+    parser.add_argument("--read-every", type=int, default=5, help="GET memory+session after every N learn calls")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    args = parser.parse_args()
+
+    stages = [int(u) for u in args.users.split(",") if u.strip()]
+    answers = _load_answers(args.content)
+
+    if args.mode == "replay":
+        traces = load_traces(args.sessions)
+        if not traces:
+            print(f"No serve_question/answer records found in {args.sessions}/*.jsonl")
+            return
+        print(f"Replaying {len(traces)} traces ({sum(len(s) for _, s in traces)} actions) against {args.url}")
+    else:
+        topics = sorted(answers)
+        if not topics:
+            print(f"ERROR: no topics found in content file: {args.content}")
+            return
+        print(f"Synthesizing traffic over {len(topics)} topics against {args.url}")
+
+    results = {"mode": args.mode, "url": args.url, "stages": []}
+    for users in stages:
+        if args.mode == "replay":
+            report = run_replay_stage(args.url, users, traces, args.speed, args.max_think, args.loops,
+                                      args.duration if args.duration > 0 else None, answers, args.seed,
+                                      args.accuracy, args.read_every, args.timeout)
+        else:
+            report = run_synth_stage(args.url, users, args.duration, args.think_ms, topics, answers,
+                                     args.seed, args.accuracy, args.read_every, args.timeout)
+        report["users"] = users
+        results["stages"].append(report)
+        print_stage(users, report)
+
+    if len(stages) > 1:
+        print(f"\n{'users':>7}{'req/s':>10}{'err%':>8}{'p95 learn_answer':>18}")
+        for stage in results["stages"]:
+            p95 = stage["endpoints"].get("learn_answer", {}).get("latency_ms", {}).get("p95", float("nan"))
+            print(f"{stage['users']:>7}{stage['throughput_rps']:>10.1f}{stage['error_rate'] * 100:>7.2f}%{p95:>18.1f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nReport written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
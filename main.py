@@ -1,112 +1,231 @@
+import atexit
+import copy
 import json
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import functools
 import time
-from flask import Flask, request, jsonify
-from agents import Orchestrator
+from datetime import datetime, timezone
+from flask import Flask, request, jsonify, stream_with_context
+from content_store import ContentStore
+from session_store import SessionStore, SessionWriter
 from memory import MemoryManager
-from evaluator import Evaluator, evaluate_answer  
+from evaluator import evaluate_answer, grade_batch
+from jobs import DONE, FAILED, FINISHED, JobManager, sse
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, observe_request
 # -------------------------
 # Paths
 # -------------------------
 LOG_DIR = "logs"
 SESSION_DIR = "sessions"
+CONTENT_FILE = "sample_content_expanded.json"
+MEMORY_PAGE_DEFAULT = 50
+MEMORY_PAGE_MAX = 500
+SESSION_PAGE_DEFAULT = 20
+SESSION_PAGE_MAX = 200
+BATCH_MAX_ANSWERS = 500
+SEARCH_LIMIT_DEFAULT = 10
+SEARCH_LIMIT_MAX = 50
 os.makedirs(LOG_DIR, exist_ok=True)
 os.makedirs(SESSION_DIR, exist_ok=True)
 
 # -------------------------
 # Logging Setup
 # -------------------------
-def make_rotating_handler(path, level=logging.INFO, maxBytes=5*1024*1024, backupCount=3):
+# Request threads only enqueue records; a QueueListener thread formats them
+# and does the file/console I/O, so a slow disk never adds to request latency.
+#
+#   ALCA_LOG_FORMAT=json|text           structured JSON lines (default) or the classic text format
+#   ALCA_LOG_LEVEL=INFO                 default level for all alca.* loggers
+#   ALCA_LOG_LEVELS=alca.api.learn=WARNING,alca.agents=DEBUG   per-logger overrides
+#   ALCA_LOG_PAYLOAD_MAX=256            request payloads in ENTER lines are cut to this many chars
+#   ALCA_LOG_PAYLOAD_SAMPLE=1.0         fraction of requests whose payload is logged at all
+#   ALCA_LOG_QUEUE_SIZE=10000           records beyond this are dropped (and counted), never blocked on
+LOG_FORMAT = os.getenv("ALCA_LOG_FORMAT", "json")
+LOG_LEVEL = os.getenv("ALCA_LOG_LEVEL", "INFO").upper()
+LOG_PAYLOAD_MAX = int(os.getenv("ALCA_LOG_PAYLOAD_MAX", "256"))
+LOG_PAYLOAD_SAMPLE = float(os.getenv("ALCA_LOG_PAYLOAD_SAMPLE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("ALCA_LOG_QUEUE_SIZE", "10000"))
+
+TEXT_FORMAT = "[%(asctime)s] %(levelname)s — %(name)s — %(message)s"
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, any `extra=` fields and exc."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full instead of blocking."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only merge args and render the traceback here; formatting happens on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def make_formatter():
+    return JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+
+
+def make_rotating_handler(path, level=logging.NOTSET, maxBytes=5*1024*1024, backupCount=3, logger_name=None):
     handler = RotatingFileHandler(path, maxBytes=maxBytes, backupCount=backupCount)
     handler.setLevel(level)
-    fmt = logging.Formatter("[%(asctime)s] %(levelname)s — %(name)s — %(message)s")
-    handler.setFormatter(fmt)
+    handler.setFormatter(make_formatter())
+    if logger_name:
+        # All records share one queue; each file only takes its own logger's records
+        handler.addFilter(logging.Filter(logger_name))
     return handler
 
-# Root logger (app)
-logger_app = logging.getLogger("alca.app")
-logger_app.setLevel(logging.INFO)
-logger_app.addHandler(make_rotating_handler(os.path.join(LOG_DIR, "app.log")))
 
-# API loggers (separate files per endpoint as requested A1)
-logger_api_learn = logging.getLogger("alca.api.learn")
-logger_api_learn.setLevel(logging.INFO)
-logger_api_learn.addHandler(make_rotating_handler(os.path.join(LOG_DIR, "api_learn.log")))
+def parse_log_levels(spec):
+    """"alca.api.learn=WARNING,alca.agents=DEBUG" -> {"alca.api.learn": "WARNING", ...}"""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+# logger name -> its own log file (separate files per endpoint as requested A1)
+LOG_FILES = {
+    "alca.app": "app.log",
+    "alca.api.learn": "api_learn.log",
+    "alca.api.memory": "api_memory.log",
+    "alca.api.evaluate": "api_evaluate.log",
+    "alca.agents": "agents.log",
+    "alca.evaluator": "evaluator.log",
+    "alca.memory": "memory.log",
+}
+# Console handler (optional, helpful during development)
+CONSOLE_LOGGERS = ("alca.app", "alca.agents", "alca.memory")
 
-logger_api_memory = logging.getLogger("alca.api.memory")
-logger_api_memory.setLevel(logging.INFO)
-logger_api_memory.addHandler(make_rotating_handler(os.path.join(LOG_DIR, "api_memory.log")))
+log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(log_queue)
 
-logger_api_evaluate = logging.getLogger("alca.api.evaluate")
-logger_api_evaluate.setLevel(logging.INFO)
-logger_api_evaluate.addHandler(make_rotating_handler(os.path.join(LOG_DIR, "api_evaluate.log")))
+console = logging.StreamHandler()
+console.setFormatter(logging.Formatter(TEXT_FORMAT))
+console.addFilter(lambda record: record.name.startswith(CONSOLE_LOGGERS))
+
+log_listener = QueueListener(
+    log_queue,
+    *[make_rotating_handler(os.path.join(LOG_DIR, f), logger_name=name) for name, f in LOG_FILES.items()],
+    console,
+    respect_handler_level=True,
+)
+
+_log_levels = parse_log_levels(os.getenv("ALCA_LOG_LEVELS", ""))
+for _name in LOG_FILES:
+    _logger = logging.getLogger(_name)
+    _logger.setLevel(_log_levels.get(_name, LOG_LEVEL))
+    _logger.addHandler(queue_handler)
+    _logger.propagate = False
+
+log_listener.start()
+atexit.register(log_listener.stop)   # drains the queue on shutdown
 
-# Agents logger
+logger_app = logging.getLogger("alca.app")
+logger_api_learn = logging.getLogger("alca.api.learn")
+logger_api_memory = logging.getLogger("alca.api.memory")
+logger_api_evaluate = logging.getLogger("alca.api.evaluate")
 logger_agents = logging.getLogger("alca.agents")
-logger_agents.setLevel(logging.INFO)
-logger_agents.addHandler(make_rotating_handler(os.path.join(LOG_DIR, "agents.log")))
-
-# Evaluator logger
 logger_evaluator = logging.getLogger("alca.evaluator")
-logger_evaluator.setLevel(logging.INFO)
-logger_evaluator.addHandler(make_rotating_handler(os.path.join(LOG_DIR, "evaluator.log")))
-
-# Console handler (optional, helpful during development)
-console = logging.StreamHandler()
-console.setLevel(logging.INFO)
-console.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s — %(name)s — %(message)s"))
-logger_app.addHandler(console)
-logger_agents.addHandler(console)
 
 # -------------------------
 # Helpers: timing decorator
 # -------------------------
+def loggable_payload():
+    """The request JSON for ENTER lines: sampled and cut to LOG_PAYLOAD_MAX chars."""
+    if LOG_PAYLOAD_SAMPLE < 1.0 and random.random() >= LOG_PAYLOAD_SAMPLE:
+        return "<unsampled>"
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return None
+    text = json.dumps(payload, default=str)
+    if len(text) > LOG_PAYLOAD_MAX:
+        return f"{text[:LOG_PAYLOAD_MAX]}...<{len(text)} chars>"
+    return text
+
+
 def log_timing(api_logger):
     def decorator(fn):
         @functools.wraps(fn)
         def wrapped(*args, **kwargs):
             start = time.time()
+            if api_logger.isEnabledFor(logging.INFO):
+                try:
+                    payload = loggable_payload()
+                except Exception:
+                    payload = None
+                api_logger.info(f"ENTER {fn.__name__} - path={request.path} payload={payload}",
+                                extra={"endpoint": fn.__name__, "path": request.path})
             try:
-                api_logger.info(f"ENTER {fn.__name__} - path={request.path} payload={request.get_json(silent=True)}")
-            except Exception:
-                api_logger.info(f"ENTER {fn.__name__}")
-            result = None
-            try:
-                result = fn(*args, **kwargs)
-                return result
+                return fn(*args, **kwargs)
             finally:
                 elapsed = (time.time() - start) * 1000.0
-                api_logger.info(f"EXIT  {fn.__name__} - took={elapsed:.1f}ms")
+                observe_request(fn.__name__, elapsed / 1000.0)
+                api_logger.info(f"EXIT  {fn.__name__} - took={elapsed:.1f}ms",
+                                extra={"endpoint": fn.__name__, "duration_ms": round(elapsed, 2)})
         return wrapped
     return decorator
 
 # -------------------------
 # session manager 
 # -------------------------
+# Buffered appends with pooled handles; ALCA_SESSION_BUFFER=0 writes synchronously
+session_writer = SessionWriter(SESSION_DIR) if os.getenv("ALCA_SESSION_BUFFER", "1") != "0" else None
+session_store = SessionStore(SESSION_DIR, writer=session_writer)
+
 def store_session(user_id: str, session_data: dict):
-    path = os.path.join(SESSION_DIR, f"{user_id}.jsonl")
     try:
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(json.dumps({"ts": time.time(), "data": session_data}) + "\n")
+        session_store.append(user_id, session_data)
         logger_app.info(f"Stored session for user={user_id}")
     except Exception as e:
         logger_app.exception(f"Failed to store session for {user_id}: {e}")
         raise
 
 def get_last_session(user_id: str):
-    path = os.path.join(SESSION_DIR, f"{user_id}.jsonl")
-    if not os.path.exists(path):
-        return None
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            lines = f.read().strip().splitlines()
-            if not lines:
-                return None
-            last = json.loads(lines[-1])
-            return last
+        return session_store.last(user_id)
     except Exception as e:
         logger_app.exception(f"Failed to read session for {user_id}: {e}")
         return None
@@ -115,15 +234,21 @@ def get_last_session(user_id: str):
 # Core LearningSystem 
 # -------------------------
 class LearningSystem:
-    def __init__(self, content_file="sample_content_expanded.json", user_id="default"):
-        self.user_id = user_id
-        self.memory = MemoryManager()
-        self.content = self.load_content(content_file)
-        self.agent = Orchestrator(self.content, self.memory)
+    """
+    Per-request, per-user view over the shared content store.
 
-    def load_content(self, file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    Construction is cheap: content, memory and the Orchestrator come from the
+    ContentStore snapshot current at the time the request starts.
+    """
+
+    def __init__(self, content_file=CONTENT_FILE, user_id="default", store: ContentStore = None):
+        self.user_id = user_id
+        self.store = store or ContentStore(content_file)
+        snapshot = self.store.snapshot()
+        self.memory = self.store.memory
+        self.content = snapshot.content
+        self.index = snapshot.index
+        self.agent = snapshot.orchestrator
 
     def choose_difficulty(self, topic):
         stats = self.memory.get_user_topic_stats(self.user_id, topic)
@@ -138,17 +263,11 @@ class LearningSystem:
 
     def get_question(self, topic):
         difficulty = self.choose_difficulty(topic)
-        questions = self.content[topic]["practice"]
-
-        filtered = [q for q in questions if q["difficulty"] == difficulty]
-        if not filtered:
-            filtered = questions
-
-        return filtered[0]
+        return self.index.practice_for(topic, difficulty)[0]
 
     def run_step(self, topic, student_answer):
         q = self.get_question(topic)
-        correct = evaluate_answer(student_answer, q["answer"])
+        correct = evaluate_answer(student_answer, q["answer"], key=self.index.answer_key(topic, q["id"]))
 
         self.memory.record_attempt(
             user_id=self.user_id,
@@ -172,8 +291,107 @@ class LearningSystem:
             "stats": self.memory.get_user_topic_stats(self.user_id, topic)
         }
 
-    def get_summary(self):
-        return self.memory.get_user_summary(self.user_id)
+    def run_batch(self, items):
+        """
+        Grade a whole answer sheet in one call.
+
+        items: [{"topic", "answer", "question_id"?}, ...]. Items without a
+        question_id are graded against the adaptive question get_question()
+        would serve. Answers are graded with evaluator.grade and all attempts
+        are stored in a single transaction; stats are read back afterwards.
+        """
+        results = []
+        graded = []     # (result, question, answer) awaiting grade_batch
+
+        for i, item in enumerate(items):
+            topic = item.get("topic") if isinstance(item, dict) else None
+            if topic not in self.content:
+                results.append({"index": i, "topic": topic, "error": "unknown topic"})
+                continue
+
+            qid = item.get("question_id")
+            q = self.index.get(topic, qid) if qid is not None else self.get_question(topic)
+            if q is None:
+                results.append({"index": i, "topic": topic, "question_id": qid, "error": "unknown question_id"})
+                continue
+
+            answer = item.get("answer")
+            answer = "" if answer is None else str(answer)
+            result = {
+                "index": i,
+                "topic": topic,
+                "question_id": q["id"],
+                "question": q["question"],
+                "correct_answer": q["answer"],
+                "your_answer": answer,
+            }
+            results.append(result)
+            graded.append((result, q, answer))
+
+        grades = grade_batch(
+            [a for _, _, a in graded],
+            [q["answer"] for _, q, _ in graded],
+            keys=[self.index.answer_key(r["topic"], q["id"]) for r, q, _ in graded],
+        )
+
+        attempts = []
+        for (result, q, answer), g in zip(graded, grades):
+            result["correct"] = g["correct"]
+            result["score"] = round(g["score"], 4)
+            attempts.append((self.user_id, result["topic"], q["id"], answer, q["answer"], g["correct"]))
+
+        self.memory.record_attempts(attempts)
+
+        topics = {r["topic"] for r in results if "error" not in r}
+        return {
+            "user_id": self.user_id,
+            "graded": len(attempts),
+            "num_correct": sum(1 for a in attempts if a[5]),
+            "results": results,
+            "stats": {t: self.memory.get_user_topic_stats(self.user_id, t) for t in sorted(topics)},
+        }
+
+    def get_summary(self, **filters):
+        return self.memory.get_user_summary(self.user_id, **filters)
+
+# -------------------------
+# Shared, process-wide state
+# -------------------------
+# ALCA_WRITE_BEHIND=1 batches record_attempt commits (drained on shutdown)
+memory_manager = MemoryManager(write_behind=os.getenv("ALCA_WRITE_BEHIND") == "1")
+content_store = ContentStore(CONTENT_FILE, memory_manager)
+# /api/evaluate runs in the background; ALCA_EVAL_CONCURRENCY evaluations at once per process.
+# Jobs are stored in ALCA_JOBS_DB so every worker process can serve them.
+eval_jobs = JobManager(
+    content_store,
+    db_path=os.getenv("ALCA_JOBS_DB", "jobs.db"),
+    max_concurrent=int(os.getenv("ALCA_EVAL_CONCURRENCY", "1")),
+)
+
+
+@REGISTRY.register_collector
+def collect_runtime_metrics():
+    """Cache hit rates, log queue and job counts, read at scrape time."""
+    caches = {"topic_stats": memory_manager.cache_stats()}
+    tool = content_store.gemini_agent.tool
+    if tool.cache is not None:
+        caches["explanations"] = tool.cache.stats()
+    caches = {name: st for name, st in caches.items() if st.get("enabled", True)}
+
+    yield ("alca_cache_hits_total", "counter", "Cache lookups that hit.",
+           [({"cache": n}, st["hits"]) for n, st in caches.items()])
+    yield ("alca_cache_misses_total", "counter", "Cache lookups that missed.",
+           [({"cache": n}, st["misses"]) for n, st in caches.items()])
+    yield ("alca_cache_hit_ratio", "gauge", "Hit rate since process start.",
+           [({"cache": n}, st["hit_rate"]) for n, st in caches.items()])
+    yield ("alca_cache_entries", "gauge", "Entries currently cached.",
+           [({"cache": n}, st["size"]) for n, st in caches.items()])
+    yield ("alca_log_queue_depth", "gauge", "Log records waiting for the writer thread.",
+           [({}, log_queue.qsize())])
+    yield ("alca_log_records_dropped_total", "counter", "Log records dropped because the queue was full.",
+           [({}, queue_handler.dropped)])
+    yield ("alca_eval_jobs", "gauge", "Evaluation jobs by status.",
+           [({"status": s}, n) for s, n in eval_jobs.counts().items()])
 
 # -------------------------
 # Flask API
@@ -190,12 +408,15 @@ def api_learn():
 
     logger_api_learn.info(f"Request /api/learn user_id={user_id} topic={topic} answer_provided={'yes' if answer else 'no'}")
 
-    ls = LearningSystem(user_id=user_id)
-
     if not topic:
         logger_api_learn.warning(f"/api/learn called without topic by {user_id}")
         return jsonify({"error": "topic is required"}), 400
 
+    ls = LearningSystem(user_id=user_id, store=content_store)
+    if topic not in ls.content:
+        logger_api_learn.warning(f"/api/learn unknown topic={topic} user={user_id}")
+        return jsonify({"error": f"unknown topic: {topic}"}), 404
+
     # if no answer supplied -> return a question
     if answer == "":
         q = ls.get_question(topic)
@@ -215,43 +436,108 @@ def api_learn():
     return jsonify(result)
 
 
+@app.post("/api/learn/batch")
+@log_timing(logger_api_learn)
+def api_learn_batch():
+    data = request.get_json() or {}
+    user_id = data.get("user_id", "default")
+    answers = data.get("answers")
+
+    if not isinstance(answers, list) or not answers:
+        logger_api_learn.warning(f"/api/learn/batch called without answers by {user_id}")
+        return jsonify({"error": "answers must be a non-empty list"}), 400
+    if len(answers) > BATCH_MAX_ANSWERS:
+        return jsonify({"error": f"at most {BATCH_MAX_ANSWERS} answers per batch"}), 413
+
+    ls = LearningSystem(user_id=user_id, store=content_store)
+    result = ls.run_batch(answers)
+
+    store_session(user_id, {"action": "answer_batch", "count": result["graded"]})
+    logger_api_learn.info(f"User {user_id} batch graded={result['graded']} correct={result['num_correct']}")
+    return jsonify(result)
+
+
 @app.get("/api/memory/<user_id>")
 @log_timing(logger_api_memory)
 def api_memory(user_id):
-    logger_api_memory.info(f"/api/memory requested for user_id={user_id}")
-    ls = LearningSystem(user_id=user_id)
-    summary = ls.get_summary()
+    logger_api_memory.info(f"/api/memory requested for user_id={user_id} args={dict(request.args)}")
+    try:
+        limit = min(int(request.args.get("limit", MEMORY_PAGE_DEFAULT)), MEMORY_PAGE_MAX)
+        since = int(request.args["since"]) if "since" in request.args else None
+        until = int(request.args["until"]) if "until" in request.args else None
+        ls = LearningSystem(user_id=user_id, store=content_store)
+        summary = ls.get_summary(
+            limit=max(limit, 1),
+            after=request.args.get("after"),
+            topic=request.args.get("topic"),
+            since=since,
+            until=until,
+        )
+    except ValueError:
+        logger_api_memory.warning(f"/api/memory bad query args for user_id={user_id}: {dict(request.args)}")
+        return jsonify({"error": "invalid limit, since, until or after cursor"}), 400
     return jsonify(summary)
 
 
+@app.get("/api/cache/stats")
+@log_timing(logger_api_memory)
+def api_cache_stats():
+    tool = content_store.gemini_agent.tool
+    return jsonify({
+        "topic_stats": memory_manager.cache_stats(),
+        "explanations": tool.cache.stats() if tool.cache is not None else {"enabled": False},
+    })
+
+
 @app.get("/api/topics")
 @log_timing(logger_api_learn)
 def api_topics():
-    try:
-        with open("sample_content_expanded.json", "r", encoding="utf-8") as f:
-            content = json.load(f)
-    except Exception:
-        logger_app.exception("Failed to load content file for /api/topics")
-        return jsonify({"error": "Failed to load content"}), 500
-
-    topics_list = []
-    for name, data in content.items():
-        topics_list.append({
-            "name": name,
-            "has_explanations": "explanations" in data,
-            "has_practice": "practice" in data
-        })
-
-    logger_api_learn.info(f"Serving /api/topics list ({len(topics_list)} topics)")
+    snapshot = content_store.snapshot()
+    logger_api_learn.info(f"Serving /api/topics list ({len(snapshot.content)} topics) version={snapshot.version}")
 
-    # PRETTY JSON OUTPUT
-    return app.response_class(
-        response=json.dumps({"topics": topics_list}, indent=4),
+    # PRETTY JSON OUTPUT, serialized once per content version
+    response = app.response_class(
+        response=snapshot.topics_json,
         status=200,
         mimetype="application/json"
     )
+    response.set_etag(snapshot.version)
+    response.last_modified = datetime.fromtimestamp(snapshot.mtime, tz=timezone.utc)
+    response.cache_control.no_cache = True  # clients must revalidate, which is a cheap 304
+    return response.make_conditional(request)
 
 
+def flag_arg(value, default=True):
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off")
+
+
+def search_topics(query, limit, prefix=True, fuzzy=True):
+    snapshot = content_store.snapshot()
+    limit = min(max(limit, 1), SEARCH_LIMIT_MAX)
+    results = snapshot.search_index.search(query, limit=limit, prefix=prefix, fuzzy=fuzzy)
+    logger_api_learn.info(f"/api/search q={query!r} results={len(results)} version={snapshot.version}")
+    return {"query": query, "results": results}
+
+
+@app.get("/api/search")
+@log_timing(logger_api_learn)
+def api_search():
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "q required"}), 400
+    try:
+        limit = int(request.args.get("limit", SEARCH_LIMIT_DEFAULT))
+    except ValueError:
+        return jsonify({"error": "invalid limit"}), 400
+    return jsonify(search_topics(
+        query,
+        limit,
+        prefix=flag_arg(request.args.get("prefix")),
+        fuzzy=flag_arg(request.args.get("fuzzy")),
+    ))
+
 
 @app.post("/api/session/store")
 @log_timing(logger_api_learn)
@@ -272,37 +558,95 @@ def api_store_session():
 @app.get("/api/session/<user_id>")
 @log_timing(logger_api_memory)
 def api_get_session(user_id):
-    last = get_last_session(user_id)
-    if not last:
-        return jsonify({"status": "empty"})
-    return jsonify(last)
+    # No paging args: keep the original "latest record" response
+    if "limit" not in request.args and "before" not in request.args:
+        last = get_last_session(user_id)
+        if not last:
+            return jsonify({"status": "empty"})
+        return jsonify(last)
+
+    try:
+        limit = min(max(int(request.args.get("limit", SESSION_PAGE_DEFAULT)), 1), SESSION_PAGE_MAX)
+        before = int(request.args["before"]) if "before" in request.args else None
+        records, next_cursor = session_store.tail(user_id, limit, before)
+    except ValueError:
+        return jsonify({"error": "invalid limit or before cursor"}), 400
+    except Exception as e:
+        logger_app.exception(f"Failed to read sessions for {user_id}: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    return jsonify({"user_id": user_id, "records": records, "next_cursor": next_cursor})
+
+
+@app.get("/metrics")
+def metrics():
+    return app.response_class(REGISTRY.render(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
 
 
 # ------------------------------------------------
 # /api/evaluate 
 # ------------------------------------------------
+def job_links(job):
+    base = f"/api/evaluate/{job.id}"
+    return {"status": base, "report": f"{base}/report", "stream": f"{base}/stream"}
+
+
+def job_report_response(job):
+    """(body, status) for a job's report, keeping the old inline /api/evaluate body."""
+    if job.status == DONE:
+        return {"status": "success", "results": job.report}, 200
+    if job.status == FAILED:
+        return {"status": "error", "message": job.error}, 500
+    return {**job.to_dict(), "links": job_links(job)}, 409
+
+
 @app.post("/api/evaluate")
 @log_timing(logger_api_evaluate)
 def api_evaluate():
-    try:
-        logger_api_evaluate.info("Starting full evaluation run")
-        evaluator = Evaluator()  # your evaluator class
-        report = evaluator.run_full_evaluation()
-        logger_evaluator.info("Evaluator finished run_full_evaluation")
-        return jsonify({
-            "status": "success",
-            "results": report
-        })
-    except Exception as e:
-        logger_api_evaluate.exception("Evaluation failed")
-        return jsonify({
-            "status": "error",
-            "message": str(e)
-        }), 500
+    logger_api_evaluate.info("Evaluation requested")
+    job = eval_jobs.submit()
+    body = {**job.to_dict(), "links": job_links(job)}
+    status = 200 if job.status in FINISHED else 202
+    return jsonify(body), status, {"Location": body["links"]["status"]}
+
+
+@app.get("/api/evaluate/<job_id>")
+@log_timing(logger_api_evaluate)
+def api_evaluate_status(job_id):
+    job = eval_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"unknown job: {job_id}"}), 404
+    return jsonify({**job.to_dict(), "links": job_links(job)})
+
+
+@app.get("/api/evaluate/<job_id>/report")
+@log_timing(logger_api_evaluate)
+def api_evaluate_report(job_id):
+    job = eval_jobs.get(job_id, report=True)
+    if job is None:
+        return jsonify({"error": f"unknown job: {job_id}"}), 404
+    body, status = job_report_response(job)
+    return jsonify(body), status
+
+
+@app.get("/api/evaluate/<job_id>/stream")
+def api_evaluate_stream(job_id):
+    """Server-sent events: one event per progress change until the job finishes."""
+    job = eval_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"unknown job: {job_id}"}), 404
+    events = (sse(event) for event in eval_jobs.stream(job))
+    return app.response_class(stream_with_context(events), mimetype="text/event-stream",
+                              headers={"Cache-Control": "no-cache"})
 
 # -------------------------
 # Run Server
 # -------------------------
 if __name__ == "__main__":
+    if os.getenv("ALCA_PREWARM") == "1":
+        from prewarm import start_background_prewarm
+        logger_app.info("Pre-warming explanation cache in the background")
+        start_background_prewarm(content_store.content, content_store.gemini_agent)
+
     logger_app.info("Starting ALCA Flask server at 127.0.0.1:8000")
     app.run(host="127.0.0.1", port=8000, debug=False)
@@ -1,21 +1,390 @@
 import sqlite3
 import json
+import os
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime
+from urllib.parse import quote
+
+from metrics import SQLITE_LOCK_RETRIES, timed
+
+logger_memory = logging.getLogger("alca.memory")
+
+# Applied to every pooled connection. WAL lets readers proceed while another
+# connection writes; NORMAL sync is durable across app crashes in WAL mode.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped I/O
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Statements are kept as module constants so the per-connection statement
+# cache (keyed by SQL text) reuses the prepared form across calls.
+SQL_UPSERT_STATS = """
+    INSERT INTO user_stats (user_id, topic, attempts, correct)
+    VALUES (?, ?, 1, ?)
+    ON CONFLICT(user_id, topic)
+    DO UPDATE SET 
+        attempts = attempts + 1,
+        correct = correct + excluded.correct
+"""
+
+SQL_INSERT_HISTORY = """
+    INSERT INTO history (user_id, topic, question_id, correct,
+                         student_answer, correct_answer, timestamp, ts)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SQL_SELECT_TOPIC_STATS = """
+    SELECT attempts, correct FROM user_stats
+    WHERE user_id = ? AND topic = ?
+"""
+
+# A single counter bumped inside every write transaction, so a process can
+# tell whether anyone else changed user_stats since it last looked.
+SQL_BUMP_CLOCK = "UPDATE stats_clock SET gen = gen + 1 WHERE id = 0"
+SQL_SELECT_CLOCK = "SELECT gen FROM stats_clock WHERE id = 0"
+
+
+# Writes that fail with "database is locked" (busy_timeout exhausted) are
+# retried this many times with exponential backoff before giving up.
+LOCK_RETRIES = 3
+LOCK_BACKOFF = 0.05
+
+# PRAGMA user_version once migrations are done; bump when adding one
+SCHEMA_VERSION = 1
+
+
+def encode_cursor(ts, row_id):
+    return f"{ts}:{row_id}"
+
+
+def decode_cursor(cursor):
+    """Parse an `after` cursor produced by encode_cursor(); raises ValueError if malformed."""
+    ts, _, row_id = str(cursor).partition(":")
+    return int(ts), int(row_id)
+
+
+class ConnectionPool:
+    """
+    Long-lived SQLite connections shared across requests.
+
+    A thread checks out one connection and keeps it for the duration of its
+    outermost `connection()` block; nested blocks on the same thread reuse it.
+    On exit the connection goes back to an idle stack instead of being closed,
+    so short-lived request threads don't pay connect + pragma setup each time.
+    """
+
+    def __init__(self, db_path, max_idle=8, timeout=5.0, cached_statements=128):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._open()
+
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            if conn.in_transaction:
+                conn.rollback()
+            self._release(conn)
+
+    def _release(self, conn):
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class StatsCache:
+    """
+    Bounded LRU of (user_id, topic) -> (attempts, correct) with a TTL.
+
+    Writers bracket their database change with begin_write()/end_write(),
+    which apply the increment to a cached entry (write-through) and bump a
+    per-stripe generation. A reader that missed only stores what it read if
+    no write to the same stripe started or was in flight meanwhile, so a
+    stale row can never overwrite a newer cached value.
+
+    Writes from other processes sharing the database (uvicorn workers) are
+    caught through the stats_clock row: every commit bumps it, and the cache
+    is dropped whenever the clock moved by more than this process's own
+    writes. Readers re-check the clock at most every `sync_interval` seconds,
+    which bounds how stale a hit can be.
+    """
+
+    STRIPES = 64
+
+    def __init__(self, max_size=10000, ttl=300.0, sync_interval=1.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._data = OrderedDict()      # key -> [attempts, correct, expires_at]
+        self._lock = threading.Lock()
+        self._gens = [0] * self.STRIPES
+        self._inflight = [0] * self.STRIPES
+        self._clock = None              # last stats_clock value accounted for
+        self._next_sync = 0.0
+
+    def _stripe(self, key):
+        return hash(key) % self.STRIPES
+
+    def get(self, key):
+        """Return ((attempts, correct) or None, generation token for a later put())."""
+        stripe = self._stripe(key)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[2] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return (entry[0], entry[1]), None
+                del self._data[key]
+            self.misses += 1
+            return None, self._gens[stripe]
+
+    def put(self, key, attempts, correct, token):
+        stripe = self._stripe(key)
+        with self._lock:
+            if token != self._gens[stripe] or self._inflight[stripe]:
+                return
+            self._data[key] = [attempts, correct, time.monotonic() + self.ttl]
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def begin_write(self, key, correct):
+        stripe = self._stripe(key)
+        with self._lock:
+            self._inflight[stripe] += 1
+            self._gens[stripe] += 1
+            entry = self._data.get(key)
+            if entry is not None:
+                entry[0] += 1
+                entry[1] += correct
+
+    def end_write(self, key, ok=True):
+        stripe = self._stripe(key)
+        with self._lock:
+            self._inflight[stripe] -= 1
+            self._gens[stripe] += 1
+            if not ok:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._data.clear()
+        self._gens = [g + 1 for g in self._gens]
+
+    def sync_due(self):
+        """True (once per sync_interval, for one caller) when the clock should be re-read."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sync:
+                return False
+            self._next_sync = now + self.sync_interval
+            return True
+
+    def observe_clock(self, gen, own_write=False):
+        """
+        Account for stats_clock value `gen`, read by a sync or returned by one
+        of our own commits. Anything but the expected value means another
+        connection wrote, so cached entries may be stale and are dropped.
+        Concurrent local commits can arrive out of order; that only costs an
+        extra clear.
+        """
+        with self._lock:
+            expected = self._clock + 1 if own_write and self._clock is not None else self._clock
+            if gen != expected:
+                if self._data:
+                    self.invalidations += 1
+                self._clear()
+            self._clock = gen if self._clock is None else max(self._clock, gen)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
 
 
 class MemoryManager:
-    def __init__(self, db_path="memory.db"):
+    def __init__(self, db_path="memory.db", pool_size=8,
+                 write_behind=False, flush_every=100, flush_interval_ms=50,
+                 cache_size=10000, cache_ttl=300.0, cache_sync_ms=1000):
+        """
+        pool_size: number of idle connections kept open for reuse.
+        0 disables pooling and opens a fresh connection per call.
+
+        write_behind: buffer record_attempt() calls in memory and commit them
+        in one transaction every `flush_every` attempts or `flush_interval_ms`,
+        whichever comes first. Reads still see buffered attempts, and close()
+        (also registered with atexit) drains the buffer.
+
+        cache_size / cache_ttl: bound the in-process (user_id, topic) stats
+        cache used by get_user_topic_stats(). 0 disables it.
+        cache_sync_ms: how often the cache checks for writes made by other
+        processes on the same database (see StatsCache).
+        """
         self.db_path = db_path
+        self._pool = ConnectionPool(db_path, max_idle=pool_size) if pool_size > 0 else None
+        self._cache = StatsCache(cache_size, cache_ttl, cache_sync_ms / 1000.0) if cache_size > 0 else None
         self._create_tables()
 
+        self.write_behind = write_behind
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._closed = False
+        if write_behind:
+            self._buffer = []
+            self._pending = {}          # (user_id, topic) -> [attempts, correct] not yet committed
+            self._flush_seq = 0         # bumped when a flush commits; lets readers detect one overlapping them
+            self._buffer_lock = threading.Lock()
+            self._flush_lock = threading.Lock()
+            self._wakeup = threading.Event()
+            self._flusher = threading.Thread(target=self._flush_loop, name="alca-memory-flush", daemon=True)
+            self._flusher.start()
+            atexit.register(self.close)
+
     # ---------------------------------------------
     # INTERNAL UTILITIES
     # ---------------------------------------------
-    def _connect(self):
-        return sqlite3.connect(self.db_path)
+    @contextmanager
+    def _connection(self):
+        if self._pool is not None:
+            with self._pool.connection() as conn:
+                yield conn
+            return
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self):
+        if self.write_behind:
+            # Flipped under the buffer lock: record_attempts() checks it there too,
+            # so nothing can be buffered after the final drain below.
+            with self._buffer_lock:
+                closed, self._closed = self._closed, True
+        else:
+            closed, self._closed = self._closed, True
+        if closed:
+            return
+        if self.write_behind:
+            self._wakeup.set()
+            self._flusher.join()
+            self.flush()
+        if self._pool is not None:
+            self._pool.close()
+
+    @staticmethod
+    def _write_rows(conn, rows, commit=None):
+        """
+        Apply a batch of history rows (and their stats deltas) in one transaction.
+        `commit(conn)`, if given, replaces the final conn.commit().
+        """
+        cur = conn.cursor()
+        cur.executemany(SQL_UPSERT_STATS, [(r[0], r[1], r[3]) for r in rows])
+        cur.executemany(SQL_INSERT_HISTORY, rows)
+        cur.execute(SQL_BUMP_CLOCK)
+        gen = cur.execute(SQL_SELECT_CLOCK).fetchone()[0]
+        if commit is None:
+            conn.commit()
+        else:
+            commit(conn)
+        return gen
+
+    def _commit_rows(self, rows, op, commit=None):
+        """_write_rows on a pooled connection, retrying when SQLite reports the database locked."""
+        for attempt in range(LOCK_RETRIES + 1):
+            try:
+                with self._connection() as conn:
+                    try:
+                        gen = self._write_rows(conn, rows, commit)
+                    except sqlite3.OperationalError:
+                        conn.rollback()
+                        raise
+                if self._cache is not None:
+                    self._cache.observe_clock(gen, own_write=True)
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == LOCK_RETRIES:
+                    raise
+                SQLITE_LOCK_RETRIES.inc(op=op)
+                logger_memory.warning(f"SQLite locked during {op} ({len(rows)} rows), retry {attempt + 1}/{LOCK_RETRIES}")
+                time.sleep(LOCK_BACKOFF * (2 ** attempt))
 
     def _create_tables(self):
-        conn = self._connect()
+        with self._connection() as conn:
+            self._create_schema(conn)
+
+    def _create_schema(self, conn):
         cur = conn.cursor()
 
         # Stores accuracy, attempts, wins/losses per topic
@@ -39,82 +408,340 @@ class MemoryManager:
                 correct INTEGER,
                 student_answer TEXT,
                 correct_answer TEXT,
-                timestamp TEXT
+                timestamp TEXT,
+                ts INTEGER
             )
         """)
 
+        # Write counter for cross-process cache invalidation (see StatsCache)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS stats_clock (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                gen INTEGER NOT NULL
+            )
+        """)
+        cur.execute("INSERT OR IGNORE INTO stats_clock (id, gen) VALUES (0, 0)")
+
+        # Backfills scan the whole table, so only run them on databases that
+        # haven't recorded the current schema version yet
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate_history_ts(conn)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        # Per-user timelines, newest first, optionally narrowed to one topic
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_history_user_ts
+            ON history (user_id, ts, id)
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_history_user_topic_ts
+            ON history (user_id, topic, ts, id)
+        """)
+
         conn.commit()
-        conn.close()
+
+    @staticmethod
+    def _migrate_history_ts(conn):
+        """Add + backfill the integer `ts` (epoch ms) column on databases created before it existed."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(history)")}
+        if "ts" not in columns:
+            conn.execute("ALTER TABLE history ADD COLUMN ts INTEGER")
+
+        rows = conn.execute("SELECT id, timestamp FROM history WHERE ts IS NULL").fetchall()
+        if not rows:
+            return
+
+        updates = []
+        for row_id, text in rows:
+            try:
+                ts = int(datetime.fromisoformat(text).timestamp() * 1000)
+            except (TypeError, ValueError):
+                ts = 0
+            updates.append((ts, row_id))
+        conn.executemany("UPDATE history SET ts = ? WHERE id = ?", updates)
 
     # ---------------------------------------------
     # MEMORY WRITE OPERATIONS
     # ---------------------------------------------
     def record_attempt(self, user_id, topic, question_id, student_answer, correct_answer, is_correct):
-        conn = self._connect()
-        cur = conn.cursor()
+        self.record_attempts([(user_id, topic, question_id, student_answer, correct_answer, is_correct)])
 
-        # 1. Update cumulative stats
-        cur.execute("""
-            INSERT INTO user_stats (user_id, topic, attempts, correct)
-            VALUES (?, ?, 1, ?)
-            ON CONFLICT(user_id, topic)
-            DO UPDATE SET 
-                attempts = attempts + 1,
-                correct = correct + excluded.correct
-        """, (user_id, topic, 1 if is_correct else 0))
-
-        # 2. Record full history
-        cur.execute("""
-            INSERT INTO history (user_id, topic, question_id, correct,
-                                 student_answer, correct_answer, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            user_id,
-            topic,
-            question_id,
-            1 if is_correct else 0,
-            student_answer,
-            correct_answer,
-            datetime.now().isoformat()
-        ))
+    @timed("record_attempt")
+    def record_attempts(self, attempts):
+        """
+        Record several graded answers at once, committed in a single transaction.
 
-        conn.commit()
-        conn.close()
+        attempts: iterable of (user_id, topic, question_id, student_answer,
+        correct_answer, is_correct) tuples, in the order they were answered.
+        """
+        now = time.time()
+        text_ts = datetime.fromtimestamp(now).isoformat()
+        rows = [
+            (
+                user_id,
+                topic,
+                question_id,
+                1 if is_correct else 0,
+                student_answer,
+                correct_answer,
+                text_ts,
+                int(now * 1000)
+            )
+            for (user_id, topic, question_id, student_answer, correct_answer, is_correct) in attempts
+        ]
+        if not rows:
+            return
+
+        if self._cache is not None:
+            for row in rows:
+                self._cache.begin_write((row[0], row[1]), row[3])
+
+        ok = False
+        full = False
+        try:
+            buffered = False
+            if self.write_behind:
+                with self._buffer_lock:
+                    # Checked under the same lock close() sets it with: once closed,
+                    # the final drain has happened (or is about to), so write directly.
+                    buffered = not self._closed
+                    if buffered:
+                        self._buffer.extend(rows)
+                        for row in rows:
+                            delta = self._pending.setdefault((row[0], row[1]), [0, 0])
+                            delta[0] += 1
+                            delta[1] += row[3]
+                        full = len(self._buffer) >= self.flush_every
+            if not buffered:
+                # Cumulative stats + full history, committed immediately
+                self._commit_rows(rows, "record_attempt")
+            ok = True
+        finally:
+            if self._cache is not None:
+                for row in rows:
+                    self._cache.end_write((row[0], row[1]), ok)
+
+        if full:
+            self._wakeup.set()
+
+    # ---------------------------------------------
+    # WRITE-BEHIND BUFFER
+    # ---------------------------------------------
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger_memory.exception("Write-behind flush failed; will retry")
+
+    def flush(self):
+        """Commit all buffered attempts in a single transaction. Returns the row count."""
+        if not self.write_behind:
+            return 0
+
+        with self._flush_lock:
+            with self._buffer_lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+
+            def publish(conn):
+                # The commit and dropping the rows from the overlay happen together
+                # under the buffer lock, so a reader sees each attempt exactly once.
+                # Only the COMMIT is covered; lock waits happen before it.
+                with self._buffer_lock:
+                    conn.commit()
+                    for row in batch:
+                        key = (row[0], row[1])
+                        delta = self._pending[key]
+                        delta[0] -= 1
+                        delta[1] -= row[3]
+                        if delta[0] == 0:
+                            del self._pending[key]
+                    self._flush_seq += 1
+
+            try:
+                self._commit_rows(batch, "flush", commit=publish)
+            except Exception:
+                with self._buffer_lock:
+                    self._buffer[:0] = batch
+                raise
+            return len(batch)
+
+    def import_snapshot(self, source_db, include_history=False, max_users=None):
+        """
+        Bulk-copy user_stats (and optionally history) from another ALCA
+        database, read-only, in one transaction. Returns row counts.
+        max_users limits the copy to that many users (by user_id order).
+        """
+        self.flush()
+        counts = {"users": 0, "user_stats": 0, "history": 0}
+
+        # A URI-enabled connection, so the snapshot can be attached read-only
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.db_path))}", uri=True)
+        try:
+            conn.execute("ATTACH DATABASE ? AS snap", (f"file:{quote(os.path.abspath(source_db))}?mode=ro",))
+            try:
+                user_filter = ""
+                params = ()
+                if max_users is not None:
+                    user_filter = """
+                        WHERE user_id IN (
+                            SELECT DISTINCT user_id FROM snap.user_stats ORDER BY user_id LIMIT ?
+                        )
+                    """
+                    params = (int(max_users),)
+
+                cur = conn.execute(f"""
+                    INSERT OR REPLACE INTO main.user_stats (user_id, topic, attempts, correct)
+                    SELECT user_id, topic, attempts, correct FROM snap.user_stats {user_filter}
+                """, params)
+                counts["user_stats"] = cur.rowcount
+
+                if include_history:
+                    # Older snapshots may predate the ts column; backfilled below
+                    src_cols = {row[1] for row in conn.execute("PRAGMA snap.table_info(history)")}
+                    cols = [c for c in ("user_id", "topic", "question_id", "correct", "student_answer",
+                                        "correct_answer", "timestamp", "ts") if c in src_cols]
+                    col_list = ", ".join(cols)
+                    cur = conn.execute(f"""
+                        INSERT INTO main.history ({col_list})
+                        SELECT {col_list} FROM snap.history {user_filter}
+                        ORDER BY id
+                    """, params)
+                    counts["history"] = cur.rowcount
+                    if "ts" not in src_cols:
+                        self._migrate_history_ts(conn)
+
+                conn.execute(SQL_BUMP_CLOCK)
+                conn.commit()
+            finally:
+                conn.execute("DETACH DATABASE snap")
+
+            counts["users"] = conn.execute("SELECT COUNT(DISTINCT user_id) FROM user_stats").fetchone()[0]
+        finally:
+            conn.close()
+
+        if self._cache is not None:
+            self._cache.clear()
+        return counts
 
     # ---------------------------------------------
     # MEMORY READ OPERATIONS
     # ---------------------------------------------
+    @timed("get_user_topic_stats")
     def get_user_topic_stats(self, user_id, topic):
         """Return accuracy & attempts for specific topic."""
-        conn = self._connect()
-        cur = conn.cursor()
+        key = (user_id, topic)
+        token = None
+        if self._cache is not None:
+            if self._cache.sync_due():
+                with self._connection() as conn:
+                    self._cache.observe_clock(conn.execute(SQL_SELECT_CLOCK).fetchone()[0])
+            cached, token = self._cache.get(key)
+            if cached is not None:
+                return self._stats_dict(cached)
 
-        cur.execute("""
-            SELECT attempts, correct FROM user_stats
-            WHERE user_id = ? AND topic = ?
-        """, (user_id, topic))
+        row = self._read_topic_stats(user_id, topic)
 
-        row = cur.fetchone()
-        conn.close()
+        if self._cache is not None:
+            self._cache.put(key, row[0], row[1], token)
+        return self._stats_dict(row)
 
-        if not row:
-            return {"attempts": 0, "correct": 0, "accuracy": 0.0}
+    def cache_stats(self):
+        """Hit/miss counters and occupancy of the topic stats cache."""
+        if self._cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self._cache.stats()}
 
+    @staticmethod
+    def _stats_dict(row):
         attempts, correct = row
         accuracy = round((correct / attempts) * 100, 2) if attempts > 0 else 0.0
         return {"attempts": attempts, "correct": correct, "accuracy": accuracy}
 
-    def get_user_summary(self, user_id):
-        """Return all stats + detailed history."""
-        conn = self._connect()
-        cur = conn.cursor()
+    def _read_topic_stats(self, user_id, topic):
+        """(attempts, correct) from SQLite plus any uncommitted write-behind attempts."""
+        if self.write_behind:
+            # Optimistic read: take the pending delta and flush sequence, read
+            # SQLite without any lock, and retry if a flush committed meanwhile.
+            # An unchanged sequence means the row and the delta describe the same
+            # moment, so every attempt is counted exactly once.
+            key = (user_id, topic)
+            while True:
+                with self._buffer_lock:
+                    seq = self._flush_seq
+                    delta = tuple(self._pending.get(key, (0, 0)))
+                with self._connection() as conn:
+                    row = conn.execute(SQL_SELECT_TOPIC_STATS, key).fetchone()
+                with self._buffer_lock:
+                    if self._flush_seq == seq:
+                        break
+            if delta[0]:
+                attempts, correct = row or (0, 0)
+                row = (attempts + delta[0], correct + delta[1])
+        else:
+            with self._connection() as conn:
+                row = conn.execute(SQL_SELECT_TOPIC_STATS, (user_id, topic)).fetchone()
 
-        # Topic-wise stats
-        cur.execute("""
-            SELECT topic, attempts, correct FROM user_stats
-            WHERE user_id = ?
-        """, (user_id,))
-        stats_rows = cur.fetchall()
+        return row or (0, 0)
+
+    def get_user_summary(self, user_id, limit=None, after=None, topic=None, since=None, until=None):
+        """
+        Return all stats + detailed history, newest first.
+
+        History can be narrowed with `topic` and an epoch-ms range
+        [`since`, `until`), and paged with `limit` + the `after` cursor
+        returned as `next_cursor` by the previous page.
+        """
+        self.flush()
+
+        where = ["user_id = ?"]
+        params = [user_id]
+        if topic is not None:
+            where.append("topic = ?")
+            params.append(topic)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(int(since))
+        if until is not None:
+            where.append("ts < ?")
+            params.append(int(until))
+        if after is not None:
+            where.append("(ts, id) < (?, ?)")
+            params.extend(decode_cursor(after))
+
+        sql = f"""
+            SELECT id, topic, question_id, correct, student_answer, correct_answer, timestamp, ts
+            FROM history WHERE {" AND ".join(where)}
+            ORDER BY ts DESC, id DESC
+        """
+        if limit is not None:
+            # One extra row tells us whether another page exists
+            sql += " LIMIT ?"
+            params.append(int(limit) + 1)
+
+        with self._connection() as conn:
+            cur = conn.cursor()
+
+            # Topic-wise stats
+            cur.execute("""
+                SELECT topic, attempts, correct FROM user_stats
+                WHERE user_id = ?
+            """, (user_id,))
+            stats_rows = cur.fetchall()
+
+            # Detailed history
+            cur.execute(sql, params)
+            hist_rows = cur.fetchall()
+
+        next_cursor = None
+        if limit is not None and len(hist_rows) > limit:
+            hist_rows = hist_rows[:limit]
+            last = hist_rows[-1]
+            next_cursor = encode_cursor(last[7], last[0])
 
         stats = {}
         for topic, attempts, correct in stats_rows:
@@ -125,14 +752,6 @@ class MemoryManager:
                 "accuracy": accuracy
             }
 
-        # Detailed history
-        cur.execute("""
-            SELECT topic, question_id, correct, student_answer, correct_answer, timestamp
-            FROM history WHERE user_id = ?
-            ORDER BY timestamp DESC
-        """, (user_id,))
-        hist_rows = cur.fetchall()
-
         history = [
             {
                 "topic": t,
@@ -140,15 +759,15 @@ class MemoryManager:
                 "correct": bool(c),
                 "student_answer": sa,
                 "correct_answer": ca,
-                "timestamp": ts
+                "timestamp": text_ts,
+                "ts": ts
             }
-            for (t, qid, c, sa, ca, ts) in hist_rows
+            for (_, t, qid, c, sa, ca, text_ts, ts) in hist_rows
         ]
 
-        conn.close()
-
         return {
             "user_id": user_id,
             "topics": stats,
-            "history": history
+            "history": history,
+            "next_cursor": next_cursor
         }
@@ -0,0 +1,288 @@
+# metrics.py
+"""
+In-process metrics registry, exposed at /metrics in Prometheus text format.
+
+Counters and histograms are plain Python objects guarded by a lock per
+labelled series, so recording one observation costs a dict lookup, a
+bisect and an increment. Hot paths are instrumented with the `timed`
+decorator, which adds one `alca_stage_duration_seconds{stage=...}`
+observation per call:
+
+    @timed("grading")
+    def grade(...): ...
+
+Values that already live elsewhere (cache hit/miss counters, queue sizes)
+are pulled at scrape time by collector callbacks instead of being copied on
+every request. Set ALCA_METRICS=0 to make `timed` return functions
+unwrapped. Metrics are per process: with several workers, scrape each one.
+"""
+import functools
+import inspect
+import os
+import statistics
+import threading
+import time
+from bisect import bisect_left
+
+ENABLED = os.getenv("ALCA_METRICS", "1") != "0"
+
+# Seconds; tuned for in-process stages (tens of µs) up to slow LLM calls
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ------------------------------
+# Metric types
+# ------------------------------
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values, **kw):
+        if kw:
+            values = tuple(kw[n] for n in self.labelnames)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def _render_child(self, values, child):
+        yield f"{self.name}{_label_str(self.labelnames, values)} {_number(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts = list(child.counts)
+            total_sum = child.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_number(bound)}"'
+            yield f"{self.name}_bucket{_label_str(self.labelnames, values, le)} {cumulative}"
+        labels = _label_str(self.labelnames, values)
+        yield f"{self.name}_sum{labels} {_number(total_sum)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+# ------------------------------
+# Registry
+# ------------------------------
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, fn):
+        """
+        fn() -> iterable of (name, type, help, [(labels_dict, value), ...]),
+        called on every scrape for values owned by other objects.
+        """
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        for fn in list(self._collectors):
+            try:
+                families = list(fn())
+            except Exception:
+                continue
+            for name, type_, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {type_}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    names = tuple(labels)
+                    lines.append(f"{name}{_label_str(names, [labels[n] for n in names])} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "alca_stage_duration_seconds", "Latency of internal request stages.", ("stage",))
+STAGE_ERRORS = REGISTRY.counter(
+    "alca_stage_errors_total", "Stage calls that raised.", ("stage",))
+REQUEST_SECONDS = REGISTRY.histogram(
+    "alca_http_request_duration_seconds", "End-to-end latency per API endpoint.", ("endpoint",))
+SQLITE_LOCK_RETRIES = REGISTRY.counter(
+    "alca_sqlite_lock_retries_total", "SQLite writes retried after 'database is locked'.", ("op",))
+
+
+def timed(stage):
+    """Decorator: observe the call's duration as alca_stage_duration_seconds{stage=...}."""
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        child = STAGE_SECONDS.labels(stage)
+        errors = STAGE_ERRORS.labels(stage)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapped(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                except BaseException:
+                    errors.inc()
+                    raise
+                finally:
+                    child.observe(time.perf_counter() - start)
+            return async_wrapped
+
+        @functools.wraps(fn)
+        def wrapped(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                errors.inc()
+                raise
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapped
+    return decorator
+
+
+def latency_summary(samples_ms) -> dict:
+    """n/mean/p50/p95/p99/max (ms) for a list of latency samples; used by the benchmark and loadgen reports."""
+    if not samples_ms:
+        return {"n": 0}
+    data = sorted(samples_ms)
+    if len(data) > 1:
+        cuts = statistics.quantiles(data, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = data[0]
+    return {
+        "n": len(data),
+        "mean": round(statistics.mean(data), 4),
+        "p50": round(p50, 4),
+        "p95": round(p95, 4),
+        "p99": round(p99, 4),
+        "max": round(data[-1], 4),
+    }
+
+
+def observe_request(endpoint, seconds):
+    if ENABLED:
+        REQUEST_SECONDS.labels(endpoint).observe(seconds)
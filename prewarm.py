@@ -0,0 +1,119 @@
+# prewarm.py
+"""
+Fill the explanation cache for every topic x level before students arrive.
+
+    python prewarm.py sample_content_expanded.json --workers 4
+
+Entries already in the cache are skipped, so an interrupted run can simply be
+started again and picks up where it stopped. Model calls go through the
+agent's AsyncExplainer, so prewarm shares its max_in_flight cap and request
+coalescing with live traffic when it runs inside the server.
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agents import ExplanationAgent, GeminiExplanationAgent
+
+logger_agents = logging.getLogger("alca.agents")
+
+LEVELS = ("beginner", "intermediate", "advanced")
+
+
+def prewarm_explanations(content, gemini_agent: GeminiExplanationAgent, workers=4, levels=LEVELS,
+                         progress=None, timeout=120.0):
+    """
+    Generate and cache the Gemini explanation for each (topic, level).
+
+    timeout: how long to wait for each model call (much longer than a request's)
+    progress: optional callable(done, total, topic, level, status) invoked as
+    each item finishes; status is "cached", "generated" or "failed".
+    Returns a summary report dict.
+    """
+    start = time.perf_counter()
+    tool = gemini_agent.tool
+    report = {"total": 0, "cached": 0, "generated": 0, "failed": 0, "seconds": 0.0}
+
+    if not tool.enabled or tool.cache is None:
+        report["error"] = "Gemini is disabled or the explanation cache is off; nothing to pre-warm"
+        return report
+
+    fallback_agent = ExplanationAgent(content)
+    todo = []
+    for topic in content:
+        for level in levels:
+            fallback = fallback_agent.explain(topic, level)
+            if fallback is not None:
+                todo.append((topic, level, fallback))
+
+    report["total"] = len(todo)
+    done = 0
+    lock = threading.Lock()
+
+    def work(topic, level, fallback):
+        if tool.cache.contains(tool.cache_key(topic, level, fallback)):
+            return "cached"
+        gemini_agent.explainer.explain_sync(topic, level, fallback, timeout=timeout)
+        # Only real model output is stored, so presence == success
+        return "generated" if tool.cache.contains(tool.cache_key(topic, level, fallback)) else "failed"
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="alca-prewarm") as pool:
+        futures = {pool.submit(work, *item): item for item in todo}
+        for future in as_completed(futures):
+            topic, level, _ = futures[future]
+            try:
+                status = future.result()
+            except Exception:
+                logger_agents.exception(f"prewarm failed topic={topic} level={level}")
+                status = "failed"
+
+            with lock:
+                report[status] += 1
+                done += 1
+            if progress:
+                progress(done, len(todo), topic, level, status)
+
+    report["seconds"] = round(time.perf_counter() - start, 2)
+    logger_agents.info(f"prewarm finished {report}")
+    return report
+
+
+def start_background_prewarm(content, gemini_agent, workers=4):
+    """Run prewarm_explanations on a daemon thread (used at server startup)."""
+    thread = threading.Thread(
+        target=prewarm_explanations,
+        args=(content, gemini_agent),
+        kwargs={"workers": workers},
+        name="alca-prewarm",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm the Gemini explanation cache")
+    parser.add_argument("content_file", nargs="?", default="sample_content_expanded.json")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with open(args.content_file, "r", encoding="utf-8") as f:
+        content = json.load(f)
+
+    def show(done, total, topic, level, status):
+        print(f"[{done}/{total}] {topic} / {level}: {status}")
+
+    report = prewarm_explanations(content, GeminiExplanationAgent(), workers=args.workers, progress=show)
+
+    if "error" in report:
+        print(report["error"])
+        return
+    print(f"\nDone in {report['seconds']}s: {report['generated']} generated, "
+          f"{report['cached']} already cached, {report['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
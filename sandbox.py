@@ -0,0 +1,544 @@
+# sandbox.py
+"""
+Warm pool of sandbox workers for running student Python snippets.
+
+Starting a fresh interpreter per snippet costs far more than the small
+exercises we grade, so SandboxPool keeps `size` worker interpreters running.
+For each job a worker forks a child, which:
+
+  - starts a new session (so the whole process group can be killed),
+  - gets stdin/stdout/stderr as pipes (no temp files),
+  - applies rlimits: CPU seconds, address space, file size, open files, no core dumps,
+    no new processes or threads,
+  - compiles and runs the code in a fresh __main__ namespace.
+
+The worker enforces the wall-clock timeout and the output cap (killing the
+process group when either is exceeded), reaps the child with wait4() and
+reports its CPU time and peak RSS. The deadline covers the whole job, not
+just reading output: a child that closes its pipes and keeps running is
+killed too. On Linux the worker is a child subreaper, so anything the job
+left behind (including setsid() daemons outside its process group, e.g.
+when running as root, which ignores RLIMIT_NPROC) is reparented to the
+worker and killed before the next job. Forking per job means one snippet
+can't leave state behind for the next. Workers are still replaced after
+`max_runs` jobs, or straight away if one dies or stops answering; the pool
+then kills the job's process group itself.
+
+POSIX only (fork + resource); see SANDBOX_SUPPORTED. tools.evaluate_python_code
+falls back to a plain subprocess elsewhere.
+
+    python sandbox.py --bench 50      # pooled vs fresh-interpreter latency
+"""
+import json
+import logging
+import os
+import queue
+import selectors
+import signal
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger_app = logging.getLogger("alca.app")
+
+SANDBOX_SUPPORTED = resource is not None and hasattr(os, "fork")
+
+PR_SET_CHILD_SUBREAPER = 36
+
+_FRAME = struct.Struct(">I")
+
+
+# ------------------------------
+# Framing (pool <-> worker)
+# ------------------------------
+def _send(stream, obj):
+    data = json.dumps(obj).encode("utf-8")
+    view = memoryview(_FRAME.pack(len(data)) + data)
+    while view:                       # unbuffered pipes may take a partial write
+        view = view[stream.write(view):]
+    stream.flush()
+
+
+def _read_exact(stream, n):
+    buf = b""
+    while len(buf) < n:
+        chunk = stream.read(n - len(buf))
+        if not chunk:
+            raise EOFError("sandbox pipe closed")
+        buf += chunk
+    return buf
+
+
+def _recv(stream):
+    (size,) = _FRAME.unpack(_read_exact(stream, _FRAME.size))
+    return json.loads(_read_exact(stream, size).decode("utf-8"))
+
+
+# ------------------------------
+# Worker side (runs in the worker interpreter)
+# ------------------------------
+def _child(code, fds, limits, go):
+    """Forked child: never returns. Runs nothing until the worker has reported its pid."""
+    stdin_r, stdout_w, stderr_w = fds
+    go_r, go_w = go
+    try:
+        os.setsid()
+        os.close(go_w)
+        if not os.read(go_r, 1):      # the worker died before the pool learnt our pid
+            os._exit(70)
+        os.dup2(stdin_r, 0)
+        os.dup2(stdout_w, 1)
+        os.dup2(stderr_w, 2)
+        os.closerange(3, 1024)
+
+        cpu = max(1, int(limits["cpu_seconds"]))
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        if limits.get("memory_bytes"):
+            resource.setrlimit(resource.RLIMIT_AS, (limits["memory_bytes"],) * 2)
+        resource.setrlimit(resource.RLIMIT_FSIZE, (limits["max_output"],) * 2)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        # Counted per user, so this blocks fork() and threads outright (root is exempt)
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+        # The worker's own std streams may hold buffered protocol data
+        sys.stdin = open(0, "r", closefd=False)
+        sys.stdout = open(1, "w", closefd=False)
+        sys.stderr = open(2, "w", closefd=False)
+
+        status = 0
+        try:
+            exec(compile(code, "<snippet>", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            if not isinstance(e.code, (int, type(None))):
+                print(e.code, file=sys.stderr)
+        except BaseException as e:
+            import traceback
+            # Start the traceback at the snippet, not at this exec() call
+            traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+            status = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(status)
+    except BaseException:
+        os._exit(70)
+
+
+def _become_subreaper():
+    """Have orphaned descendants of jobs reparented to this worker (Linux only)."""
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def _children():
+    pid = os.getpid()
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:   # kernel without CONFIG_PROC_CHILDREN: scan parent pids instead
+        pass
+    children = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(name))
+    return children
+
+
+def _reap_strays():
+    """Kill and reap every process still parented to this (subreaper) worker."""
+    while True:
+        try:
+            reaped, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if reaped:
+            continue
+        for pid in _children():
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        # Their own children are reparented to us as they die; the loop picks them up
+        try:
+            os.waitpid(-1, 0)
+        except ChildProcessError:
+            return
+
+
+def _killpg(pgid):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _wait_child(pid, deadline):
+    """
+    wait4() the child, killing its process group if it is still running at the
+    deadline. Returns (status, rusage, killed_at_deadline).
+    """
+    try:
+        pidfd = os.pidfd_open(pid)          # Linux 5.3+: readable once the child exits
+    except (AttributeError, OSError):
+        pidfd = None
+
+    late = False
+    if pidfd is not None:
+        with selectors.DefaultSelector() as sel:
+            sel.register(pidfd, selectors.EVENT_READ)
+            if not sel.select(max(0.0, deadline - time.monotonic())):
+                late = True
+                _killpg(pid)
+        os.close(pidfd)
+        _, status, usage = os.wait4(pid, 0)
+        return status, usage, late
+
+    delay = 0.0005
+    while True:
+        reaped, status, usage = os.wait4(pid, os.WNOHANG)
+        if reaped:
+            return status, usage, late
+        if not late and time.monotonic() >= deadline:
+            late = True
+            _killpg(pid)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def _run_job(job, started=None, subreaper=False):
+    """
+    Run one job in a forked child. `started(pid)` is called right after the fork;
+    with `subreaper` set, everything the job leaves behind is killed before returning.
+    """
+    limits = job["limits"]
+    max_output = limits["max_output"]
+    stdin_r, stdin_w = os.pipe()
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    go_r, go_w = os.pipe()
+
+    start = time.monotonic()
+    pid = os.fork()
+    if pid == 0:
+        _child(job["code"], (stdin_r, stdout_w, stderr_w), limits, (go_r, go_w))
+
+    os.close(go_r)
+    try:
+        if started is not None:
+            started(pid)
+        os.write(go_w, b"\0")
+    finally:
+        os.close(go_w)
+    os.close(stdin_r)
+    os.close(stdout_w)
+    os.close(stderr_w)
+
+    pending = job.get("input", "").encode("utf-8")
+    out = {stdout_r: bytearray(), stderr_r: bytearray()}
+    total = 0
+    timed_out = truncated = False
+
+    sel = selectors.DefaultSelector()
+    if pending:
+        os.set_blocking(stdin_w, False)
+        sel.register(stdin_w, selectors.EVENT_WRITE)
+    else:
+        os.close(stdin_w)
+    sel.register(stdout_r, selectors.EVENT_READ)
+    sel.register(stderr_r, selectors.EVENT_READ)
+
+    deadline = start + limits["timeout"]
+    while sel.get_map():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        for key, _ in sel.select(remaining):
+            fd = key.fd
+            if fd == stdin_w:
+                try:
+                    pending = pending[os.write(fd, pending[:65536]):]
+                except BrokenPipeError:
+                    pending = b""
+                if not pending:
+                    sel.unregister(fd)
+                    os.close(fd)
+                continue
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                sel.unregister(fd)
+                os.close(fd)
+                continue
+            out[fd] += chunk
+            total += len(chunk)
+            if total > max_output:
+                truncated = True
+        if truncated:
+            break
+
+    if timed_out or truncated:
+        _killpg(pid)
+    for fd in list(sel.get_map()):
+        sel.unregister(fd)
+        os.close(fd)
+    sel.close()
+
+    # EOF doesn't mean the child has exited (it may have closed its pipes and
+    # kept going), so the wait is held to the same deadline
+    status, usage, late = _wait_child(pid, deadline)
+    timed_out = timed_out or (late and not truncated)
+    killed = timed_out or truncated
+    wall = time.monotonic() - start
+    _killpg(pid)   # anything the snippet left running
+    if subreaper:
+        _reap_strays()
+
+    exit_code = os.WEXITSTATUS(status) if os.WIFEXITED(status) else None
+    sig = os.WTERMSIG(status) if os.WIFSIGNALED(status) else None
+    cpu_time = usage.ru_utime + usage.ru_stime
+
+    error = None
+    if timed_out:
+        error = f"timed out after {limits['timeout']}s"
+    elif truncated:
+        error = f"output exceeded {max_output} bytes"
+    elif sig in (signal.SIGXCPU, signal.SIGKILL) and cpu_time >= limits["cpu_seconds"]:
+        error = f"CPU limit of {limits['cpu_seconds']}s exceeded"
+    elif sig is not None:
+        error = f"killed by signal {signal.Signals(sig).name}"
+
+    return {
+        "ok": exit_code == 0 and not killed,
+        "exit_code": exit_code,
+        "signal": sig,
+        "stdout": bytes(out[stdout_r][:max_output]).decode("utf-8", "replace"),
+        "stderr": bytes(out[stderr_r][:max_output]).decode("utf-8", "replace"),
+        "timed_out": timed_out,
+        "output_truncated": truncated,
+        "error": error,
+        "wall_time": round(wall, 6),
+        "cpu_time": round(cpu_time, 6),
+        "peak_memory_kb": usage.ru_maxrss,   # KiB on Linux; includes the interpreter itself
+    }
+
+
+def worker_main():
+    """Serve jobs from the pool over stdin/stdout until EOF."""
+    proto_in = os.fdopen(os.dup(0), "rb")
+    proto_out = os.fdopen(os.dup(1), "wb")
+    # Keep stray prints from the worker itself off the protocol pipe
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(2, 1)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    subreaper = _become_subreaper()
+
+    def started(pid):
+        _send(proto_out, {"pid": pid})
+
+    while True:
+        try:
+            job = _recv(proto_in)
+        except EOFError:
+            return
+        try:
+            result = _run_job(job, started, subreaper)
+        except Exception as e:
+            result = {"ok": False, "error": f"sandbox failure: {type(e).__name__}: {e}"}
+        _send(proto_out, result)
+
+
+# ------------------------------
+# Pool side
+# ------------------------------
+class WorkerCrashed(Exception):
+    pass
+
+
+class SandboxWorker:
+    """
+    Handle to one worker interpreter; used by one thread at a time.
+    `job_pid` is the pid (and process group) of the job it is running, if any.
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self.job_pid = None
+        # Unbuffered, so select() on the pipe never misses a frame already read into a buffer
+        self.proc = subprocess.Popen(
+            [sys.executable, "-I", os.path.abspath(__file__), "--worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            bufsize=0,
+            cwd=tempfile.gettempdir(),
+        )
+
+    def _reply(self, deadline, reply_timeout):
+        sel = selectors.DefaultSelector()
+        sel.register(self.proc.stdout, selectors.EVENT_READ)
+        ready = sel.select(max(0.0, deadline - time.monotonic()))
+        sel.close()
+        if not ready:
+            raise WorkerCrashed(f"no reply within {reply_timeout:.1f}s")
+        return _recv(self.proc.stdout)
+
+    def run(self, job, reply_timeout):
+        self.runs += 1
+        deadline = time.monotonic() + reply_timeout
+        try:
+            _send(self.proc.stdin, job)
+            reply = self._reply(deadline, reply_timeout)
+            if "pid" in reply:        # the job has started; its result follows
+                self.job_pid = reply["pid"]
+                reply = self._reply(deadline, reply_timeout)
+            self.job_pid = None
+            return reply
+        except (OSError, EOFError, ValueError) as e:
+            raise WorkerCrashed(str(e)) from e
+
+    def kill_job(self):
+        """Kill the job in progress and its process group (the worker can't be trusted to)."""
+        if self.job_pid is not None:
+            try:
+                os.kill(self.job_pid, signal.SIGKILL)   # first: it may not have called setsid() yet
+            except (ProcessLookupError, PermissionError):
+                pass
+            _killpg(self.job_pid)
+            self.job_pid = None
+
+    def stop(self):
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=1)
+        except Exception:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc.stdout.close()
+
+
+class SandboxPool:
+    """
+    size:         worker interpreters kept warm (= snippets running at once)
+    max_runs:     jobs per worker before it is replaced
+    cpu_seconds:  RLIMIT_CPU for each snippet
+    memory_mb:    RLIMIT_AS for each snippet (0 = unlimited)
+    max_output:   bytes of stdout+stderr before the snippet is killed
+    timeout:      wall-clock limit per snippet
+    """
+
+    def __init__(self, size=2, max_runs=200, cpu_seconds=2, memory_mb=256, max_output=64 * 1024, timeout=5.0):
+        if not SANDBOX_SUPPORTED:
+            raise RuntimeError("SandboxPool needs os.fork and the resource module (POSIX)")
+        self.size = size
+        self.max_runs = max_runs
+        self.limits = {
+            "cpu_seconds": cpu_seconds,
+            "memory_bytes": memory_mb * 1024 * 1024,
+            "max_output": max_output,
+            "timeout": timeout,
+        }
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"runs": 0, "recycled": 0, "crashed": 0}
+        for _ in range(size):
+            self._idle.put(SandboxWorker())
+
+    def run(self, code: str, input_data: str = "", timeout: float = None) -> dict:
+        """Run one snippet; returns the result dict built by the worker."""
+        if self._closed:
+            raise RuntimeError("SandboxPool is closed")
+        limits = dict(self.limits)
+        if timeout is not None:
+            limits["timeout"] = timeout
+        job = {"code": code, "input": input_data or "", "limits": limits}
+
+        worker = self._idle.get()
+        try:
+            result = worker.run(job, reply_timeout=limits["timeout"] + 5.0)
+        except WorkerCrashed as e:
+            logger_app.warning(f"Sandbox worker pid={worker.proc.pid} crashed: {e}; replacing it")
+            worker.kill_job()
+            worker.proc.kill()
+            worker.stop()
+            worker = SandboxWorker()
+            with self._lock:
+                self.stats["crashed"] += 1
+            result = {"ok": False, "error": f"sandbox worker crashed: {e}"}
+        finally:
+            if worker.runs >= self.max_runs:
+                worker.stop()
+                worker = SandboxWorker()
+                with self._lock:
+                    self.stats["recycled"] += 1
+            self._idle.put(worker)
+
+        with self._lock:
+            self.stats["runs"] += 1
+        return result
+
+    def close(self):
+        self._closed = True
+        for _ in range(self.size):
+            self._idle.get().stop()
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> SandboxPool:
+    """Process-wide pool, created on first use (size from ALCA_SANDBOX_WORKERS)."""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            import atexit
+            _default_pool = SandboxPool(size=int(os.getenv("ALCA_SANDBOX_WORKERS", "2")))
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def _bench(n):
+    snippet = "print(sum(range(1000)))"
+    pool = SandboxPool(size=1)
+    pool.run(snippet)
+    start = time.perf_counter()
+    for _ in range(n):
+        pool.run(snippet)
+    pooled = (time.perf_counter() - start) / n * 1000
+    pool.close()
+
+    start = time.perf_counter()
+    for _ in range(n):
+        subprocess.run([sys.executable, "-c", snippet], capture_output=True)
+    fresh = (time.perf_counter() - start) / n * 1000
+    print(f"pooled: {pooled:.2f} ms/run   fresh interpreter: {fresh:.2f} ms/run   ({fresh / pooled:.1f}x)")
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        worker_main()
+    elif "--bench" in sys.argv:
+        _bench(int(sys.argv[sys.argv.index("--bench") + 1]))
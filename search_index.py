@@ -0,0 +1,167 @@
+# search_index.py
+"""
+Inverted index over the content file for topic search and typeahead.
+
+Each topic is one document built from its name, concept, explanations and
+diagnostic/practice question text. Text goes through the same normalization
+as grading (grading.answer_tokens), keeping only the word tokens.
+Field matches are weighted (a hit in the topic name counts more than one in
+a question) and ranked with BM25.
+
+Query terms missing from the vocabulary are expanded:
+  - prefix: the last term also matches longer words ("bin" -> "binary"), for typeahead
+  - fuzzy:  terms of 4+ chars match words within edit distance 1 (2 for 8+ chars),
+            using grading's bit-parallel Levenshtein kernel
+Expanded matches score a fraction of an exact hit.
+"""
+import math
+from bisect import bisect_left
+
+from grading import _levenshtein, _pattern_masks, answer_tokens
+
+# How much a term occurrence in each field counts towards a topic's term frequency
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "concept": 2.0,
+    "explanations": 1.0,
+    "questions": 1.0,
+}
+
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+MAX_EXPANSIONS = 20
+
+STOPWORDS = frozenset(
+    "a an and are as at be by does for from how in is it of on or the this to what when where which "
+    "who why with".split()
+)
+
+
+def tokenize(text):
+    return [t for t in answer_tokens(text) if (t[0].isalnum() or t[0] == "_") and t not in STOPWORDS]
+
+
+def _topic_fields(name, data):
+    questions = [
+        q.get("question", "")
+        for key in ("diagnostic", "practice")
+        for q in data.get(key, [])
+        if isinstance(q, dict)
+    ]
+    explanations = data.get("explanations") or {}
+    return {
+        "name": name,
+        "concept": data.get("concept") or "",
+        "explanations": " ".join(v for v in explanations.values() if isinstance(v, str)),
+        "questions": " ".join(questions),
+    }
+
+
+class SearchIndex:
+    """BM25 index with one document per topic; built once per content load."""
+
+    def __init__(self, content, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.topics = list(content)
+        self.postings = {}          # term -> {doc_id: weighted tf}
+        self.term_fields = {}       # (term, doc_id) -> set of field names
+        self.doc_len = []
+
+        for doc_id, (name, data) in enumerate(content.items()):
+            length = 0.0
+            for field, text in _topic_fields(name, data).items():
+                weight = FIELD_WEIGHTS[field]
+                for term in tokenize(text):
+                    docs = self.postings.setdefault(term, {})
+                    docs[doc_id] = docs.get(doc_id, 0.0) + weight
+                    self.term_fields.setdefault((term, doc_id), set()).add(field)
+                    length += weight
+            self.doc_len.append(length)
+
+        n = len(self.topics)
+        self.avg_len = (sum(self.doc_len) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        self.vocab = sorted(self.postings)
+
+    # ---------------------------------------------
+    # term expansion
+    # ---------------------------------------------
+    def _prefix_terms(self, prefix):
+        i = bisect_left(self.vocab, prefix)
+        out = []
+        while i < len(self.vocab) and self.vocab[i].startswith(prefix) and len(out) < MAX_EXPANSIONS:
+            if self.vocab[i] != prefix:
+                out.append(self.vocab[i])
+            i += 1
+        return out
+
+    def _fuzzy_terms(self, term):
+        if len(term) < 4:
+            return []
+        max_dist = 2 if len(term) >= 8 else 1
+        peq, m = _pattern_masks(term), len(term)
+        matches = []
+        for word in self.vocab:
+            if abs(len(word) - m) <= max_dist and word != term:
+                dist = _levenshtein(peq, m, word)
+                if dist <= max_dist:
+                    matches.append((dist, word))
+        matches.sort()
+        return [w for _, w in matches[:MAX_EXPANSIONS]]
+
+    def _expand(self, terms, prefix, fuzzy):
+        """[(index_term, weight, query_term)] for the query terms."""
+        expanded = []
+        for i, term in enumerate(terms):
+            if term in self.postings:
+                expanded.append((term, 1.0, term))
+            if prefix and i == len(terms) - 1:
+                expanded.extend((t, PREFIX_WEIGHT, term) for t in self._prefix_terms(term))
+            if fuzzy and term not in self.postings:
+                expanded.extend((t, FUZZY_WEIGHT, term) for t in self._fuzzy_terms(term))
+        return expanded
+
+    # ---------------------------------------------
+    # query
+    # ---------------------------------------------
+    def search(self, query, limit=10, prefix=True, fuzzy=True):
+        """
+        Ranked topics for `query`: [{"topic", "score", "terms", "fields"}, ...],
+        best first. Empty when nothing matches.
+        """
+        terms = tokenize(query)
+        if not terms or not self.topics:
+            return []
+
+        scores = {}
+        matched = {}
+        for term, weight, query_term in self._expand(terms, prefix, fuzzy):
+            idf = self.idf[term]
+            for doc_id, tf in self.postings[term].items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / self.avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * idf * tf * (self.k1 + 1) / (tf + norm)
+                hit = matched.setdefault(doc_id, ({}, set()))
+                hit[0].setdefault(query_term, [])
+                if term not in hit[0][query_term]:
+                    hit[0][query_term].append(term)
+                hit[1].update(self.term_fields[(term, doc_id)])
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.topics[item[0]]))[:limit]
+        return [
+            {
+                "topic": self.topics[doc_id],
+                "score": round(score, 4),
+                "terms": matched[doc_id][0],
+                "fields": sorted(matched[doc_id][1]),
+            }
+            for doc_id, score in ranked
+        ]
+
+    def best(self, query, **kwargs):
+        """Name of the top-ranked topic, or None."""
+        results = self.search(query, limit=1, **kwargs)
+        return results[0]["topic"] if results else None
@@ -0,0 +1,278 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import timed
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single writer process
+    fcntl = None
+
+logger_app = logging.getLogger("alca.app")
+
+
+class SessionWriter:
+    """
+    Buffered appender for per-user JSONL files.
+
+    Records are queued in memory and written per user in one locked append
+    every `flush_interval` seconds or once `flush_every` records are queued.
+    Open handles are kept in an LRU pool of at most `max_open` files.
+
+    Each batch is written under an exclusive flock, so several worker
+    processes can share a session directory. Before a batch would grow a file
+    past `max_bytes`, the file is rotated to `<user>.jsonl.1` (keeping
+    `backup_count` generations). Writers in other processes notice the inode
+    change and reopen the file.
+    """
+
+    def __init__(self, session_dir, max_open=256, flush_every=200, flush_interval=0.5,
+                 max_bytes=5 * 1024 * 1024, backup_count=3):
+        self.session_dir = session_dir
+        self.max_open = max_open
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._handles = OrderedDict()   # user_id -> binary append handle
+        self._pending = {}              # user_id -> [bytes, ...]
+        self._pending_count = 0
+        self._lock = threading.Lock()       # guards _pending
+        self._io_lock = threading.Lock()    # guards _handles and file I/O; taken before _lock
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="alca-session-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def path(self, user_id):
+        return os.path.join(self.session_dir, f"{user_id}.jsonl")
+
+    def append(self, user_id, line: bytes):
+        with self._lock:
+            self._pending.setdefault(user_id, []).append(line)
+            self._pending_count += 1
+            full = self._pending_count >= self.flush_every
+            closed = self._closed
+        if closed:
+            # No flusher any more; write now (behind anything still queued)
+            self.flush(user_id)
+        elif full:
+            self._wakeup.set()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger_app.exception("Session flush failed")
+
+    def flush(self, user_id=None):
+        """Write queued records for one user (or everyone) to disk."""
+        # Taking records off the queue and writing them happen under one lock,
+        # so concurrent flushes (flusher thread, tail()) can't reorder a user's lines
+        with self._io_lock:
+            with self._lock:
+                if user_id is None:
+                    batches, self._pending = self._pending, {}
+                    self._pending_count = 0
+                else:
+                    lines = self._pending.pop(user_id, None)
+                    batches = {user_id: lines} if lines else {}
+                    self._pending_count -= len(lines or ())
+
+            for uid, lines in batches.items():
+                self._write(uid, lines)
+
+    # ---------------------------------------------
+    # file handles + locking
+    # ---------------------------------------------
+    def _handle(self, user_id):
+        f = self._handles.get(user_id)
+        if f is not None:
+            self._handles.move_to_end(user_id)
+            return f
+        f = open(self.path(user_id), "ab")
+        self._handles[user_id] = f
+        while len(self._handles) > self.max_open:
+            _, old = self._handles.popitem(last=False)
+            old.close()
+        return f
+
+    def _drop_handle(self, user_id):
+        f = self._handles.pop(user_id, None)
+        if f is not None:
+            f.close()
+
+    @timed("session_flush")
+    def _write(self, user_id, lines):
+        """Append `lines` to the user's file; the caller holds _io_lock."""
+        data = b"".join(lines)
+        path = self.path(user_id)
+        for _ in range(3):
+            f = self._handle(user_id)
+            stale = False
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                # Another process may have rotated the file under our handle
+                try:
+                    current = os.stat(path)
+                except FileNotFoundError:
+                    current = None
+                if current is None or current.st_ino != os.fstat(f.fileno()).st_ino:
+                    stale = True
+                    continue
+
+                if current.st_size and current.st_size + len(data) > self.max_bytes:
+                    self._rotate(path)
+                    stale = True
+                    continue
+
+                f.write(data)
+                f.flush()
+                return
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                if stale:
+                    self._drop_handle(user_id)
+        raise OSError(f"Could not append session records for user={user_id}")
+
+    def _rotate(self, path):
+        for i in range(self.backup_count - 1, 0, -1):
+            src, dst = f"{path}.{i}", f"{path}.{i + 1}"
+            if os.path.exists(src):
+                os.replace(src, dst)
+        if self.backup_count > 0:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._flusher.join()
+        self.flush()
+        with self._io_lock:
+            for f in self._handles.values():
+                f.close()
+            self._handles.clear()
+
+
+class SessionStore:
+    """
+    Append-only JSONL session log per user (`<session_dir>/<user_id>.jsonl`).
+
+    Reads walk the file backwards from the end in fixed-size blocks, so
+    fetching the latest records costs the same no matter how long the
+    file has grown. Pages are addressed by byte offset: `next_cursor` is the
+    offset where the oldest returned record starts, and passing it back as
+    `before` continues with the records written before it.
+    """
+
+    BLOCK_SIZE = 8192
+
+    def __init__(self, session_dir="sessions", writer: SessionWriter = None):
+        """
+        writer: optional SessionWriter that buffers appends; without one every
+        append opens, writes and closes the file immediately.
+        """
+        self.session_dir = session_dir
+        os.makedirs(session_dir, exist_ok=True)
+        self.writer = writer
+
+    def path(self, user_id):
+        return os.path.join(self.session_dir, f"{user_id}.jsonl")
+
+    # ---------------------------------------------
+    # WRITE
+    # ---------------------------------------------
+    @timed("session_write")
+    def append(self, user_id, session_data):
+        record = json.dumps({"ts": time.time(), "data": session_data}) + "\n"
+        if self.writer is not None:
+            self.writer.append(user_id, record.encode("utf-8"))
+            return
+        with open(self.path(user_id), "a", encoding="utf-8") as f:
+            f.write(record)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    # ---------------------------------------------
+    # READ
+    # ---------------------------------------------
+    def _iter_lines_backward(self, f, end):
+        """Yield (offset, line_bytes) for each line ending at or before `end`, newest first."""
+        pos = end
+        tail = b""
+        while pos > 0:
+            size = min(self.BLOCK_SIZE, pos)
+            pos -= size
+            f.seek(pos)
+            chunk = f.read(size) + tail
+            lines = chunk.split(b"\n")
+            # lines[0] may be cut off by the block boundary; keep it for the next round
+            tail = lines[0]
+            offset = pos + len(lines[0]) + 1
+            starts = []
+            for line in lines[1:]:
+                starts.append((offset, line))
+                offset += len(line) + 1
+            for start, line in reversed(starts):
+                if line.strip():
+                    yield start, line
+        if tail.strip():
+            yield 0, tail
+
+    def tail(self, user_id, n=1, before=None):
+        """
+        Return (records, next_cursor): up to `n` records newest first, ending
+        before byte offset `before` (default: end of file). next_cursor is
+        None once the start of the file is reached.
+        """
+        if self.writer is not None:
+            # Read-your-writes: push this user's queued records out first
+            self.writer.flush(user_id)
+
+        path = self.path(user_id)
+        if not os.path.exists(path):
+            return [], None
+
+        records = []
+        next_cursor = None
+        with open(path, "rb") as f:
+            end = f.seek(0, os.SEEK_END)
+            if before is not None:
+                end = max(0, min(int(before), end))
+
+            for offset, line in self._iter_lines_backward(f, end):
+                if len(records) == n:
+                    next_cursor = offset + len(line) + 1
+                    break
+                try:
+                    records.append(json.loads(line.decode("utf-8")))
+                except ValueError:
+                    logger_app.warning(f"Skipping corrupt session line user={user_id} offset={offset}")
+
+        # next_cursor points just past the newest record we did *not* return,
+        # which is exactly where the oldest returned record starts.
+        return records, next_cursor
+
+    def last(self, user_id):
+        records, _ = self.tail(user_id, 1)
+        return records[0] if records else None
@@ -0,0 +1,146 @@
+import importlib
+import json
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def servers(tmp_path_factory):
+    """main (Flask) and asgi (FastAPI), imported with logs, sessions and databases in a scratch dir."""
+    workdir = tmp_path_factory.mktemp("server")
+    shutil.copy(os.path.join(REPO, "sample_content_expanded.json"), workdir)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(workdir)
+        mp.setenv("ALCA_SESSION_BUFFER", "0")
+        mp.setenv("ALCA_EXPLAIN_CACHE", "")
+        mp.delenv("GEMINI_API_KEY", raising=False)
+        main = importlib.import_module("main")
+        asgi = importlib.import_module("asgi")
+        from fastapi.testclient import TestClient
+        yield main, main.app.test_client(), TestClient(asgi.app)
+
+
+@pytest.fixture(params=["flask", "asgi"])
+def client(request, servers):
+    _, flask_client, asgi_client = servers
+    return flask_client if request.param == "flask" else asgi_client
+
+
+def body(response):
+    return response.get_json() if hasattr(response, "get_json") else response.json()
+
+
+@pytest.mark.parametrize("query", ["before=abc", "before=1.5", "limit=2&before=", "limit=x"])
+def test_malformed_session_cursor_is_rejected(client, query):
+    response = client.get(f"/api/session/cursor-user?{query}")
+    assert response.status_code == 400
+
+
+def test_session_pages_follow_the_cursor(servers, client):
+    main = servers[0]
+    user_id = f"pager-{type(client).__name__}"
+    for i in range(3):
+        main.store_session(user_id, {"n": i})
+
+    first = body(client.get(f"/api/session/{user_id}?limit=2"))
+    assert [r["data"]["n"] for r in first["records"]] == [2, 1]
+    rest = body(client.get(f"/api/session/{user_id}?limit=2&before={first['next_cursor']}"))
+    assert [r["data"]["n"] for r in rest["records"]] == [0]
+
+
+def test_topics_revalidate_with_etag_and_last_modified(client):
+    first = client.get("/api/topics")
+    assert first.status_code == 200
+    etag, last_modified = first.headers["ETag"], first.headers["Last-Modified"]
+    assert etag and last_modified
+
+    assert client.get("/api/topics", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/api/topics", headers={"If-None-Match": '"something-else"'}).status_code == 200
+    assert client.get("/api/topics", headers={"If-Modified-Since": last_modified}).status_code == 304
+    older = "Mon, 01 Jan 2001 00:00:00 GMT"
+    assert client.get("/api/topics", headers={"If-Modified-Since": older}).status_code == 200
+
+
+def test_topic_validators_change_when_content_reloads(servers, client, monkeypatch):
+    main = servers[0]
+    monkeypatch.setattr(main.content_store, "check_interval", 0)
+    first = client.get("/api/topics")
+    etag, last_modified = first.headers["ETag"], first.headers["Last-Modified"]
+
+    path = main.content_store.content_file
+    with open(path, encoding="utf-8") as f:
+        content = json.load(f)
+    content[f"reload topic {type(client).__name__}"] = {"explanations": {"beginner": "new"}}
+    mtime = os.path.getmtime(path) + 100
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(content, f)
+    os.utime(path, (mtime, mtime))
+
+    fresh = client.get("/api/topics", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert f"reload topic {type(client).__name__}" in [t["name"] for t in body(fresh)["topics"]]
+    assert client.get("/api/topics", headers={"If-Modified-Since": last_modified}).status_code == 200
+    assert client.get("/api/topics", headers={"If-None-Match": fresh.headers["ETag"]}).status_code == 304
+
+
+def _clock(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT gen FROM stats_clock").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _batch_system(main, tmp_path, user_id):
+    from content_store import ContentStore
+    from memory import MemoryManager
+
+    db_path = str(tmp_path / "batch.db")
+    store = ContentStore(main.content_store.content_file, MemoryManager(db_path))
+    system = main.LearningSystem(user_id=user_id, store=store)
+    topic = next(t for t, data in system.content.items() if len(data.get("practice", ())) >= 3)
+    questions = system.content[topic]["practice"][:3]
+    items = [{"topic": topic, "question_id": q["id"], "answer": q["answer"]} for q in questions]
+    return system, db_path, topic, items
+
+
+def test_batch_is_committed_in_one_transaction(servers, tmp_path):
+    system, db_path, topic, items = _batch_system(servers[0], tmp_path, "batch-ok")
+    clock = _clock(db_path)
+
+    result = system.run_batch(items)
+
+    assert result["graded"] == 3 and result["num_correct"] == 3
+    assert _clock(db_path) == clock + 1          # every write transaction bumps the clock once
+    assert result["stats"][topic] == {"attempts": 3, "correct": 3, "accuracy": 100.0}
+
+
+def test_failed_batch_item_rolls_back_the_whole_batch(servers, tmp_path):
+    system, db_path, topic, items = _batch_system(servers[0], tmp_path, "batch-fail")
+    items[2]["answer"] = "boom"
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TRIGGER fail_boom BEFORE INSERT ON history WHEN NEW.student_answer = 'boom'
+        BEGIN SELECT RAISE(ABORT, 'boom'); END
+    """)
+    conn.commit()
+    conn.close()
+    clock = _clock(db_path)
+
+    with pytest.raises(sqlite3.DatabaseError):
+        system.run_batch(items)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM history WHERE user_id = 'batch-fail'").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM user_stats WHERE user_id = 'batch-fail'").fetchone()[0] == 0
+    finally:
+        conn.close()
+    assert _clock(db_path) == clock
+    assert system.memory.get_user_topic_stats("batch-fail", topic)["attempts"] == 0
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from agents import GeminiExplanationAgent
+from async_explainer import AsyncExplainer
+from explanation_cache import ExplanationCache
+from gemini_tool import GeminiTool, StubModel
+
+
+class SlowGenerate:
+    def __init__(self, delay):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, topic, level, fallback_text):
+        with self._lock:
+            self.calls.append((topic, level, fallback_text))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return f"generated {topic}/{level}/{fallback_text}"
+
+
+def _concurrently(fn, args_list):
+    with ThreadPoolExecutor(max_workers=len(args_list)) as pool:
+        return list(pool.map(lambda args: fn(*args), args_list))
+
+
+def test_deadline_returns_fallback_without_waiting():
+    explainer = AsyncExplainer(SlowGenerate(0.5), timeout=0.05)
+    start = time.perf_counter()
+    assert explainer.explain_sync("stacks", "beginner", "static text") == "static text"
+    assert time.perf_counter() - start < 0.3
+    assert explainer.stats()["timeouts"] == 1
+
+
+def test_identical_requests_share_one_call():
+    generate = SlowGenerate(0.2)
+    explainer = AsyncExplainer(generate, timeout=2.0)
+    results = _concurrently(explainer.explain_sync, [("stacks", "beginner", "fb")] * 5)
+    assert results == ["generated stacks/beginner/fb"] * 5
+    assert len(generate.calls) == 1
+    assert explainer.stats()["coalesced"] == 4
+
+
+def test_different_fallbacks_are_not_coalesced():
+    generate = SlowGenerate(0.2)
+    explainer = AsyncExplainer(generate, timeout=2.0)
+    results = _concurrently(explainer.explain_sync, [("stacks", "beginner", "one"), ("stacks", "beginner", "two")])
+    assert results == ["generated stacks/beginner/one", "generated stacks/beginner/two"]
+    assert len(generate.calls) == 2
+
+
+def test_in_flight_calls_are_capped():
+    generate = SlowGenerate(0.1)
+    explainer = AsyncExplainer(generate, timeout=2.0, max_in_flight=2)
+    _concurrently(explainer.explain_sync, [(f"topic{i}", "beginner", "fb") for i in range(6)])
+    assert len(generate.calls) == 6
+    assert generate.peak == 2
+
+
+def test_async_callers_coalesce_with_sync_callers():
+    generate = SlowGenerate(0.2)
+    explainer = AsyncExplainer(generate, timeout=2.0)
+
+    async def main():
+        sync_call = asyncio.get_running_loop().run_in_executor(
+            None, explainer.explain_sync, "queues", "advanced", "fb")
+        return await asyncio.gather(explainer.explain("queues", "advanced", "fb"), sync_call)
+
+    assert asyncio.run(main()) == ["generated queues/advanced/fb"] * 2
+    assert len(generate.calls) == 1
+
+
+def test_stub_model_results_are_cached(tmp_path):
+    model = StubModel(latency=0.0)
+    tool = GeminiTool(model=model, cache=ExplanationCache(str(tmp_path / "explanations.db")))
+
+    first = tool.explain("stacks", "beginner", "fb")
+    assert tool.explain("stacks", "beginner", "fb") == first
+    assert model.calls == 1
+    assert tool.explain("stacks", "beginner", "other fallback") != first
+    assert model.calls == 2
+    assert tool.cache.stats()["hits"] == 1
+
+
+def test_only_model_calls_are_timed(tmp_path):
+    llm_timer = metrics.STAGE_SECONDS.labels("llm_explanation")
+    before = sum(llm_timer.counts)
+
+    GeminiExplanationAgent(GeminiTool(enabled=False)).explain("stacks", "beginner", "fb")
+    assert sum(llm_timer.counts) == before
+
+    tool = GeminiTool(model=StubModel(latency=0.0), cache=ExplanationCache(str(tmp_path / "explanations.db")))
+    agent = GeminiExplanationAgent(tool)
+    agent.explain("stacks", "beginner", "fb")
+    agent.explain("stacks", "beginner", "fb")      # cache hit
+    assert sum(llm_timer.counts) == before + 1
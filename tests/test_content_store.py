@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+from content_store import ContentStore
+from memory import MemoryManager
+
+
+def _topic(answer):
+    return {
+        "explanations": {"beginner": f"about {answer}"},
+        "diagnostic": [{"id": "d1", "question": "What?", "answer": answer}],
+        "practice": [{"id": "q1", "difficulty": "easy", "question": "What?", "answer": answer}],
+    }
+
+
+def _write(path, content, mtime):
+    path.write_text(json.dumps(content), encoding="utf-8")
+    os.utime(path, (mtime, mtime))    # explicit mtimes: filesystem timestamps can be coarse
+
+
+@pytest.fixture
+def content_file(tmp_path):
+    path = tmp_path / "content.json"
+    _write(path, {"stacks": _topic("LIFO")}, 1_000_000)
+    return path
+
+
+@pytest.fixture
+def store(tmp_path, content_file):
+    return ContentStore(str(content_file), MemoryManager(str(tmp_path / "memory.db")), check_interval=0)
+
+
+def test_rewritten_file_is_picked_up_and_old_snapshots_are_isolated(store, content_file):
+    before = store.snapshot()
+    assert set(before.content) == {"stacks"}
+
+    _write(content_file, {"stacks": _topic("last in first out"), "queues": _topic("FIFO")}, 1_000_100)
+    after = store.snapshot()
+
+    assert after is not before and after.version != before.version
+    assert set(after.content) == {"stacks", "queues"}
+    assert after.content["stacks"]["practice"][0]["answer"] == "last in first out"
+    # A request still holding the earlier snapshot sees the old content, index and topics body
+    assert set(before.content) == {"stacks"}
+    assert before.content["stacks"]["practice"][0]["answer"] == "LIFO"
+    assert [t["name"] for t in json.loads(before.topics_json)["topics"]] == ["stacks"]
+    with pytest.raises(TypeError):
+        before.content["queues"] = {}
+
+
+def test_unchanged_mtime_keeps_the_snapshot(store):
+    assert store.snapshot() is store.snapshot()
+
+
+def test_invalid_rewrite_keeps_serving_the_previous_snapshot(store, content_file):
+    before = store.snapshot()
+    content_file.write_text("{not json", encoding="utf-8")
+    os.utime(content_file, (1_000_200, 1_000_200))
+    assert store.snapshot() is before
+
+
+def test_reload_checks_are_rate_limited(tmp_path, content_file):
+    store = ContentStore(str(content_file), MemoryManager(str(tmp_path / "memory.db")), check_interval=3600)
+    before = store.snapshot()
+    _write(content_file, {"queues": _topic("FIFO")}, 1_000_300)
+    assert store.snapshot() is before
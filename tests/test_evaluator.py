@@ -0,0 +1,35 @@
+import json
+
+import gemini_tool
+from evaluator import EvalDatabase, Evaluator, _benchmark_topic
+
+with open("sample_content_expanded.json", encoding="utf-8") as f:
+    CONTENT = json.load(f)
+SMALL = {topic: CONTENT[topic] for topic in list(CONTENT)[:2]}
+
+
+def test_evaluation_keeps_llm_cache_in_the_throwaway_dir(tmp_path, monkeypatch):
+    production_cache = tmp_path / "explanations.db"
+    monkeypatch.setattr(gemini_tool, "EXPLAIN_CACHE_PATH", str(production_cache))
+    monkeypatch.setattr(gemini_tool, "GEMINI_STUB", "0")
+
+    report = Evaluator(runs_per_topic=1).evaluate_content(SMALL)
+
+    assert set(report["topics"]) == set(SMALL)
+    assert not production_cache.exists()
+
+
+def test_benchmark_never_calls_a_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(gemini_tool, "EXPLAIN_CACHE_PATH", str(tmp_path / "explanations.db"))
+    monkeypatch.setattr(gemini_tool, "GEMINI_STUB", "0")
+    monkeypatch.setattr(gemini_tool, "GEMINI_KEY", "live-key")
+
+    with EvalDatabase(llm=False) as db:
+        assert not db.gemini_agent.tool.enabled
+        assert db.gemini_agent.tool.cache is None
+
+    topic = next(iter(SMALL))
+    first = _benchmark_topic(SMALL, topic, seed=1, warmup=0, iterations=3)
+    second = _benchmark_topic(SMALL, topic, seed=1, warmup=0, iterations=3)
+    assert first["average_practice_score"] == second["average_practice_score"]
+    assert not (tmp_path / "explanations.db").exists()
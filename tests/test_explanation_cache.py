@@ -0,0 +1,90 @@
+import pytest
+
+from explanation_cache import ExplanationCache, prompt_key
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def _cache(tmp_path, clock, **kwargs):
+    return ExplanationCache(str(tmp_path / "explanations.db"), clock=clock, **kwargs)
+
+
+def test_prompt_key_depends_on_model_and_prompt():
+    assert prompt_key("m", "p") == prompt_key("m", "p")
+    assert prompt_key("m", "p") != prompt_key("m2", "p")
+    assert prompt_key("m", "p") != prompt_key("m", "p2")
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = _cache(tmp_path, clock, ttl=100)
+    cache.put("k", "text", gen_ms=10)
+
+    clock.advance(100)
+    assert cache.contains("k") and cache.get("k") == "text"
+    clock.advance(1)
+    assert not cache.contains("k")
+    assert cache.get("k") is None
+    assert cache.stats()["size"] == 0        # the expired row was deleted on lookup
+
+
+def test_hits_refresh_recency_for_lru_eviction(tmp_path, clock):
+    cache = _cache(tmp_path, clock, max_entries=2)
+    cache.put("a", "A")
+    clock.advance(1)
+    cache.put("b", "B")
+    clock.advance(ExplanationCache.TOUCH_INTERVAL + 1)
+    assert cache.get("a") == "A"             # "a" is now the most recently used
+    clock.advance(1)
+    cache.put("c", "C")
+
+    cache.evict()
+    assert cache.contains("a") and cache.contains("c")
+    assert not cache.contains("b")
+
+
+def test_eviction_also_drops_expired_entries(tmp_path, clock):
+    cache = _cache(tmp_path, clock, ttl=50, max_entries=10)
+    cache.put("old", "x")
+    clock.advance(60)
+    cache.put("new", "y")
+    cache.evict()
+    assert cache.stats()["size"] == 1 and cache.contains("new")
+
+
+def test_puts_trigger_periodic_eviction(tmp_path, clock):
+    cache = _cache(tmp_path, clock, max_entries=5)
+    for i in range(ExplanationCache.EVICT_EVERY):
+        cache.put(f"k{i}", "x")
+        clock.advance(1)
+    assert cache.stats()["size"] == 5
+    assert cache.contains(f"k{ExplanationCache.EVICT_EVERY - 1}") and not cache.contains("k0")
+
+
+def test_hit_rate_and_latency_saved(tmp_path, clock):
+    cache = _cache(tmp_path, clock)
+    cache.put("slow", "S", gen_ms=1200)
+    cache.put("fast", "F", gen_ms=300)
+
+    assert cache.get("slow") == "S"
+    assert cache.get("slow") == "S"
+    assert cache.get("fast") == "F"
+    assert cache.get("missing") is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+    assert stats["hit_rate"] == 0.75
+    assert stats["latency_saved_ms"] == 2700.0
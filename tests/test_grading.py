@@ -0,0 +1,80 @@
+import pytest
+
+from agents import FeedbackAgent
+from evaluator import evaluate_answer, grade
+from grading import ENGINES, MAX_ANSWER_CHARS, AnswerKey, get_engine, normalize_answer
+from memory import MemoryManager
+
+# Pairs that differ only by an operator or symbol
+OPERATOR_PAIRS = [
+    ("l - (r + l) * 2", "l + (r - l) / 2"),
+    ("left > root > right", "left < root < right"),
+    ("O(n!)", "O(n)"),
+    ("O(2n)", "O(2^n)"),
+]
+
+
+def test_normalization_keeps_operators():
+    assert normalize_answer("  O(Log   N) ") == "o(log n)"
+    assert normalize_answer("l + (r - l) / 2") == "l + (r - l) / 2"
+    assert normalize_answer(None) == ""
+
+
+def test_default_engine_is_difflib():
+    assert get_engine().name == "difflib"
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+@pytest.mark.parametrize("student, correct", OPERATOR_PAIRS)
+def test_operator_changes_never_score_as_identical(engine, student, correct):
+    assert get_engine(engine).score(student, correct) < 1.0
+
+
+@pytest.mark.parametrize("engine", ["levenshtein", "token_set"])
+def test_spacing_and_case_do_not_matter(engine):
+    assert get_engine(engine).score("o(logn)", "O(log n)") >= 0.9
+
+
+@pytest.mark.parametrize("student, correct", OPERATOR_PAIRS + [("O(n2)", "O(n²)"), ("a" * 600 + "x", "a" * 600 + "y")])
+def test_operator_changes_are_not_exact_matches(student, correct):
+    assert not AnswerKey(correct).is_exact(student)
+    assert not evaluate_answer(student, correct)
+
+
+@pytest.mark.parametrize("student", ["O(log n)", "o(logn)", "  O( LOG N )  ", "O(log\tn)"])
+def test_exact_match_ignores_case_and_whitespace(student):
+    assert evaluate_answer(student, "O(log n)")
+    assert grade(student, "O(log n)") == {"correct": True, "score": 1.0}
+
+
+def test_aliases_are_accepted():
+    key = AnswerKey("LIFO", ("last in first out",))
+    assert key.is_exact("Last In  First Out")
+    assert not key.is_exact("first in first out")
+
+
+def test_feedback_agent_uses_the_same_exact_match(tmp_path):
+    memory = MemoryManager(str(tmp_path / "m.db"))
+    agent = FeedbackAgent(memory)
+    assert agent.grade("u", "t", "q1", "o(logn)", "O(log n)")["correct"]
+    assert not agent.grade("u", "t", "q2", "O(n!)", "O(n)")["correct"]
+
+
+@pytest.mark.parametrize("student, correct, expected", [
+    ("n²", "n²", 1.0),
+    ("O(n²)", "O(n²)", 1.0),
+    ("Ｏ(ｎ)", "O(n)", 1.0),           # full-width forms fold like the correct side
+])
+def test_levenshtein_folds_the_student_side(student, correct, expected):
+    assert get_engine("levenshtein").score(student, correct) == expected
+
+
+def test_levenshtein_near_miss_with_non_ascii_passes():
+    assert get_engine("levenshtein").score("O(n²)x", "O(n²)") >= 0.8
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_oversized_answers_are_clipped(engine):
+    scorer = get_engine(engine)
+    correct = "x" * MAX_ANSWER_CHARS
+    assert scorer.score("x" * 500_000, correct) == scorer.score("x" * MAX_ANSWER_CHARS, correct) == 1.0
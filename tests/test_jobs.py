@@ -0,0 +1,136 @@
+import subprocess
+import sys
+import os
+import threading
+
+import pytest
+
+from jobs import DONE, FAILED, QUEUED, RUNNING, Job, JobManager, _process_start
+
+
+class FakeSnapshot:
+    def __init__(self, version, content):
+        self.version = version
+        self.content = content
+
+
+class FakeStore:
+    def __init__(self, version="v1"):
+        self.current = FakeSnapshot(version, {"stacks": {}, "queues": {}})
+
+    def snapshot(self):
+        return self.current
+
+
+class GatedEvaluator:
+    """Evaluator stand-in that reports progress, then waits for the test to release it."""
+
+    release = None
+    runs = 0
+
+    def evaluate_content(self, content, progress=None):
+        GatedEvaluator.runs += 1
+        for i, topic in enumerate(content, 1):
+            progress(i, len(content), topic)
+        GatedEvaluator.release.wait(5)
+        return {"topics": {t: {"score": 1.0} for t in content}}
+
+
+def _managers(tmp_path, store):
+    GatedEvaluator.release = threading.Event()
+    GatedEvaluator.runs = 0
+    db_path = str(tmp_path / "jobs.db")
+    # Two managers on one database stand in for two uvicorn workers
+    return (JobManager(store, db_path=db_path, evaluator_factory=GatedEvaluator, poll_interval=0.01),
+            JobManager(store, db_path=db_path, evaluator_factory=GatedEvaluator, poll_interval=0.01))
+
+
+def test_jobs_are_visible_from_other_workers(tmp_path):
+    store = FakeStore()
+    worker_a, worker_b = _managers(tmp_path, store)
+
+    job = worker_a.submit()
+    assert worker_b.submit().id == job.id          # coalesced across workers
+
+    events = []
+    streamer = threading.Thread(target=lambda: events.extend(worker_b.stream(worker_b.get(job.id))))
+    streamer.start()
+    GatedEvaluator.release.set()
+    streamer.join(5)
+
+    assert events[-1]["status"] == DONE
+    assert GatedEvaluator.runs == 1
+    finished = worker_b.get(job.id, report=True)
+    assert finished.status == DONE
+    assert set(finished.report["topics"]) == {"stacks", "queues"}
+
+    cached = worker_b.submit()
+    assert cached.cached and cached.status == DONE and cached.id != job.id
+    assert worker_a.get(cached.id, report=True).report == finished.report
+    assert worker_a.counts()[DONE] == 2
+
+
+def test_jobs_of_dead_workers_are_failed(tmp_path):
+    store = FakeStore()
+    manager, _ = _managers(tmp_path, store)
+
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    orphan = Job(store.current.version)
+    orphan.status = RUNNING
+    orphan.owner_pid = dead.pid
+    manager._save(orphan)
+
+    assert manager.get(orphan.id).status == FAILED
+    # The stale job no longer blocks a fresh evaluation of the same content
+    job = manager.submit()
+    assert job.id != orphan.id
+    GatedEvaluator.release.set()
+
+
+def test_stale_job_with_our_pid_is_failed(tmp_path):
+    store = FakeStore()
+    manager, _ = _managers(tmp_path, store)
+
+    # Left behind by an earlier process that had this pid (a container restart
+    # as PID 1): one row from before owner tokens existed, one from a previous run
+    legacy = Job(store.current.version)
+    legacy.status = RUNNING
+    previous = Job(store.current.version, owner_token="previous-run")
+    previous.owner_start = "-1"
+    for job in (legacy, previous):
+        assert job.owner_pid == os.getpid()
+        manager._save(job)
+
+    job = manager.submit()
+    assert job.id not in (legacy.id, previous.id) and job.status in (QUEUED, RUNNING)
+    assert manager.get(legacy.id).status == FAILED
+    assert manager.get(previous.id).status == FAILED
+    assert manager.get(job.id).status != FAILED       # our own live job is not an orphan
+    GatedEvaluator.release.set()
+
+
+def test_reused_pid_is_detected(tmp_path):
+    if _process_start(os.getpid()) is None:
+        pytest.skip("process start times need /proc")
+    store = FakeStore()
+    manager, _ = _managers(tmp_path, store)
+
+    unrelated = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        reused = Job(store.current.version, owner_token="dead-worker")
+        reused.status = RUNNING
+        reused.owner_pid = unrelated.pid
+        reused.owner_start = "-1"                  # the dead owner started at another time
+        live = Job(store.current.version + "-other", owner_token="live-worker")
+        live.status = RUNNING
+        live.owner_pid = unrelated.pid
+        live.owner_start = _process_start(unrelated.pid)
+        manager._save(reused)
+        manager._save(live)
+
+        assert manager.get(reused.id).status == FAILED
+        assert manager.get(live.id).status == RUNNING
+    finally:
+        unrelated.kill()
+        unrelated.wait()
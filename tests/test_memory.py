@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+
+from memory import MemoryManager
+
+
+def _history_count(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_write_behind_reads_count_each_attempt_once(tmp_path):
+    memory = MemoryManager(str(tmp_path / "m.db"), write_behind=True, flush_every=7,
+                           flush_interval_ms=1, cache_size=0)
+    seen = []
+
+    def write():
+        for i in range(300):
+            memory.record_attempt("u", "t", str(i), "a", "a", i % 2 == 0)
+
+    def read():
+        last = 0
+        for _ in range(1000):
+            attempts = memory.get_user_topic_stats("u", "t")["attempts"]
+            seen.append(attempts >= last)
+            last = attempts
+
+    threads = [threading.Thread(target=write) for _ in range(4)] + [threading.Thread(target=read) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all(seen)
+    assert memory.get_user_topic_stats("u", "t") == {"attempts": 1200, "correct": 600, "accuracy": 50.0}
+    memory.close()
+
+
+def test_close_keeps_attempts_racing_it(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    memory = MemoryManager(db_path, write_behind=True, flush_every=50, flush_interval_ms=5)
+    started = threading.Barrier(5)
+
+    def write():
+        started.wait()
+        for _ in range(500):
+            memory.record_attempt("u", "t", "q", "a", "a", True)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for t in threads:
+        t.start()
+    started.wait()
+    memory.close()
+    for t in threads:
+        t.join()
+
+    assert _history_count(db_path) == 2000
+
+
+def test_history_ts_backfill_runs_once(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    MemoryManager(db_path, cache_size=0).record_attempt("u", "t", "q", "a", "a", True)
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE history SET ts = NULL")
+    conn.commit()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] >= 1
+
+    # Already migrated: the startup scan is skipped and the row left alone
+    MemoryManager(db_path, cache_size=0)
+    assert conn.execute("SELECT ts FROM history").fetchone()[0] is None
+
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    MemoryManager(db_path, cache_size=0)
+    assert conn.execute("SELECT ts FROM history").fetchone()[0] > 0
+    conn.close()
+
+
+def test_stats_cache_sees_writes_from_another_process(tmp_path):
+    db_path = str(tmp_path / "m.db")
+    worker_a = MemoryManager(db_path, cache_sync_ms=0)
+    worker_b = MemoryManager(db_path, cache_sync_ms=0)
+
+    worker_a.record_attempt("u", "t", "q", "a", "a", True)
+    assert worker_a.get_user_topic_stats("u", "t")["attempts"] == 1
+    assert worker_a.get_user_topic_stats("u", "t")["attempts"] == 1     # cached
+
+    worker_b.record_attempt("u", "t", "q", "a", "a", False)
+    assert worker_a.get_user_topic_stats("u", "t") == {"attempts": 2, "correct": 1, "accuracy": 50.0}
+    assert worker_a.cache_stats()["invalidations"] == 1
+
+
+def test_stats_cache_keeps_entries_across_own_writes(tmp_path):
+    memory = MemoryManager(str(tmp_path / "m.db"), cache_sync_ms=0)
+    memory.get_user_topic_stats("u", "t")
+    for _ in range(3):
+        memory.record_attempt("u", "t", "q", "a", "a", True)
+        assert memory.get_user_topic_stats("u", "t")["attempts"] == memory.cache_stats()["hits"]
+    assert memory.cache_stats()["invalidations"] == 0
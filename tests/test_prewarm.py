@@ -0,0 +1,40 @@
+import threading
+import time
+
+from agents import GeminiExplanationAgent
+from explanation_cache import ExplanationCache
+from gemini_tool import GeminiTool, StubResponse
+from prewarm import prewarm_explanations
+
+
+class CountingModel:
+    def __init__(self, latency):
+        self.latency = latency
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latency)
+        with self._lock:
+            self.active -= 1
+        return StubResponse(f"[model] {prompt.strip()}")
+
+
+def test_prewarm_respects_the_explainer_cap(tmp_path):
+    content = {f"topic{i}": {"explanations": {"beginner": f"about topic {i}"}} for i in range(6)}
+    model = CountingModel(latency=0.05)
+    tool = GeminiTool(model=model, cache=ExplanationCache(str(tmp_path / "explanations.db")))
+    agent = GeminiExplanationAgent(tool, max_in_flight=2)
+
+    report = prewarm_explanations(content, agent, workers=8, levels=("beginner",))
+    assert report["generated"] == 6 and report["failed"] == 0
+    assert model.peak <= 2
+
+    again = prewarm_explanations(content, agent, workers=8, levels=("beginner",))
+    assert again["cached"] == 6 and model.calls == 6
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+
+import pytest
+
+from sandbox import SANDBOX_SUPPORTED, SandboxPool
+
+pytestmark = pytest.mark.skipif(not SANDBOX_SUPPORTED, reason="sandbox needs os.fork and resource")
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] not in ("Z", "X")
+    except FileNotFoundError:
+        return False
+    except OSError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _gone_soon(pid, within=2.0):
+    deadline = time.monotonic() + within
+    while _alive(pid):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(size=1, timeout=1.0)
+    yield pool
+    pool.close()
+
+
+def test_snippet_runs(pool):
+    result = pool.run("print(input() * 2)", input_data="ab")
+    assert result["ok"] and result["stdout"] == "abab\n"
+
+
+def test_closing_pipes_does_not_escape_the_timeout(pool):
+    start = time.monotonic()
+    result = pool.run("import os, time\nos.close(1)\nos.close(2)\ntime.sleep(30)")
+    assert time.monotonic() - start < 3.0
+    assert result["timed_out"] and not result["ok"]
+    assert pool.stats["crashed"] == 0
+
+
+def test_setsid_grandchild_is_killed(pool):
+    code = (
+        "import os, time\n"
+        "try:\n"
+        "    pid = os.fork()\n"
+        "except OSError:\n"
+        "    print('no fork')\n"
+        "else:\n"
+        "    if pid == 0:\n"
+        "        os.setsid()\n"
+        "        os.close(1)\n"
+        "        os.close(2)\n"
+        "        time.sleep(30)\n"
+        "        os._exit(0)\n"
+        "    print(pid)\n"
+    )
+    result = pool.run(code)
+    assert result["ok"], result
+    if result["stdout"].strip() == "no fork":     # RLIMIT_NPROC applies (not root)
+        return
+    assert _gone_soon(int(result["stdout"]))
+
+
+def test_worker_crash_kills_the_running_job(pool, tmp_path):
+    pid_file = tmp_path / "job.pid"
+    worker = pool._idle.queue[0]
+    code = f"import os, time\nopen({str(pid_file)!r}, 'w').write(str(os.getpid()))\ntime.sleep(30)"
+
+    def crash_worker():
+        deadline = time.monotonic() + 5
+        while not pid_file.exists() or not pid_file.read_text():
+            if time.monotonic() > deadline:
+                return
+            time.sleep(0.01)
+        worker.proc.kill()
+
+    killer = threading.Thread(target=crash_worker)
+    killer.start()
+    result = pool.run(code, timeout=10.0)
+    killer.join()
+
+    assert "crashed" in result["error"]
+    assert _gone_soon(int(pid_file.read_text()))
+    assert pool.run("print(1)")["ok"]      # replaced worker is usable
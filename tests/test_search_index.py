@@ -0,0 +1,82 @@
+import pytest
+
+from search_index import SearchIndex, tokenize
+
+CORPUS = {
+    "binary search": {
+        "concept": "Binary search halves a sorted array each step.",
+        "explanations": {"beginner": "Check the middle element of the sorted list."},
+        "practice": [{"id": "q1", "question": "What does binary search need?", "answer": "sorted input"}],
+    },
+    "binary trees": {
+        "concept": "Each node has at most two children.",
+        "explanations": {"beginner": "A tree where nodes have a left and right child."},
+        "practice": [{"id": "q1", "question": "How many children can a node have?", "answer": "2"}],
+    },
+    "sorting": {
+        "concept": "Arranging elements in order.",
+        "explanations": {"beginner": "Merge sort and quick sort put a list in sorted order."},
+        "practice": [{"id": "q1", "question": "Which sort is stable?", "answer": "merge sort"}],
+    },
+    "queues": {
+        "concept": "First in, first out.",
+        "explanations": {"beginner": "Enqueue at the back, dequeue at the front."},
+        "practice": [{"id": "q1", "question": "What order does a queue use?", "answer": "FIFO"}],
+    },
+}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SearchIndex(CORPUS)
+
+
+def _topics(results):
+    return [r["topic"] for r in results]
+
+
+def test_tokenize_drops_stopwords_and_symbols():
+    assert tokenize("What is the O(log n) of Binary-Search?") == ["o", "log", "n", "binary", "search"]
+
+
+def test_bm25_ranks_name_matches_first(index):
+    results = index.search("binary search", prefix=False, fuzzy=False)
+    assert _topics(results)[:2] == ["binary search", "binary trees"]
+    assert results[0]["score"] > results[1]["score"] > 0
+    assert "name" in results[0]["fields"]
+
+
+def test_rarer_terms_outweigh_common_ones(index):
+    # "sorted" appears in two topics, "merge" only in one
+    assert index.best("sorted merge", prefix=False, fuzzy=False) == "sorting"
+
+
+def test_ranking_is_deterministic_and_limited(index):
+    first = index.search("binary", limit=1)
+    assert first == index.search("binary", limit=1)
+    assert len(first) == 1
+
+
+def test_prefix_matches_the_last_term_only(index):
+    results = index.search("queu", fuzzy=False)
+    assert _topics(results) == ["queues"]
+    assert results[0]["terms"] == {"queu": ["queue", "queues"]}
+    assert index.search("queu", prefix=False, fuzzy=False) == []
+    assert "queues" not in _topics(index.search("queu binary", fuzzy=False))
+
+
+def test_fuzzy_matches_typos(index):
+    results = index.search("binery serch", prefix=False)
+    assert _topics(results)[0] == "binary search"
+    assert results[0]["terms"] == {"binery": ["binary"], "serch": ["search"]}
+    assert index.search("binery serch", prefix=False, fuzzy=False) == []
+
+
+def test_short_terms_are_not_fuzzy_matched(index):
+    assert index.search("qeu", prefix=False) == []
+
+
+def test_no_match_and_empty_queries(index):
+    assert index.search("graph", prefix=False) == []
+    assert index.search("the of") == []
+    assert SearchIndex({}).search("binary") == []
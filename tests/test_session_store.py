@@ -0,0 +1,65 @@
+import threading
+
+from session_store import SessionStore, SessionWriter
+
+
+def _store(tmp_path, **kwargs):
+    writer = SessionWriter(str(tmp_path), flush_interval=60, **kwargs)
+    return SessionStore(str(tmp_path), writer=writer), writer
+
+
+def test_concurrent_flushes_keep_append_order(tmp_path, monkeypatch):
+    store, writer = _store(tmp_path)
+    in_write = threading.Event()
+    release = threading.Event()
+    real_write = SessionWriter._write
+
+    def stalling_write(self, user_id, lines):
+        if not in_write.is_set():
+            in_write.set()
+            release.wait(5)
+        return real_write(self, user_id, lines)
+
+    monkeypatch.setattr(SessionWriter, "_write", stalling_write)
+
+    store.append("u1", {"n": 1})
+    background = threading.Thread(target=writer.flush)
+    background.start()
+    assert in_write.wait(5)
+
+    # Record 2 is flushed by a reader while record 1's write is stalled
+    store.append("u1", {"n": 2})
+    reader = threading.Thread(target=store.last, args=("u1",))
+    reader.start()
+    release.set()
+    background.join()
+    reader.join()
+
+    records, _ = store.tail("u1", 10)
+    assert [r["data"]["n"] for r in records] == [2, 1]
+    assert store.last("u1")["data"] == {"n": 2}
+    writer.close()
+
+
+def test_appends_after_close_are_written(tmp_path):
+    store, writer = _store(tmp_path)
+    store.append("u1", {"n": 1})
+    writer.close()
+    store.append("u1", {"n": 2})
+    records, _ = store.tail("u1", 10)
+    assert [r["data"]["n"] for r in records] == [2, 1]
+
+
+def test_tail_pages_newest_first(tmp_path):
+    store, writer = _store(tmp_path)
+    for n in range(5):
+        store.append("u1", {"n": n})
+
+    page, cursor = store.tail("u1", 2)
+    assert [r["data"]["n"] for r in page] == [4, 3]
+    page, cursor = store.tail("u1", 2, before=cursor)
+    assert [r["data"]["n"] for r in page] == [2, 1]
+    page, cursor = store.tail("u1", 2, before=cursor)
+    assert [r["data"]["n"] for r in page] == [0]
+    assert cursor is None
+    writer.close()
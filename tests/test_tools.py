@@ -0,0 +1,74 @@
+from collections import OrderedDict
+
+import pytest
+
+import tools
+from tools import grade_code
+
+CASES = [{"input": "", "expected": "1"}, {"input": "", "expected": "2"}, {"input": "", "expected": "3"}]
+
+
+def _finished(stdout):
+    return {"ok": True, "exit_code": 0, "signal": None, "timed_out": False, "stdout": stdout,
+            "stderr": "", "error": None, "wall_time": 0.01, "cpu_time": 0.01, "peak_memory_kb": 1000}
+
+
+class FakeSandbox:
+    """Stands in for run_python_code: hands out queued results, then successful runs printing 1."""
+
+    def __init__(self):
+        self.results = []
+        self.calls = 0
+        self.limits = {"cpu_seconds": 2, "memory_bytes": 256 << 20}
+
+    def run(self, code, input_data="", timeout=5.0):
+        self.calls += 1
+        return self.results.pop(0) if self.results else _finished("1\n")
+
+
+@pytest.fixture
+def sandbox(monkeypatch):
+    fake = FakeSandbox()
+    monkeypatch.setattr(tools, "_case_cache", OrderedDict())
+    monkeypatch.setattr(tools, "run_python_code", fake.run)
+    monkeypatch.setattr(tools, "_sandbox_limits", lambda: fake.limits)
+    return fake
+
+
+def test_skipped_cases_have_every_field(sandbox):
+    report = grade_code("print(1)", CASES, stop_on_first_failure=True, workers=1)
+    assert [c["status"] for c in report["cases"]] == ["passed", "failed", "skipped"]
+    skipped = report["cases"][2]
+    assert set(skipped) == set(report["cases"][0])
+    assert skipped["expected"] == "3" and skipped["actual"] is None and skipped["wall_time"] is None
+
+
+def test_crashes_and_timeouts_are_not_cached(sandbox):
+    sandbox.results = [
+        {"ok": False, "error": "sandbox worker crashed: pipe closed"},
+        {"ok": False, "exit_code": None, "signal": 9, "timed_out": True, "stdout": "", "stderr": "",
+         "error": "timed out after 5s", "wall_time": 5.0, "cpu_time": 0.0, "peak_memory_kb": 1000},
+    ]
+    case = CASES[:1]
+    assert grade_code("print(1)", case)["cases"][0]["status"] == "error"
+    assert grade_code("print(1)", case)["cases"][0]["status"] == "error"
+    assert grade_code("print(1)", case)["cases"][0]["status"] == "passed"
+    assert grade_code("print(1)", case)["cases"][0]["cached"]
+    assert sandbox.calls == 3
+
+
+def test_cache_key_includes_sandbox_limits(sandbox):
+    assert not grade_code("print(1)", CASES[:1])["cases"][0]["cached"]
+    assert grade_code("print(1)", CASES[:1])["cases"][0]["cached"]
+    sandbox.limits = {"cpu_seconds": 1, "memory_bytes": 64 << 20}
+    assert not grade_code("print(1)", CASES[:1])["cases"][0]["cached"]
+    assert sandbox.calls == 2
+
+
+@pytest.mark.skipif(not tools.SANDBOX_SUPPORTED, reason="needs the sandbox pool")
+def test_real_sandbox_results_are_graded_and_cached():
+    code = "print(int(input()) * 2)"
+    cases = [{"input": "2", "expected": "4"}, {"input": "3", "expected": "7"}]
+    first = grade_code(code, cases)
+    assert [c["status"] for c in first["cases"]] == ["passed", "failed"]
+    assert all(c["cached"] for c in grade_code(code, cases)["cases"])
@@ -1,67 +1,230 @@
 # tools.py
+import hashlib
 import subprocess
-import tempfile
+import sys
+import threading
 import time
 import json
-from typing import Tuple, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Dict, Any, List, Optional
+
+from sandbox import SANDBOX_SUPPORTED, default_pool
+from search_index import SearchIndex
 
 
 # ------------------------------------------------------
 # 1. Code Evaluation Tool
 # ------------------------------------------------------
-def evaluate_python_code(code: str, input_data: str = "") -> Tuple[bool, str]:
+def run_python_code(code: str, input_data: str = "", timeout: float = 5.0) -> Dict[str, Any]:
     """
-    Safely execute small Python code snippets by running them
-    inside a separate subprocess.
+    Run a snippet and return the structured result: ok, exit_code, signal,
+    timed_out, stdout, stderr, error, wall_time, cpu_time, peak_memory_kb.
+    exit_code and signal are both None when the run never finished (timeout,
+    sandbox crash).
 
-    Returns:
-        (success: bool, output_or_error: str)
+    Uses the warm, rlimited sandbox pool (sandbox.py) on POSIX; elsewhere it
+    falls back to a fresh interpreter with only the wall-clock timeout.
     """
-    try:
-        # Create a temporary Python file
-        with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as f:
-            f.write(code)
-            file_path = f.name
-
-        start_time = time.time()
+    if SANDBOX_SUPPORTED:
+        return default_pool().run(code, input_data, timeout=timeout)
 
-        # Run the temporary file using subprocess
+    start_time = time.time()
+    try:
+        # Code goes in as an argument, so no temp file is needed
         result = subprocess.run(
-            ["python", file_path],
+            [sys.executable, "-c", code],
             capture_output=True,
             text=True,
             input=input_data,
-            timeout=5
+            timeout=timeout
         )
+    except subprocess.TimeoutExpired:
+        return {"ok": False, "exit_code": None, "signal": None, "timed_out": True, "stdout": "", "stderr": "",
+                "error": f"timed out after {timeout}s", "wall_time": round(time.time() - start_time, 6),
+                "cpu_time": None, "peak_memory_kb": None}
+    return {
+        "ok": result.returncode == 0,
+        "exit_code": result.returncode if result.returncode >= 0 else None,
+        "signal": -result.returncode if result.returncode < 0 else None,
+        "timed_out": False,
+        "stdout": result.stdout,
+        "stderr": result.stderr,
+        "error": None,
+        "wall_time": round(time.time() - start_time, 6),
+        "cpu_time": None,
+        "peak_memory_kb": None,
+    }
 
-        elapsed = time.time() - start_time
-
-        # If Python returned an error code, return the stderr
-        if result.returncode != 0:
-            return False, f"Error:\n{result.stderr}"
 
-        # Successful run
-        return True, f"Output: {result.stdout.strip()}\nTime: {elapsed:.3f}s"
+def evaluate_python_code(code: str, input_data: str = "") -> Tuple[bool, str]:
+    """
+    Safely execute small Python code snippets in an isolated, resource-limited
+    process (see run_python_code).
 
+    Returns:
+        (success: bool, output_or_error: str)
+    """
+    try:
+        result = run_python_code(code, input_data)
     except Exception as e:
         return False, f"Exception: {str(e)}"
 
+    # Non-zero exit, limit hit or crash: return stderr / the reason
+    if not result["ok"]:
+        reason = result.get("error")
+        stderr = result.get("stderr") or ""
+        return False, f"Error:\n{stderr}" + (f"\n{reason}" if reason else "")
+
+    # Successful run
+    usage = f"Time: {result['wall_time']:.3f}s"
+    if result.get("cpu_time") is not None:
+        usage += f"\nCPU: {result['cpu_time']:.3f}s, peak memory: {result['peak_memory_kb'] / 1024:.1f} MB"
+    return True, f"Output: {result['stdout'].strip()}\n{usage}"
+
 
 # ------------------------------------------------------
-# 2. Simple Search Tool (mock lookup)
+# 2. Code Exercise Grading (test cases)
 # ------------------------------------------------------
-def simple_search(query: str, topics: Dict[str, Any]) -> Dict[str, Any]:
+CASE_CACHE_SIZE = 4096
+
+# (code hash, hash of case + limits) -> case result without "index"/"cached"
+_case_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+_case_cache_lock = threading.Lock()
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _normalize_output(text: str) -> str:
+    """Ignore trailing whitespace on each line and trailing blank lines."""
+    return "\n".join(line.rstrip() for line in (text or "").rstrip().splitlines())
+
+
+def _sandbox_limits() -> Optional[Dict[str, Any]]:
+    """CPU/memory/output limits the snippet runs under (None for the plain-subprocess fallback)."""
+    return dict(default_pool().limits) if SANDBOX_SUPPORTED else None
+
+
+def _run_case(code: str, code_hash: str, case: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    expected = str(case.get("expected", ""))
+    input_data = str(case.get("input", ""))
+    # A pass under generous limits says nothing about stricter ones
+    key = (code_hash, _hash(json.dumps([input_data, expected, timeout, _sandbox_limits()], sort_keys=True)))
+
+    with _case_cache_lock:
+        cached = _case_cache.get(key)
+        if cached is not None:
+            _case_cache.move_to_end(key)
+            return {**cached, "cached": True}
+
+    run = run_python_code(code, input_data, timeout=timeout)
+    actual = run.get("stdout") or ""
+    if not run["ok"]:
+        status = "error"
+    elif _normalize_output(actual) == _normalize_output(expected):
+        status = "passed"
+    else:
+        status = "failed"
+
+    result = {
+        "status": status,
+        "input": input_data,
+        "expected": expected,
+        "actual": actual,
+        "stderr": run.get("stderr") or "",
+        "error": run.get("error"),
+        "wall_time": run.get("wall_time"),
+        "cpu_time": run.get("cpu_time"),
+        "peak_memory_kb": run.get("peak_memory_kb"),
+    }
+    # Timeouts and sandbox crashes depend on load, not just on the code; only
+    # remember runs that finished with an exit code or signal of their own
+    finished = run.get("exit_code") is not None or run.get("signal") is not None
+    if finished and not run.get("timed_out"):
+        with _case_cache_lock:
+            _case_cache[key] = result
+            while len(_case_cache) > CASE_CACHE_SIZE:
+                _case_cache.popitem(last=False)
+    return {**result, "cached": False}
+
+
+def grade_code(code: str, cases: List[Dict[str, Any]], stop_on_first_failure: bool = False,
+               timeout: float = 5.0, workers: int = None) -> Dict[str, Any]:
     """
-    Simulates an external knowledge search.
+    Run a submission against test cases and report pass/fail per case.
+
+    cases: [{"input": "...", "expected": "..."}, ...]; output is compared after
+    stripping trailing whitespace. Cases run in parallel across the sandbox
+    pool. With stop_on_first_failure, cases not yet started when one fails
+    or errors are reported as "skipped". Results are cached by
+    (code hash, case hash), so re-grading an unchanged submission is free.
 
-    It finds the closest matching topic by name.
+    Returns {"passed", "total", "num_passed", "num_failed", "num_errors",
+    "num_skipped", "wall_time", "cases": [{"index", "status", "input",
+    "expected", "actual", "stderr", "error", "wall_time", "cpu_time",
+    "peak_memory_kb", "cached"}, ...]} with status one of passed / failed /
+    error / skipped. Skipped cases carry their input and expected output;
+    the run fields are None.
     """
-    query = query.lower()
+    start_time = time.time()
+    code_hash = _hash(code)
+    if workers is None:
+        workers = default_pool().size if SANDBOX_SUPPORTED else 2
+    stop = threading.Event()
+
+    def job(i, case):
+        if stop_on_first_failure and stop.is_set():
+            return {"index": i, "status": "skipped", "input": str(case.get("input", "")),
+                    "expected": str(case.get("expected", "")), "actual": None, "stderr": None, "error": None,
+                    "wall_time": None, "cpu_time": None, "peak_memory_kb": None, "cached": False}
+        result = _run_case(code, code_hash, case, timeout)
+        if result["status"] != "passed":
+            stop.set()
+        return {"index": i, **result}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(cases) or 1)),
+                            thread_name_prefix="alca-grade") as pool:
+        futures = [pool.submit(job, i, case) for i, case in enumerate(cases)]
+        results = [f.result() for f in futures]
 
-    # Try exact or partial match
-    for key in topics.keys():
-        if query in key.lower():
-            return topics[key]
+    counts = {status: 0 for status in ("passed", "failed", "error", "skipped")}
+    for r in results:
+        counts[r["status"]] += 1
+
+    return {
+        "passed": bool(cases) and counts["passed"] == len(cases),
+        "total": len(cases),
+        "num_passed": counts["passed"],
+        "num_failed": counts["failed"],
+        "num_errors": counts["error"],
+        "num_skipped": counts["skipped"],
+        "wall_time": round(time.time() - start_time, 6),
+        "cases": results,
+    }
+
+
+# ------------------------------------------------------
+# 3. Topic Search Tool
+# ------------------------------------------------------
+# simple_search is usually called with the same content dict again and
+# again; keep the index for the last one instead of rebuilding it per call.
+_search_cache: Tuple[Any, Any] = (None, None)
+
+
+def simple_search(query: str, topics: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Look up the topic that best matches `query` (by name, concept,
+    explanations and question text, with prefix and typo tolerance).
+
+    Returns the topic's content dict, or None when nothing matches.
+    """
+    global _search_cache
+    cached_topics, index = _search_cache
+    if cached_topics is not topics:
+        index = SearchIndex(topics)
+        _search_cache = (topics, index)
 
-    # Fallback: return the first topic
-    return list(topics.values())[0]
+    best = index.best(query or "")
+    return topics[best] if best is not None else None